@@ -15,11 +15,11 @@ db = SQLAlchemy()
 migrate = Migrate()
 jwt = JWTManager()
 
-def create_app():
+def create_app(config_class=Config):
     app = Flask(__name__)
     
     # Configure the app
-    app.config.from_object(Config)
+    app.config.from_object(config_class)
     
     # Enable CORS
     CORS(app, resources={r"/api/*": {"origins": "*"}})
@@ -44,6 +44,12 @@ def create_app():
     app.register_blueprint(assessment_bp, url_prefix='/api/assessments')
     app.register_blueprint(submission_bp, url_prefix='/api/submissions')
     
+    from .commands import register_commands
+    register_commands(app)
     
+    # Load the NLP stack before workers fork (e.g. gunicorn --preload) so they share it
+    if app.config.get('NLP_PRELOAD'):
+        from .utils.text_processing import warm_nlp
+        warm_nlp()
     
     return app
\ No newline at end of file
@@ -0,0 +1,185 @@
+import click
+from flask.cli import AppGroup
+
+nlp_cli = AppGroup('nlp', help='Manage the NLTK/scikit-learn grading stack.')
+
+
+@nlp_cli.command('check')
+def check_nlp_data():
+    """Verify the NLTK data is installed, without downloading anything."""
+    from .utils.text_processing import missing_nltk_data
+    missing = missing_nltk_data()
+    if missing:
+        raise click.ClickException(f"Missing NLTK data: {', '.join(missing)}")
+    click.echo('NLTK data is installed.')
+
+
+@nlp_cli.command('download')
+def download_nlp_data():
+    """Download the NLTK data used for essay grading and plagiarism checks."""
+    import nltk
+    from .utils.text_processing import REQUIRED_NLTK_DATA
+    for resource in REQUIRED_NLTK_DATA:
+        nltk.download(resource.split('/')[-1])
+
+
+plagiarism_cli = AppGroup('plagiarism', help='Maintain the plagiarism detection indexes.')
+
+
+@plagiarism_cli.command('reindex')
+@click.option('--assessment-id', type=int, default=None, help='Only reindex this assessment.')
+@click.option('--stale-only', is_flag=True, help='Only essays stored by an older preprocessing version.')
+def reindex_plagiarism(assessment_id, stale_only):
+    """Re-preprocess stored essays and rebuild the index entries derived from them."""
+    from .models.assessment import Assessment
+    from .utils.essay_texts import rebuild_essay_texts
+
+    assessment_ids = [assessment_id] if assessment_id else [a.id for a in Assessment.query.all()]
+    for current_id in assessment_ids:
+        count = rebuild_essay_texts(current_id, stale_only=stale_only)
+        click.echo(f"Indexed {count} submissions for assessment {current_id}")
+
+
+@plagiarism_cli.command('eval-lsh')
+@click.option('--assessment-id', type=int, required=True)
+@click.option('--bands', type=int, default=None, help='Defaults to PLAGIARISM_LSH_BANDS.')
+@click.option('--rows', type=int, default=None, help='Defaults to PLAGIARISM_LSH_ROWS.')
+@click.option('--shingle-size', type=int, default=None, help='Defaults to PLAGIARISM_SHINGLE_SIZE.')
+def evaluate_lsh(assessment_id, bands, rows, shingle_size):
+    """Measure LSH candidate recall against brute-force check_plagiarism."""
+    from .models.assessment import Assessment
+    from .utils.plagiarism_checker import evaluate_lsh_recall
+    from .utils.plagiarism_index import lsh_settings
+
+    default_bands, default_rows, default_shingle_size = lsh_settings()
+    report = evaluate_lsh_recall(
+        Assessment.query.get_or_404(assessment_id),
+        bands or default_bands,
+        rows or default_rows,
+        shingle_size or default_shingle_size
+    )
+    for key, value in report.items():
+        click.echo(f"{key}: {value}")
+
+
+@plagiarism_cli.command('corpus-add')
+@click.option('--assessment-id', type=int, default=None, help='Only add this assessment.')
+def add_to_corpus(assessment_id):
+    """Add stored essays to their course's cross-term plagiarism corpus."""
+    from .models.assessment import Assessment
+    from .utils.course_corpus import add_assessment
+
+    assessments = [Assessment.query.get_or_404(assessment_id)] if assessment_id else Assessment.query.all()
+    for assessment in assessments:
+        count = add_assessment(assessment)
+        click.echo(f"Added {count} submissions of assessment {assessment.id} to the corpus of course {assessment.course_id}")
+
+
+@plagiarism_cli.command('prune-corpus')
+@click.option('--course-id', type=int, default=None, help='Only prune this course.')
+@click.option('--retention-days', type=click.IntRange(min=0), default=None, help='Defaults to PLAGIARISM_CORPUS_RETENTION_DAYS.')
+@click.option('--max-essays', type=click.IntRange(min=0), default=None, help='Defaults to PLAGIARISM_CORPUS_MAX_ESSAYS.')
+def prune_corpus(course_id, retention_days, max_essays):
+    """Apply the course corpus retention policy and size cap."""
+    from .utils.course_corpus import prune
+
+    removed = prune(course_id, retention_days, max_essays)
+    click.echo(f"Removed {removed} essays from the course corpus")
+
+
+@plagiarism_cli.command('add-references')
+@click.option('--course-id', type=int, required=True)
+@click.option('--path', 'relative_path', required=True, help='File or directory relative to REFERENCE_DOCS_ROOT.')
+def add_reference_documents(course_id, relative_path):
+    """Index reference texts (lecture notes, model essays) for a course."""
+    from .utils.reference_corpus import ReferencePathError, add_references
+
+    try:
+        results = add_references(course_id, relative_path)
+    except ReferencePathError as e:
+        raise click.ClickException(str(e))
+    for document, indexed in results:
+        status = f"indexed, {document.fingerprint_count} fingerprints" if indexed else 'unchanged'
+        click.echo(f"{document.path}: {status}")
+
+
+grading_cli = AppGroup('grading', help='Run the background grading queue.')
+
+
+@grading_cli.command('worker')
+@click.option('--poll-interval', type=float, default=1.0, show_default=True, help='Seconds to wait when the queue is empty.')
+@click.option('--once', is_flag=True, help='Exit once the queue is empty.')
+def grading_worker(poll_interval, once):
+    """Grade queued submissions (essay scores and plagiarism checks)."""
+    from .utils.grading_pipeline import run_worker
+    from .utils.text_processing import warm_nlp
+
+    warm_nlp()
+    processed = run_worker(poll_interval=poll_interval, once=once)
+    click.echo(f"Processed {processed} grading jobs")
+
+
+@grading_cli.command('regrade')
+@click.option('--assessment-id', type=int, default=None, help='Assessment to regrade.')
+@click.option('--question-id', type=int, default=None, help='Only regrade submissions that answered this question.')
+@click.option('--resume', 'resume_run_id', type=int, default=None, help='Continue an interrupted regrade run.')
+@click.option('--batch-size', type=int, default=None, help='Defaults to REGRADE_BATCH_SIZE.')
+def regrade_assessment(assessment_id, question_id, resume_run_id, batch_size):
+    """Recompute automatic grades after a model answer or keywords change."""
+    from app import db
+    from .models.grading import RegradeRun
+    from .utils.regrade import start_regrade, run_regrade
+
+    if resume_run_id:
+        run = RegradeRun.query.get(resume_run_id)
+        if not run:
+            raise click.ClickException(f"Regrade run {resume_run_id} not found")
+    elif assessment_id:
+        run = start_regrade(assessment_id, question_id)
+        db.session.commit()
+    else:
+        raise click.UsageError('Pass --assessment-id or --resume.')
+
+    click.echo(f"Regrade run {run.id} (resume with --resume {run.id})")
+    report = run_regrade(run, batch_size).to_dict()
+    for change in report['changes']:
+        click.echo(f"  submission {change['submissionId']}: {change['oldGrade']} -> {change['newGrade']}")
+    click.echo(f"{report['status']}: {report['processed']} regraded, {report['changed']} changed, mean change {report['meanChange']}")
+    if report['error']:
+        raise click.ClickException(report['error'])
+
+
+@grading_cli.command('backfill-results')
+@click.option('--assessment-id', type=int, default=None, help='Only this assessment.')
+@click.option('--batch-size', type=click.IntRange(min=1), default=None, help='Submissions per commit.')
+def backfill_results(assessment_id, batch_size):
+    """Store per-answer results for submissions graded before they were kept."""
+    from .utils.grading_pipeline import BACKFILL_BATCH_SIZE, backfill_answer_results
+    from .utils.text_processing import warm_nlp
+
+    warm_nlp()
+    filled = backfill_answer_results(assessment_id, batch_size or BACKFILL_BATCH_SIZE)
+    click.echo(f"Stored answer results for {filled} submissions")
+
+
+analytics_cli = AppGroup('analytics', help='Maintain the per-assessment statistics.')
+
+
+@analytics_cli.command('reconcile')
+@click.option('--assessment-id', type=int, default=None, help='Only reconcile this assessment.')
+@click.option('--batch-size', type=int, default=None, help='Assessments recounted per transaction.')
+def reconcile_assessment_stats(assessment_id, batch_size):
+    """Recount assessment_stats from the submissions and repair any drift (run periodically, e.g. from cron)."""
+    from .utils.assessment_stats import RECONCILE_BATCH_SIZE, reconcile_stats
+
+    repaired = reconcile_stats([assessment_id] if assessment_id else None, batch_size or RECONCILE_BATCH_SIZE)
+    for repaired_id in repaired:
+        click.echo(f"Repaired the statistics of assessment {repaired_id}")
+    click.echo(f"Reconciled assessment statistics: {len(repaired)} repaired")
+
+
+def register_commands(app):
+    app.cli.add_command(nlp_cli)
+    app.cli.add_command(plagiarism_cli)
+    app.cli.add_command(grading_cli)
+    app.cli.add_command(analytics_cli)
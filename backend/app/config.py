@@ -29,3 +29,33 @@ class Config:
     MAIL_USERNAME = os.getenv('MAIL_USERNAME')
     MAIL_PASSWORD = os.getenv('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.getenv('MAIL_DEFAULT_SENDER')
+
+    # NLP configuration
+    NLP_PRELOAD = os.getenv('NLP_PRELOAD', 'False').lower() == 'true'
+    NLP_POOL_WORKERS = int(os.getenv('NLP_POOL_WORKERS', 0))  # Processes for essay grading and TF-IDF scoring; 0 runs them in-process
+    NLP_POOL_MAX_PENDING = int(os.getenv('NLP_POOL_MAX_PENDING', 0))  # Tasks queued at once before callers wait; 0 means 4 per worker
+    NLP_TASK_TIMEOUT = int(os.getenv('NLP_TASK_TIMEOUT', 30))  # Seconds a pooled task (or a wait for a queue slot) may take
+
+    # Plagiarism configuration
+    PLAGIARISM_CANDIDATES = os.getenv('PLAGIARISM_CANDIDATES', 'index')  # 'index' (inverted index), 'lsh' (MinHash LSH) or 'hashing' (stored hashed vectors)
+    PLAGIARISM_LSH_BANDS = int(os.getenv('PLAGIARISM_LSH_BANDS', 32))
+    PLAGIARISM_LSH_ROWS = int(os.getenv('PLAGIARISM_LSH_ROWS', 3))
+    PLAGIARISM_SHINGLE_SIZE = int(os.getenv('PLAGIARISM_SHINGLE_SIZE', 1))
+    PLAGIARISM_HASH_FEATURES = int(os.getenv('PLAGIARISM_HASH_FEATURES', 1 << 20))
+    PLAGIARISM_FINGERPRINTS = os.getenv('PLAGIARISM_FINGERPRINTS', 'True').lower() == 'true'
+    PLAGIARISM_FINGERPRINT_K = int(os.getenv('PLAGIARISM_FINGERPRINT_K', 20))  # Characters per k-gram
+    PLAGIARISM_FINGERPRINT_WINDOW = int(os.getenv('PLAGIARISM_FINGERPRINT_WINDOW', 16))  # k-grams per winnowing window
+    PLAGIARISM_FINGERPRINT_MAX_SHARED = int(os.getenv('PLAGIARISM_FINGERPRINT_MAX_SHARED', 50))  # Fingerprints in more answers to a question are ignored
+    PLAGIARISM_COURSE_CORPUS = os.getenv('PLAGIARISM_COURSE_CORPUS', 'True').lower() == 'true'  # Also compare with the course's other assessments
+    PLAGIARISM_CORPUS_RETENTION_DAYS = int(os.getenv('PLAGIARISM_CORPUS_RETENTION_DAYS', 1825))
+    PLAGIARISM_CORPUS_MAX_ESSAYS = int(os.getenv('PLAGIARISM_CORPUS_MAX_ESSAYS', 200000))  # Per course
+    PLAGIARISM_CORPUS_MAX_SHARED = int(os.getenv('PLAGIARISM_CORPUS_MAX_SHARED', 50))  # Fingerprints in more essays are ignored
+    REFERENCE_DOCS_ROOT = os.getenv('REFERENCE_DOCS_ROOT')  # Directory lecturers register reference texts from; unset disables them
+    SIMILARITY_TOP_K = int(os.getenv('SIMILARITY_TOP_K', 10))  # Most similar essays kept per essay in the all-pairs view
+    SIMILARITY_CHUNK_SIZE = int(os.getenv('SIMILARITY_CHUNK_SIZE', 512))  # Rows multiplied at once, bounds memory
+
+    # Grading configuration
+    GRADING_ASYNC = os.getenv('GRADING_ASYNC', 'False').lower() == 'true'  # Queue grading for `flask grading worker` instead of grading in the submit request
+    GRADING_VECTORS = os.getenv('GRADING_VECTORS', 'tfidf')  # 'tfidf' (vectorizer fitted per answer) or 'hashing' (model answer stored as hashed term counts, PLAGIARISM_HASH_FEATURES wide)
+    GRADING_STALE_SECONDS = int(os.getenv('GRADING_STALE_SECONDS', 600))  # Running jobs and regrade runs idle longer than this are requeued when a worker starts
+    REGRADE_BATCH_SIZE = int(os.getenv('REGRADE_BATCH_SIZE', 200))  # Submissions per regrade batch (one bulk UPDATE and checkpoint each)
@@ -52,6 +52,9 @@ class Assessment(db.Model):
     ignore_quotes = db.Column(db.Boolean, default=True)
     ignore_references = db.Column(db.Boolean, default=True)
     cosine_similarity_threshold = db.Column(db.Float, default=0.7)
+
+    # Upcoming/ongoing assessments of a student's courses, by deadline
+    __table_args__ = (db.Index('ix_assessments_course_end_date', 'course_id', 'end_date'),)
     
     # Relationships
     questions = db.relationship('Question', backref='assessment', lazy=True, cascade="all, delete-orphan")
@@ -90,7 +93,7 @@ class Question(db.Model):
     __tablename__ = 'questions'
     
     id = db.Column(db.Integer, primary_key=True)
-    assessment_id = db.Column(db.Integer, db.ForeignKey('assessments.id', ondelete='CASCADE'), nullable=False)
+    assessment_id = db.Column(db.Integer, db.ForeignKey('assessments.id', ondelete='CASCADE'), nullable=False, index=True)
     text = db.Column(db.Text, nullable=False)
     type = db.Column(db.String(20), nullable=False)  # 'mcq', 'essay', 'short_answer', etc.
     difficulty = db.Column(db.String(20), nullable=True)  # 'easy', 'medium', 'hard'
@@ -102,6 +105,7 @@ class Question(db.Model):
     word_limit = db.Column(db.Integer, nullable=True)
     model_answer = db.Column(db.Text, nullable=True)
     keywords = db.Column(db.Text, nullable=True)  # Stored as JSON string
+    grading_artifact = db.Column(db.JSON, nullable=True)  # Preprocessed model answer/keywords, built by nlp_grader
     
     # Relationships
     options = db.relationship('QuestionOption', backref='question', lazy=True, cascade="all, delete-orphan")
@@ -173,6 +177,13 @@ class Submission(db.Model):
     # For automated grading/analytics
     plagiarism_score = db.Column(db.Float, nullable=True)
     time_spent_seconds = db.Column(db.Integer, nullable=True) # New field to store time spent
+    grading_status = db.Column(db.String(20), nullable=False, default='graded', server_default='graded') # pending, grading, graded, failed
+
+    __table_args__ = (
+        # One submission per student and assessment; also serves lookups by user_id
+        db.UniqueConstraint('user_id', 'assessment_id', name='_submission_user_assessment_uc'),
+        db.Index('ix_submissions_assessment_submitted_at', 'assessment_id', 'submitted_at'),
+    )
     
     # Relationships
     user = db.relationship('User', backref='submissions')
@@ -198,6 +209,7 @@ class Submission(db.Model):
             'flaggedForReview': self.flagged_for_review,
             'plagiarismScore': self.plagiarism_score,
             'timeSpentSeconds': self.time_spent_seconds,
+            'gradingStatus': self.grading_status,
             'studentName': f"{self.user.first_name} {self.user.last_name}" if self.user else 'N/A',
             'studentUniversityId': self.user.university_id if self.user else 'N/A',
             'assessmentTitle': self.assessment.title if self.assessment else 'N/A',
@@ -207,6 +219,73 @@ class Submission(db.Model):
             'flaggedQuestionsJson': json.loads(self.flagged_questions_json) if self.flagged_questions_json else []
         }
 
+class SubmissionEssayText(db.Model):
+    __tablename__ = 'submission_essay_texts'
+
+    id = db.Column(db.Integer, primary_key=True)
+    submission_id = db.Column(db.Integer, db.ForeignKey('submissions.id', ondelete='CASCADE'), nullable=False)
+    question_id = db.Column(db.Integer, nullable=False)
+    assessment_id = db.Column(db.Integer, db.ForeignKey('assessments.id', ondelete='CASCADE'), nullable=False)
+    tokens = db.Column(db.Text, nullable=False)  # Space-separated output of text_processing.preprocess_text
+    preprocessing_version = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('submission_id', 'question_id', name='_submission_question_text_uc'),
+        db.Index('ix_submission_essay_texts_assessment_question', 'assessment_id', 'question_id'),
+    )
+
+class AnswerResult(db.Model):
+    """Automatic grading result of one answer in a submission, written when the submission is graded."""
+    __tablename__ = 'answer_results'
+
+    id = db.Column(db.Integer, primary_key=True)
+    submission_id = db.Column(db.Integer, db.ForeignKey('submissions.id', ondelete='CASCADE'), nullable=False)
+    question_id = db.Column(db.Integer, nullable=False)
+    question_type = db.Column(db.String(50), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    max_mark = db.Column(db.Float, nullable=True)
+    cosine_similarity = db.Column(db.Float, nullable=True)  # Essays only
+    matched_keywords = db.Column(db.JSON, nullable=True)
+    missing_keywords = db.Column(db.JSON, nullable=True)
+    nlp_insights = db.Column(db.JSON, nullable=True)  # calculate_essay_score's nlpInsights
+    grader_version = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('submission_id', 'question_id', name='_submission_question_result_uc'),
+    )
+
+class AssessmentStats(db.Model):
+    """Running totals behind an assessment's analytics, updated as submissions come in and are graded."""
+    __tablename__ = 'assessment_stats'
+
+    assessment_id = db.Column(db.Integer, db.ForeignKey('assessments.id', ondelete='CASCADE'), primary_key=True)
+    submission_count = db.Column(db.Integer, nullable=False, default=0)
+    late_count = db.Column(db.Integer, nullable=False, default=0)
+    graded_count = db.Column(db.Integer, nullable=False, default=0)
+    grade_sum = db.Column(db.Float, nullable=False, default=0.0)
+    timed_count = db.Column(db.Integer, nullable=False, default=0)  # Submissions that recorded time spent
+    time_spent_sum = db.Column(db.Integer, nullable=False, default=0)
+    # Graded submissions per score bucket (analytics.SCORE_BUCKET_LABELS)
+    score_0_20 = db.Column(db.Integer, nullable=False, default=0)
+    score_21_40 = db.Column(db.Integer, nullable=False, default=0)
+    score_41_60 = db.Column(db.Integer, nullable=False, default=0)
+    score_61_80 = db.Column(db.Integer, nullable=False, default=0)
+    score_81_100 = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    reconciled_at = db.Column(db.DateTime, nullable=True)  # Last recount from the submissions
+
+    def to_dict(self):
+        return {
+            'submissions': self.submission_count,
+            'graded': self.graded_count,
+            'lateSubmissions': self.late_count,
+            'classAverage': self.grade_sum / self.graded_count if self.graded_count else 0.0,
+            'averageTimeSpent': self.time_spent_sum / self.timed_count if self.timed_count else 0.0,
+            'scoreDistribution': [self.score_0_20, self.score_21_40, self.score_41_60, self.score_61_80, self.score_81_100]
+        }
+
 class StudentProgress(db.Model):
     __tablename__ = 'student_progress'
     
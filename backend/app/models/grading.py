@@ -0,0 +1,85 @@
+from app import db
+from datetime import datetime
+
+class GradingJob(db.Model):
+    """A submission waiting for (or undergoing) essay grading and plagiarism checks by a worker."""
+    __tablename__ = 'grading_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    submission_id = db.Column(db.Integer, db.ForeignKey('submissions.id', ondelete='CASCADE'), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    submission = db.relationship('Submission', backref=db.backref('grading_jobs', lazy=True, passive_deletes=True))
+
+    __table_args__ = (
+        db.Index('ix_grading_jobs_status_id', 'status', 'id'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'submissionId': self.submission_id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'error': self.error,
+            'createdAt': self.created_at.isoformat() if self.created_at else None,
+            'startedAt': self.started_at.isoformat() if self.started_at else None,
+            'finishedAt': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class RegradeRun(db.Model):
+    """A regrade of an assessment (or of one of its questions), checkpointed per batch so it can resume."""
+    __tablename__ = 'regrade_runs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    assessment_id = db.Column(db.Integer, db.ForeignKey('assessments.id', ondelete='CASCADE'), nullable=False)
+    question_id = db.Column(db.Integer, nullable=True)  # Only submissions answering this question, if set
+    requested_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    last_submission_id = db.Column(db.Integer, nullable=False, default=0)  # Checkpoint: highest submission id written
+    processed = db.Column(db.Integer, nullable=False, default=0)
+    changes = db.Column(db.JSON, nullable=True)  # List of {submissionId, oldGrade, newGrade}
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Bumped by every checkpoint
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_regrade_runs_status_id', 'status', 'id'),
+    )
+
+    def to_dict(self):
+        changes = self.changes or []
+        return {
+            'id': self.id,
+            'assessmentId': self.assessment_id,
+            'questionId': self.question_id,
+            'status': self.status,
+            'processed': self.processed,
+            'changed': len(changes),
+            'meanChange': round(sum(c['newGrade'] - (c['oldGrade'] or 0) for c in changes) / len(changes), 2) if changes else 0,
+            'changes': changes,
+            'error': self.error,
+            'createdAt': self.created_at.isoformat() if self.created_at else None,
+            'finishedAt': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class EssayGradeCache(db.Model):
+    """A calculate_essay_score result, keyed by a hash of the answer, question and grader version."""
+    __tablename__ = 'essay_grade_cache'
+
+    id = db.Column(db.Integer, primary_key=True)
+    cache_key = db.Column(db.String(64), nullable=False, unique=True)  # See utils.grade_cache.cache_key
+    question_id = db.Column(db.Integer, nullable=False)
+    grader_version = db.Column(db.Integer, nullable=False)
+    result = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_essay_grade_cache_question_id', 'question_id'),
+    )
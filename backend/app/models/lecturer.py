@@ -1,5 +1,6 @@
 from app import db
 from datetime import datetime
+import json
 
 class PlagiarismReport(db.Model):
     __tablename__ = 'plagiarism_reports'
@@ -8,21 +9,33 @@ class PlagiarismReport(db.Model):
     submission_id = db.Column(db.Integer, db.ForeignKey('submissions.id'), nullable=False)
     similarity_score = db.Column(db.Float, nullable=False)
     matched_sources = db.Column(db.Text, nullable=True)  # JSON string of matched sources
+    question_scores = db.Column(db.Text, nullable=True)  # JSON string of per-question scores and sources
+    fingerprint_score = db.Column(db.Float, nullable=True)  # Highest character fingerprint overlap, in percent
+    corpus_score = db.Column(db.Float, nullable=True)  # Highest overlap with the course's other assessments, in percent
+    reference_score = db.Column(db.Float, nullable=True)  # Highest overlap with the course's reference documents, in percent
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     reviewed = db.Column(db.Boolean, default=False)
     reviewed_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     reviewed_at = db.Column(db.DateTime, nullable=True)
     
     # Relationships
-    submission = db.relationship('Submission', backref='plagiarism_report', uselist=False)
+    submission = db.relationship('Submission', backref=db.backref('plagiarism_report', uselist=False))
     reviewer = db.relationship('User', foreign_keys=[reviewed_by], backref='reviewed_plagiarism_reports')
+
+    __table_args__ = (
+        db.UniqueConstraint('submission_id', name='uq_plagiarism_reports_submission_id'),
+    )
     
     def to_dict(self):
         return {
             'id': self.id,
             'submissionId': self.submission_id,
             'similarityScore': self.similarity_score,
-            'matchedSources': self.matched_sources,
+            'fingerprintScore': self.fingerprint_score,
+            'corpusScore': self.corpus_score,
+            'referenceScore': self.reference_score,
+            'matchedSources': json.loads(self.matched_sources) if self.matched_sources else [],
+            'questionScores': json.loads(self.question_scores) if self.question_scores else [],
             'createdAt': self.created_at.isoformat(),
             'reviewed': self.reviewed,
             'reviewedBy': self.reviewed_by,
@@ -0,0 +1,187 @@
+from app import db
+from datetime import datetime
+
+class PlagiarismDocument(db.Model):
+    """One indexed essay answer (a submission's answer to one question)."""
+    __tablename__ = 'plagiarism_documents'
+
+    id = db.Column(db.Integer, primary_key=True)
+    assessment_id = db.Column(db.Integer, db.ForeignKey('assessments.id', ondelete='CASCADE'), nullable=False)
+    submission_id = db.Column(db.Integer, db.ForeignKey('submissions.id', ondelete='CASCADE'), nullable=False)
+    question_id = db.Column(db.Integer, nullable=True)
+    norm = db.Column(db.Float, nullable=False)  # Length of the log-tf vector, used to normalize postings
+    term_count = db.Column(db.Integer, nullable=False)
+    minhash_signature = db.Column(db.JSON, nullable=True)  # List of ints, see utils.minhash
+    preprocessing_version = db.Column(db.Integer, nullable=False, server_default='1')  # text_processing.PREPROCESSING_VERSION of the postings
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    submission = db.relationship('Submission', backref=db.backref('plagiarism_documents', lazy=True, passive_deletes=True))
+
+    __table_args__ = (
+        db.UniqueConstraint('submission_id', 'question_id', name='_plagiarism_document_uc'),
+        db.Index('ix_plagiarism_documents_assessment_id', 'assessment_id'),
+    )
+
+class PlagiarismPosting(db.Model):
+    """Inverted index entry: a term and its normalized weight in one indexed essay."""
+    __tablename__ = 'plagiarism_postings'
+
+    id = db.Column(db.Integer, primary_key=True)
+    assessment_id = db.Column(db.Integer, db.ForeignKey('assessments.id', ondelete='CASCADE'), nullable=False)
+    document_id = db.Column(db.Integer, db.ForeignKey('plagiarism_documents.id', ondelete='CASCADE'), nullable=False)
+    question_id = db.Column(db.Integer, nullable=True)  # Copied from the document so lookups stay within one question
+    term = db.Column(db.String(100), nullable=False)
+    weight = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_plagiarism_postings_assessment_question_term', 'assessment_id', 'question_id', 'term'),
+        db.Index('ix_plagiarism_postings_document_id', 'document_id'),
+    )
+
+class PlagiarismLSHBucket(db.Model):
+    """LSH banding entry: one band of an indexed essay's MinHash signature, hashed to a bucket."""
+    __tablename__ = 'plagiarism_lsh_buckets'
+
+    id = db.Column(db.Integer, primary_key=True)
+    assessment_id = db.Column(db.Integer, db.ForeignKey('assessments.id', ondelete='CASCADE'), nullable=False)
+    document_id = db.Column(db.Integer, db.ForeignKey('plagiarism_documents.id', ondelete='CASCADE'), nullable=False)
+    question_id = db.Column(db.Integer, nullable=True)
+    band = db.Column(db.SmallInteger, nullable=False)
+    bucket = db.Column(db.BigInteger, nullable=False)  # Hash of the band index and its signature rows
+
+    __table_args__ = (
+        db.Index('ix_plagiarism_lsh_buckets_assessment_question_bucket', 'assessment_id', 'question_id', 'bucket'),
+        db.Index('ix_plagiarism_lsh_buckets_document_id', 'document_id'),
+    )
+
+class EssayVector(db.Model):
+    """Hashed term vector of one essay answer, stored as float32 arrays (see utils.hashed_vectors)."""
+    __tablename__ = 'essay_vectors'
+
+    id = db.Column(db.Integer, primary_key=True)
+    assessment_id = db.Column(db.Integer, db.ForeignKey('assessments.id', ondelete='CASCADE'), nullable=False)
+    submission_id = db.Column(db.Integer, db.ForeignKey('submissions.id', ondelete='CASCADE'), nullable=False)
+    question_id = db.Column(db.Integer, nullable=True)
+    features = db.Column(db.Integer, nullable=False)  # Width of the hashing space the vector was built in
+    indices = db.Column(db.LargeBinary, nullable=False)  # int32 feature indexes, ascending
+    weights = db.Column(db.LargeBinary, nullable=False)  # float32 length-normalized log-tf weights
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('submission_id', 'question_id', name='_essay_vector_uc'),
+        db.Index('ix_essay_vectors_assessment_question', 'assessment_id', 'question_id'),
+    )
+
+class EssayFeatureDF(db.Model):
+    """Number of an assessment question's stored essay vectors that contain a hashed feature."""
+    __tablename__ = 'essay_feature_df'
+
+    id = db.Column(db.Integer, primary_key=True)
+    assessment_id = db.Column(db.Integer, db.ForeignKey('assessments.id', ondelete='CASCADE'), nullable=False)
+    question_id = db.Column(db.Integer, nullable=True)
+    feature = db.Column(db.Integer, nullable=False)
+    df = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('assessment_id', 'question_id', 'feature', name='_essay_feature_df_uc'),
+    )
+
+class EssayFingerprint(db.Model):
+    """Winnowed character k-gram fingerprint of one essay answer, with the span it covers."""
+    __tablename__ = 'essay_fingerprints'
+
+    id = db.Column(db.Integer, primary_key=True)
+    assessment_id = db.Column(db.Integer, db.ForeignKey('assessments.id', ondelete='CASCADE'), nullable=False)
+    submission_id = db.Column(db.Integer, db.ForeignKey('submissions.id', ondelete='CASCADE'), nullable=False)
+    question_id = db.Column(db.Integer, nullable=True)
+    hash = db.Column(db.BigInteger, nullable=False)
+    span_start = db.Column(db.Integer, nullable=False)  # Character offsets in the essay's plain text
+    span_end = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_essay_fingerprints_assessment_question_hash', 'assessment_id', 'question_id', 'hash'),
+        db.Index('ix_essay_fingerprints_submission_id', 'submission_id'),
+    )
+
+class CourseCorpusEssay(db.Model):
+    """
+    An essay kept in its course's cross-term plagiarism corpus. Outlives the submission
+    it came from until the corpus retention policy removes it.
+    """
+    __tablename__ = 'course_corpus_essays'
+
+    id = db.Column(db.Integer, primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id', ondelete='CASCADE'), nullable=False)
+    assessment_id = db.Column(db.Integer, nullable=False)
+    submission_id = db.Column(db.Integer, nullable=False)
+    question_id = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_course_corpus_essays_course_created', 'course_id', 'created_at'),
+        db.Index('ix_course_corpus_essays_submission_id', 'submission_id'),
+    )
+
+class CourseCorpusFingerprint(db.Model):
+    """Winnowed fingerprint of a course corpus essay, indexed for lookups across the whole course."""
+    __tablename__ = 'course_corpus_fingerprints'
+
+    id = db.Column(db.Integer, primary_key=True)
+    essay_id = db.Column(db.Integer, db.ForeignKey('course_corpus_essays.id', ondelete='CASCADE'), nullable=False)
+    course_id = db.Column(db.Integer, nullable=False)  # Copied from the essay so lookups need no join
+    hash = db.Column(db.BigInteger, nullable=False)
+    span_start = db.Column(db.Integer, nullable=False)
+    span_end = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_course_corpus_fingerprints_course_hash', 'course_id', 'hash'),
+        db.Index('ix_course_corpus_fingerprints_essay_id', 'essay_id'),
+    )
+
+class ReferenceDocument(db.Model):
+    """A lecturer-registered reference text (lecture notes, model essays) checked against a course's essays."""
+    __tablename__ = 'reference_documents'
+
+    id = db.Column(db.Integer, primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id', ondelete='CASCADE'), nullable=False)
+    path = db.Column(db.String(500), nullable=False)  # Relative to REFERENCE_DOCS_ROOT
+    title = db.Column(db.String(255), nullable=False)
+    size_bytes = db.Column(db.Integer, nullable=False)
+    content_hash = db.Column(db.String(64), nullable=False)  # sha256 of the file, to skip unchanged files
+    fingerprint_count = db.Column(db.Integer, nullable=False, default=0)
+    added_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('course_id', 'path', name='_reference_document_course_path_uc'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'courseId': self.course_id,
+            'path': self.path,
+            'title': self.title,
+            'sizeBytes': self.size_bytes,
+            'fingerprintCount': self.fingerprint_count,
+            'addedBy': self.added_by,
+            'createdAt': self.created_at.isoformat() if self.created_at else None,
+            'updatedAt': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class ReferenceFingerprint(db.Model):
+    """Winnowed fingerprint of a reference document, with its character offsets in the file."""
+    __tablename__ = 'reference_fingerprints'
+
+    id = db.Column(db.Integer, primary_key=True)
+    document_id = db.Column(db.Integer, db.ForeignKey('reference_documents.id', ondelete='CASCADE'), nullable=False)
+    course_id = db.Column(db.Integer, nullable=False)
+    hash = db.Column(db.BigInteger, nullable=False)
+    span_start = db.Column(db.Integer, nullable=False)
+    span_end = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_reference_fingerprints_course_hash', 'course_id', 'hash'),
+        db.Index('ix_reference_fingerprints_document_id', 'document_id'),
+    )
@@ -69,7 +69,7 @@ class User(db.Model):
     department_id = db.Column(db.String(50), db.ForeignKey('departments.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    reset_token = db.Column(db.String(100), nullable=True)
+    reset_token = db.Column(db.String(100), nullable=True, index=True)
     reset_token_expires = db.Column(db.DateTime, nullable=True)
     
     
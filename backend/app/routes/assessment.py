@@ -1,4 +1,3 @@
-from venv import logger
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
@@ -8,10 +7,12 @@ from ..models.assessment import Assessment, AssessmentDraft, Question, QuestionO
 from datetime import datetime
 import json
 
-from ..utils.nlp_grader import calculate_essay_score # Corrected import
-from ..utils.plagiarism_checker import check_plagiarism
+from ..utils.nlp_grader import build_question_artifact
+from ..utils.grading_pipeline import validate_answers, grade_submission, enqueue_grading, grading_is_async
+from ..utils.assessment_stats import record_submission, refresh_stats
 
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
 # Create a Blueprint for assessment routes
 assessment_bp = Blueprint('assessment', __name__)
@@ -38,95 +39,23 @@ def submit_assessment():
     assessment_id = data.get('assessmentId')
     answers_data = data.get('answers', [])
     flagged_questions_data = data.get('flaggedQuestions', [])
-    time_spent_seconds = data.get('timeSpentSeconds', 0)
+    time_spent_seconds = data.get('timeSpentSeconds')
 
     if not assessment_id:
         return jsonify({'error': 'Assessment ID is required'}), 400
 
+    if time_spent_seconds is not None and (
+        not isinstance(time_spent_seconds, int) or isinstance(time_spent_seconds, bool) or time_spent_seconds < 0
+    ):
+        return jsonify({'error': 'Time spent must be a whole number of seconds'}), 400
+
     assessment = Assessment.query.get(assessment_id)
     if not assessment:
         return jsonify({'error': 'Assessment not found'}), 404
 
-    # Check if already submitted
-    existing_submission = Submission.query.filter_by(
-        user_id=user.id,
-        assessment_id=assessment_id
-    ).first()
-
-    if existing_submission:
-        return jsonify({
-            'error': 'Assessment already submitted',
-            'submittedAt': existing_submission.submitted_at.isoformat()
-        }), 403
-
-    total_score_earned = 0
-    plagiarism_scores_list = []
-    essay_contents_for_plagiarism = []
-
-    # Convert assessment.questions to a dictionary for easy lookup
-    assessment_questions_map = {q.id: q for q in assessment.questions}
-
-    for ans_data_item in answers_data:
-        question_id = ans_data_item.get('questionId')
-        question_data = assessment_questions_map.get(question_id)
-
-        if not question_data:
-            return jsonify({'error': f'Question ID {question_id} not found in assessment'}), 400
-
-        question_type = question_data.type
-        max_mark = question_data.marks  # Use maxMark as per assessment data
-
-        if question_type == 'mcq':
-            selected_option_index = ans_data_item.get('selectedOption')
-            options = question_data.options  # Already a list of dicts
-
-            if selected_option_index is None or not isinstance(selected_option_index, int):
-                continue  # Skip invalid or missing MCQ answers
-
-            if 0 <= selected_option_index < len(options):
-                if options[selected_option_index].is_correct:
-                    total_score_earned += max_mark
-            else:
-                return jsonify({'error': f'Invalid selectedOption {selected_option_index} for question {question_id}'}), 400
-
-        elif question_type == 'essay':
-            student_answer_content = ans_data_item.get('content')
-            model_answer_content = question_data.model_answer
-            
-            # Handle keywords as JSON or list of strings/objects
-            keywords = question_data.keywords
-            if isinstance(keywords, str):
-                try:
-                    keywords = json.loads(keywords)
-                except json.JSONDecodeError:
-                    logger.error(f"Failed to parse keywords for question {question_id}")
-                    return jsonify({'error': f'Invalid keywords format for question {question_id}'}), 500
-            keywords = [kw.get('text', kw) if isinstance(kw, dict) else kw for kw in (keywords or [])]
-            word_limit = question_data.word_limit  # Use word_limit as per schema assumption
-
-            if student_answer_content and model_answer_content:
-                try:
-                    essay_grade_result = calculate_essay_score(
-                        student_answer_content,
-                        model_answer_content,
-                        keywords,
-                        max_mark,
-                        word_limit
-                    )
-                    total_score_earned += essay_grade_result['score']
-                    essay_contents_for_plagiarism.append(student_answer_content)
-                except Exception as e:
-                    return jsonify({'error': f'Error grading essay for question {question_id}: {str(e)}'}), 500
-
-    # Perform plagiarism check on collected essay answers
-    overall_plagiarism_score = 0
-    if essay_contents_for_plagiarism:
-        combined_essay_text = " ".join(essay_contents_for_plagiarism)
-        other_submissions = Submission.query.filter(
-            Submission.assessment_id == assessment_id,
-            Submission.user_id != user.id
-        ).all()
-        overall_plagiarism_score = check_plagiarism(None, combined_essay_text, other_submissions)['similarityScore']
+    error = validate_answers(assessment, answers_data)
+    if error:
+        return jsonify({'error': error}), 400
 
     new_submission = Submission(
         user_id=user.id,
@@ -134,24 +63,52 @@ def submit_assessment():
         submitted_at=datetime.utcnow(),
         answers_json=json.dumps(answers_data),
         flagged_questions_json=json.dumps(flagged_questions_data),
-        grade=total_score_earned,
-        plagiarism_score=overall_plagiarism_score,
+        grade=None,
+        plagiarism_score=None,
         lecturer_comments=None,
         flagged_for_review=len(flagged_questions_data) > 0,
         is_late=(datetime.utcnow() > assessment.end_date),
+        time_spent_seconds=time_spent_seconds,
     )
     
     db.session.add(new_submission)
-    StudentProgress.query.filter_by(user_id=user.id, assessment_id=assessment_id).delete()
-        
+    try:
+        # The unique (user_id, assessment_id) constraint turns away a second submission,
+        # including one racing this request
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()
+        existing_submission = Submission.query.filter_by(
+            user_id=user.id,
+            assessment_id=assessment_id
+        ).first()
+        return jsonify({
+            'error': 'Assessment already submitted',
+            'submittedAt': existing_submission.submitted_at.isoformat() if existing_submission else None
+        }), 403
         
     try:
+        StudentProgress.query.filter_by(user_id=user.id, assessment_id=assessment_id).delete()
+        if grading_is_async():
+            # Essay grading and plagiarism checks run in the grading worker; the
+            # frontend polls /api/submissions/<id>/status
+            enqueue_grading(new_submission)
+        else:
+            try:
+                grade_submission(new_submission)
+            except Exception as e:
+                db.session.rollback()
+                return jsonify({'error': f'Error grading submission: {str(e)}'}), 500
+        # Counted with its grade in one stats update, so the stats row stays locked only
+        # for the commit and not for grading
+        record_submission(new_submission)
         db.session.commit()
 
         return jsonify({
             'message': 'Assessment submitted successfully',
             'success': True,
-            'submissionId': new_submission.id
+            'submissionId': new_submission.id,
+            'gradingStatus': new_submission.grading_status
         }), 200
 
     except Exception as e:
@@ -308,6 +265,7 @@ def create_assessment():
                 question.model_answer = q_data.get('modelAnswer', '')
                 question.keywords = json.dumps(q_data.get('keywords', []))
                 question.word_limit = q_data.get('wordLimit', 500)
+                question.grading_artifact = build_question_artifact(question.model_answer, q_data.get('keywords', []))
             
             new_assessment.questions.append(question)
             
@@ -336,16 +294,16 @@ def create_assessment():
 @assessment_bp.route('/<int:assessment_id>', methods=['PUT'])
 @jwt_required()
 def update_assessment(assessment_id):
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    current_user_uuid = get_jwt_identity()
+    user = User.query.filter_by(uuid=current_user_uuid).first()
     
-    if user.role != 'lecturer':
+    if not user or user.role != 'lecturer':
         return jsonify({'error': 'Only lecturers can update assessments'}), 403
     
     assessment = Assessment.query.get_or_404(assessment_id)
     
     # Check if user is allowed to update this assessment
-    if assessment.course.lecturer_id != user_id:
+    if assessment.course.lecturer_id != user.id:
         return jsonify({'error': 'You are not authorized to update this assessment'}), 403
     
     data = request.get_json()
@@ -366,7 +324,9 @@ def update_assessment(assessment_id):
     # Handle questions (more complex, would need to be implemented based on your needs)
     # For simplicity, let's assume we're replacing all questions
     if 'questions' in data:
-        # Delete existing questions
+        # Delete existing questions, their options first
+        question_ids = select(Question.id).where(Question.assessment_id == assessment_id)
+        QuestionOption.query.filter(QuestionOption.question_id.in_(question_ids)).delete(synchronize_session=False)
         Question.query.filter_by(assessment_id=assessment_id).delete()
         
         # Add new questions
@@ -376,7 +336,7 @@ def update_assessment(assessment_id):
                 text=q_data['text'],
                 type=q_data['type'],
                 marks=q_data.get('maxMark', 0),
-                created_by=user_id,
+                created_by=user.id,
                 difficulty='medium',
             )
             
@@ -384,6 +344,7 @@ def update_assessment(assessment_id):
                 question.word_limit = q_data.get('wordLimit', 500)
                 question.model_answer = q_data.get('modelAnswer', '')
                 question.keywords = json.dumps(q_data.get('keywords', []))
+                question.grading_artifact = build_question_artifact(question.model_answer, q_data.get('keywords', []))
             
             db.session.add(question)
             db.session.flush()
@@ -400,6 +361,8 @@ def update_assessment(assessment_id):
         
         # Update total marks
         assessment.total_marks = sum(q.get('maxMark', 0) for q in data['questions'])
+        # Score buckets are percentages of the total marks
+        refresh_stats([assessment.id])
     
     db.session.commit()
     
@@ -411,16 +374,16 @@ def update_assessment(assessment_id):
 @assessment_bp.route('/<int:assessment_id>', methods=['DELETE'])
 @jwt_required()
 def delete_assessment(assessment_id):
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    current_user_uuid = get_jwt_identity()
+    user = User.query.filter_by(uuid=current_user_uuid).first()
     
-    if user.role != 'lecturer':
+    if not user or user.role != 'lecturer':
         return jsonify({'error': 'Only lecturers can delete assessments'}), 403
     
     assessment = Assessment.query.get_or_404(assessment_id)
     
     # Check if user is allowed to delete this assessment
-    if assessment.course.lecturer_id != user_id:
+    if assessment.course.lecturer_id != user.id:
         return jsonify({'error': 'You are not authorized to delete this assessment'}), 403
     
     db.session.delete(assessment)
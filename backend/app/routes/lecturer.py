@@ -1,10 +1,22 @@
 from venv import logger
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import func
+from sqlalchemy.orm import contains_eager, joinedload, selectinload
 from app import db
 from ..models.user import User, Course, student_courses
 from ..models.assessment import Assessment, Question, QuestionOption, Submission, AssessmentDraft, StudentProgress
 from ..models.lecturer import PlagiarismReport, StudentEngagement
+from ..models.grading import RegradeRun
+from ..utils.nlp_grader import build_question_artifact
+from ..utils.similarity_matrix import similarity_graph
+from ..utils.analytics import SCORE_BUCKET_LABELS
+from ..utils.assessment_stats import load_stats
+from ..utils.grading_pipeline import grading_is_async
+from ..utils.regrade import start_regrade, run_regrade
+from ..models.plagiarism import ReferenceDocument
+from ..utils.reference_corpus import ReferencePathError, add_references, remove_reference
+from collections import defaultdict
 from datetime import datetime, timedelta
 import json
 import random
@@ -19,51 +31,75 @@ def lecturer_dashboard():
     if not user or user.role != 'lecturer':
         return jsonify({'message': 'Lecturer access required'}), 403
 
-    # Get courses taught by this lecturer
-    taught_courses = user.lectured_courses
+    # A fixed handful of queries however many courses and submissions the lecturer has:
+    # the lists below are sorted and limited in SQL, with what they render eager-loaded
+    taught_courses = Course.query.filter_by(lecturer_id=user.id).order_by(Course.id).all()
+    course_ids = [course.id for course in taught_courses]
+
+    # Active and completed assessments (past deadline), with their course joined in
+    now = datetime.utcnow()
+    assessments = (
+        Assessment.query
+        .options(joinedload(Assessment.course))
+        .filter(Assessment.course_id.in_(course_ids))
+        .order_by(Assessment.course_id, Assessment.id)
+        .all()
+    ) if course_ids else []
+    # Submission counts and results from the maintained assessment_stats rows
+    stats = load_stats(a.id for a in assessments)
+    active_assessments = [dict(a.to_dict(), stats=stats[a.id]) for a in assessments if a.end_date >= now]
+    completed_assessments = [dict(a.to_dict(), stats=stats[a.id]) for a in assessments if a.end_date < now]
 
-    # Active Assessments
-    active_assessments = []
-    for course in taught_courses:
-        for assessment in course.assessments:
-            if assessment.end_date >= datetime.utcnow():
-                active_assessments.append(assessment.to_dict())
+    # Recent Submissions (for assessments taught by this lecturer)
+    recent_submissions = [
+        submission.to_dict() for submission in (
+            Submission.query
+            .join(Submission.assessment)
+            .options(
+                contains_eager(Submission.assessment).joinedload(Assessment.course),
+                joinedload(Submission.user)
+            )
+            .filter(Assessment.course_id.in_(course_ids))
+            .order_by(Submission.submitted_at.desc(), Submission.id.desc())
+            .limit(5)
+            .all()
+        )
+    ] if course_ids else []
 
-    # Completed Assessments (past deadline)
-    completed_assessments = []
-    for course in taught_courses:
-        for assessment in course.assessments:
-            if assessment.end_date < datetime.utcnow():
-                completed_assessments.append(assessment.to_dict())
+    # Plagiarism Alerts: submissions scoring above their assessment's similarity threshold
+    plagiarism_alerts = [
+        {
+            'submissionId': submission.id,
+            'assessmentTitle': submission.assessment.title,
+            'studentName': submission.user.first_name + ' ' + submission.user.last_name,
+            'similarityScore': submission.plagiarism_score,
+            'submittedAt': submission.submitted_at.isoformat()
+        }
+        for submission in (
+            Submission.query
+            .join(Submission.assessment)
+            .options(contains_eager(Submission.assessment), joinedload(Submission.user))
+            .filter(
+                Assessment.course_id.in_(course_ids),
+                Submission.plagiarism_score > Assessment.similarity_threshold
+            )
+            .order_by(Submission.submitted_at.desc(), Submission.id.desc())
+            .limit(5)
+            .all()
+        )
+    ] if course_ids else []
 
-    # Recent Submissions (for assessments taught by this lecturer)
-    recent_submissions = []
-    for course in taught_courses:
-        for assessment in course.assessments:
-            for submission in assessment.submissions:
-                recent_submissions.append(submission.to_dict())
-    recent_submissions.sort(key=lambda x: x['submittedAt'], reverse=True)
-    recent_submissions = recent_submissions[:5] # Limit to 5 recent
-
-    # Plagiarism Alerts (for assessments taught by this lecturer)
-    plagiarism_alerts = []
-    for course in taught_courses:
-        for assessment in course.assessments:
-            for submission in assessment.submissions:
-                if submission.plagiarism_score and submission.plagiarism_score > assessment.similarity_threshold:
-                    plagiarism_alerts.append({
-                        'submissionId': submission.id,
-                        'assessmentTitle': assessment.title,
-                        'studentName': submission.user.first_name + ' ' + submission.user.last_name,
-                        'similarityScore': submission.plagiarism_score,
-                        'submittedAt': submission.submitted_at.isoformat()
-                    })
-    plagiarism_alerts.sort(key=lambda x: x['submittedAt'], reverse=True)
-    plagiarism_alerts = plagiarism_alerts[:5] # Limit to 5 recent
+    total_students = (
+        db.session.query(func.count())
+        .select_from(student_courses)
+        .join(User, User.id == student_courses.c.student_id)
+        .filter(student_courses.c.course_id.in_(course_ids), User.role == 'student')
+        .scalar()
+    ) if course_ids else 0
 
     # Student Engagement (Mocked for now)
     student_engagement_summary = {
-        'totalStudents': sum(len(c.students) for c in taught_courses),
+        'totalStudents': total_students,
         'averageEngagementScore': random.uniform(60, 90),
         'topEngagedStudents': [
             {'name': 'Alice Smith', 'score': 95},
@@ -142,7 +178,10 @@ def get_submissions_for_assessment(assessment_id):
     if assessment.created_by != user.id and assessment.course_id not in [c.id for c in user.lectured_courses]:
         return jsonify({'message': 'Unauthorized to view submissions for this assessment'}), 403
 
-    submissions = [sub.to_dict() for sub in assessment.submissions]
+    submissions = [
+        sub.to_dict() for sub in
+        Submission.query.options(joinedload(Submission.user)).filter_by(assessment_id=assessment.id).all()
+    ]
     return jsonify(submissions), 200
 
 @lecturer_bp.route('/assessments/<int:assessment_id>/analytics', methods=['GET'])
@@ -161,26 +200,8 @@ def get_assessment_analytics(assessment_id):
     if assessment.created_by != user.id and assessment.course_id not in [c.id for c in user.lectured_courses]:
         return jsonify({'message': 'Unauthorized to view analytics for this assessment'}), 403
 
-    # Mock analytics data for now
-    scores = [sub.grade for sub in assessment.submissions if sub.grade is not None]
-    
-    class_average = sum(scores) / len(scores) if scores else 0
-    
-    score_distribution_labels = ['0-20%', '21-40%', '41-60%', '61-80%', '81-100%']
-    score_distribution_data = [0, 0, 0, 0, 0]
-    
-    for score in scores:
-        percentage = (score / assessment.total_marks) * 100 if assessment.total_marks else 0
-        if 0 <= percentage <= 20:
-            score_distribution_data[0] += 1
-        elif 21 <= percentage <= 40:
-            score_distribution_data[1] += 1
-        elif 41 <= percentage <= 60:
-            score_distribution_data[2] += 1
-        elif 61 <= percentage <= 80:
-            score_distribution_data[3] += 1
-        elif 81 <= percentage <= 100:
-            score_distribution_data[4] += 1
+    # Class average, score distribution and time spent, kept up to date in assessment_stats
+    summary = load_stats([assessment.id])[assessment.id]
 
     # Mock topic mastery data
     topic_mastery_data = [
@@ -207,14 +228,15 @@ def get_assessment_analytics(assessment_id):
     }
 
     return jsonify({
-        'classAverage': class_average,
+        'classAverage': summary['classAverage'],
         'scoreDistribution': {
-            'labels': score_distribution_labels,
-            'data': score_distribution_data
+            'labels': SCORE_BUCKET_LABELS,
+            'data': summary['scoreDistribution']
         },
         'topicMasteryData': topic_mastery_data,
-        'totalSubmissions': len(scores),
-        'averageTimeSpent': sum(s.time_spent_seconds for s in assessment.submissions if s.time_spent_seconds is not None) / len(assessment.submissions) if assessment.submissions else 0,
+        'totalSubmissions': summary['graded'],
+        'lateSubmissions': summary['lateSubmissions'],
+        'averageTimeSpent': summary['averageTimeSpent'],
         'plagiarismSummary': plagiarism_summary, # Added mock data
         'nlpInsights': nlp_insights # Added mock data
     }), 200
@@ -248,6 +270,10 @@ def get_plagiarism_alerts():
             Submission.query
             .join(Assessment, Submission.assessment_id == Assessment.id)
             .join(Course, Assessment.course_id == Course.id)
+            .options(
+                contains_eager(Submission.assessment).contains_eager(Assessment.course),
+                joinedload(Submission.user)
+            )
             .filter(
                 Course.id.in_(lecturer_course_ids),
                 Submission.plagiarism_score.isnot(None)
@@ -288,6 +314,168 @@ def get_plagiarism_alerts():
         return jsonify({"msg": f"Failed to fetch plagiarism alerts: {str(e)}"}), 500
     
     
+@lecturer_bp.route('/assessments/<int:assessment_id>/similarity-matrix', methods=['GET'])
+@jwt_required()
+def get_similarity_matrix(assessment_id):
+    """
+    All-pairs essay similarity for one assessment: the pairs of students' essays above the
+    assessment's cosine_similarity_threshold and the clusters of submissions they link.
+    Optional query parameter: topK (most similar essays kept per essay).
+    """
+    current_user_uuid = get_jwt_identity()
+    user = User.query.filter_by(uuid=current_user_uuid).first()
+    if not user or user.role != 'lecturer':
+        return jsonify({'message': 'Lecturer access required'}), 403
+
+    assessment = Assessment.query.get(assessment_id)
+    if not assessment:
+        return jsonify({'message': 'Assessment not found'}), 404
+
+    # Ensure the lecturer created this assessment or teaches its course
+    if assessment.created_by != user.id and assessment.course_id not in [c.id for c in user.lectured_courses]:
+        return jsonify({'message': 'Unauthorized to view plagiarism for this assessment'}), 403
+
+    try:
+        top_k = request.args.get('topK', type=int)
+        return jsonify(similarity_graph(assessment, top_k=top_k)), 200
+    except Exception as e:
+        logger.error(f"Error computing similarity matrix for assessment {assessment_id}: {str(e)}", exc_info=True)
+        return jsonify({'message': f'Failed to compute similarity matrix: {str(e)}'}), 500
+
+
+@lecturer_bp.route('/assessments/<int:assessment_id>/regrade', methods=['POST'])
+@jwt_required()
+def regrade_assessment(assessment_id):
+    """
+    Recomputes the automatic grades of an assessment's submissions, or only of those that
+    answered `questionId`, e.g. after editing a model answer. Grades move by the change
+    in the automatic scores, so manual adjustments are kept. Queued for the grading
+    worker when GRADING_ASYNC is set.
+    """
+    current_user_uuid = get_jwt_identity()
+    user = User.query.filter_by(uuid=current_user_uuid).first()
+    if not user or user.role != 'lecturer':
+        return jsonify({'message': 'Lecturer access required'}), 403
+
+    assessment = Assessment.query.get(assessment_id)
+    if not assessment:
+        return jsonify({'message': 'Assessment not found'}), 404
+
+    # Ensure the lecturer created this assessment or teaches its course
+    if assessment.created_by != user.id and assessment.course_id not in [c.id for c in user.lectured_courses]:
+        return jsonify({'message': 'Unauthorized to regrade this assessment'}), 403
+
+    data = request.get_json(silent=True) or {}
+    question_id = data.get('questionId')
+    if question_id is not None and question_id not in [q.id for q in assessment.questions]:
+        return jsonify({'message': f'Question ID {question_id} not found in assessment'}), 400
+
+    try:
+        run = start_regrade(assessment.id, question_id, requested_by=user.id)
+        db.session.commit()
+        if grading_is_async():
+            return jsonify(run.to_dict()), 202
+        return jsonify(run_regrade(run).to_dict()), 200
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error regrading assessment {assessment_id}: {str(e)}", exc_info=True)
+        return jsonify({'message': f'Failed to regrade assessment: {str(e)}'}), 500
+
+@lecturer_bp.route('/regrade-runs/<int:run_id>', methods=['GET'])
+@jwt_required()
+def get_regrade_run(run_id):
+    """Progress and grade-change report of a regrade run."""
+    current_user_uuid = get_jwt_identity()
+    user = User.query.filter_by(uuid=current_user_uuid).first()
+    if not user or user.role != 'lecturer':
+        return jsonify({'message': 'Lecturer access required'}), 403
+
+    run = RegradeRun.query.get(run_id)
+    if not run:
+        return jsonify({'message': 'Regrade run not found'}), 404
+
+    assessment = Assessment.query.get(run.assessment_id)
+    if assessment.created_by != user.id and assessment.course_id not in [c.id for c in user.lectured_courses]:
+        return jsonify({'message': 'Unauthorized to view this regrade run'}), 403
+
+    return jsonify(run.to_dict()), 200
+
+
+@lecturer_bp.route('/courses/<int:course_id>/reference-documents', methods=['GET'])
+@jwt_required()
+def get_reference_documents(course_id):
+    """Reference texts registered for a course's plagiarism checks."""
+    current_user_uuid = get_jwt_identity()
+    user = User.query.filter_by(uuid=current_user_uuid).first()
+    if not user or user.role != 'lecturer':
+        return jsonify({'message': 'Lecturer access required'}), 403
+
+    course = Course.query.get(course_id)
+    if not course:
+        return jsonify({'message': 'Course not found'}), 404
+    if course.lecturer_id != user.id:
+        return jsonify({'message': 'Unauthorized to view reference documents for this course'}), 403
+
+    documents = ReferenceDocument.query.filter_by(course_id=course_id).order_by(ReferenceDocument.path).all()
+    return jsonify([document.to_dict() for document in documents]), 200
+
+
+@lecturer_bp.route('/courses/<int:course_id>/reference-documents', methods=['POST'])
+@jwt_required()
+def add_reference_documents(course_id):
+    """
+    Registers reference texts (lecture notes, model essays) for a course from `path`, a
+    file or directory relative to the server's REFERENCE_DOCS_ROOT. Files are indexed
+    once; registering the same path again only re-indexes files that changed.
+    """
+    current_user_uuid = get_jwt_identity()
+    user = User.query.filter_by(uuid=current_user_uuid).first()
+    if not user or user.role != 'lecturer':
+        return jsonify({'message': 'Lecturer access required'}), 403
+
+    course = Course.query.get(course_id)
+    if not course:
+        return jsonify({'message': 'Course not found'}), 404
+    if course.lecturer_id != user.id:
+        return jsonify({'message': 'Unauthorized to add reference documents to this course'}), 403
+
+    data = request.get_json(silent=True) or {}
+    if not data.get('path'):
+        return jsonify({'message': 'path is required'}), 400
+
+    try:
+        results = add_references(course_id, data['path'], added_by=user.id)
+    except ReferencePathError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error adding reference documents to course {course_id}: {str(e)}", exc_info=True)
+        return jsonify({'message': f'Failed to add reference documents: {str(e)}'}), 500
+
+    return jsonify([dict(document.to_dict(), indexed=indexed) for document, indexed in results]), 201
+
+
+@lecturer_bp.route('/reference-documents/<int:document_id>', methods=['DELETE'])
+@jwt_required()
+def delete_reference_document(document_id):
+    current_user_uuid = get_jwt_identity()
+    user = User.query.filter_by(uuid=current_user_uuid).first()
+    if not user or user.role != 'lecturer':
+        return jsonify({'message': 'Lecturer access required'}), 403
+
+    document = ReferenceDocument.query.get(document_id)
+    if not document:
+        return jsonify({'message': 'Reference document not found'}), 404
+    course = Course.query.get(document.course_id)
+    if not course or course.lecturer_id != user.id:
+        return jsonify({'message': 'Unauthorized to delete this reference document'}), 403
+
+    remove_reference(document)
+    db.session.commit()
+    return jsonify({'message': 'Reference document deleted'}), 200
+
+
 @lecturer_bp.route('/assessments', methods=['GET', 'OPTIONS'])
 @jwt_required()
 def get_all_assessments():
@@ -315,6 +503,8 @@ def get_all_assessments():
             .filter(Course.id.in_(lecturer_course_ids))
             .all()
         )
+        # Submission counts for every assessment from assessment_stats, in one query
+        stats = load_stats(a.id for a in assessments)
 
         current_time = datetime.utcnow()
         assessments_data = []
@@ -328,8 +518,7 @@ def get_all_assessments():
                 else "completed"
             )
 
-            # Count submissions for this assessment
-            submission_count = Submission.query.filter_by(assessment_id=assessment.id).count()
+            assessment_stats = stats[assessment.id]
 
             # Get total students in the course (assuming course.students is a relationship)
             total_students = len(assessment.course.students) if hasattr(assessment.course, 'students') and assessment.course.students else 0
@@ -356,7 +545,9 @@ def get_all_assessments():
                 "shuffleOptions": bool(assessment.shuffle_options),
                 "createdAt": assessment.created_at.isoformat() if assessment.created_at and hasattr(assessment.created_at, 'isoformat') else None,
                 "status": status,
-                "submissions": submission_count,
+                "submissions": assessment_stats['submissions'],
+                "lateSubmissions": assessment_stats['lateSubmissions'],
+                "classAverage": assessment_stats['classAverage'],
                 "totalStudents": total_students
             }
             logger.debug(f"Assessment data for ID {assessment.id}: {assessment_data}")
@@ -406,6 +597,10 @@ def get_questions():
             Question.query
             .join(Assessment, Question.assessment_id == Assessment.id)
             .join(Course, Assessment.course_id == Course.id)
+            .options(
+                contains_eager(Question.assessment).contains_eager(Assessment.course),
+                selectinload(Question.options)
+            )
             .filter(Course.id.in_(lecturer_course_ids))
         )
 
@@ -524,6 +719,8 @@ def create_question():
             model_answer=data.get('modelAnswer') if data['type'] == 'essay' else None,
             keywords=keywords_json
         )
+        if question.type == 'essay':
+            question.grading_artifact = build_question_artifact(question.model_answer, keywords)
         db.session.add(question)
         db.session.flush()  # Get question.id for options
 
@@ -632,6 +829,7 @@ def update_question(question_id):
         question.word_limit = data.get('wordLimit') if data['type'] == 'essay' else None
         question.model_answer = data.get('modelAnswer') if data['type'] == 'essay' else None
         question.keywords = keywords_json
+        question.grading_artifact = build_question_artifact(question.model_answer, keywords) if data['type'] == 'essay' else None
         question.created_at = datetime.utcnow()
 
         # Update options for MCQ
@@ -740,27 +938,50 @@ def get_all_students():
         .all()
     )
 
+    student_ids = [student.id for student in students]
+
+    # Enrolled courses, submission totals and engagement for all students at once
+    enrolled_codes = defaultdict(list)
+    for student_id, code in (
+        db.session.query(student_courses.c.student_id, Course.code)
+        .join(Course, Course.id == student_courses.c.course_id)
+        .filter(student_courses.c.student_id.in_(student_ids))
+        .all()
+    ):
+        enrolled_codes[student_id].append(code)
+    submission_totals = {
+        user_id: (count, grade_sum)
+        for user_id, count, grade_sum in db.session.query(
+            Submission.user_id, func.count(Submission.id), func.sum(Submission.grade)
+        )
+        .filter(Submission.user_id.in_(student_ids))
+        .group_by(Submission.user_id)
+        .all()
+    }
+    engagements = {}
+    for engagement in (
+        StudentEngagement.query
+        .filter(StudentEngagement.user_id.in_(student_ids))
+        .order_by(StudentEngagement.id.desc())
+        .all()
+    ):
+        engagements[engagement.user_id] = engagement
+
     # Prepare response
     students_data = []
     for student in students:
         # Get enrolled courses for this student
-        enrolled_courses = [
-            course.code for course in Course.query
-            .join(student_courses, Course.id == student_courses.c.course_id)
-            .filter(student_courses.c.student_id == student.id)
-            .all()
-        ]
+        enrolled_courses = enrolled_codes[student.id]
 
         # Calculate total assessments taken and average score
-        submissions = Submission.query.filter_by(user_id=student.id).all()
-        total_assessments = len(submissions)
+        total_assessments, grade_sum = submission_totals.get(student.id, (0, None))
         average_score = (
-            sum(sub.grade for sub in submissions if sub.grade is not None) / total_assessments
+            (grade_sum or 0) / total_assessments
             if total_assessments > 0 else 0.0
         )
 
         # Determine status based on last activity (e.g., active if engaged in last 30 days)
-        engagement = StudentEngagement.query.filter_by(user_id=student.id).first()
+        engagement = engagements.get(student.id)
         status = (
             'Active'
             if engagement and engagement.last_active >= datetime.utcnow() - timedelta(days=30)
@@ -826,6 +1047,7 @@ def get_student_details(student_id):
         Submission.query
         .join(Assessment, Submission.assessment_id == Assessment.id)
         .join(Course, Assessment.course_id == Course.id)
+        .options(contains_eager(Submission.assessment).contains_eager(Assessment.course))
         .filter(Submission.user_id == student.id)
         .all()
     )
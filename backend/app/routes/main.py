@@ -59,3 +59,8 @@ def update_profile():
 @main.route('/health', methods=['GET'])
 def health_check():
     return jsonify({'status': 'healthy', 'message': 'API is running'}), 200
+
+@main.route('/health/nlp-cache', methods=['GET'])
+def nlp_cache_stats():
+    from ..utils.text_processing import cache_stats
+    return jsonify(cache_stats()), 200
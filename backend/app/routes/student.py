@@ -1,10 +1,11 @@
 from venv import logger
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models.user import User, Course
+from app.models.user import User
 from app.models.assessment import Assessment, Question, Submission, StudentProgress
 from app import db
 from sqlalchemy import desc, func
+from sqlalchemy.orm import joinedload
 from datetime import datetime, timedelta
 import random # For mock data
 
@@ -49,23 +50,32 @@ def get_upcoming_assessments(user):
         
         # Get assessments that haven't passed their deadline
         # limit to 6 most recent upcoming assessments
-        assessment_records = Assessment.query.filter(
+        assessment_records = Assessment.query.options(joinedload(Assessment.course)).filter(
             Assessment.course_id.in_(course_ids),
             Assessment.end_date > datetime.utcnow()
         ).order_by(Assessment.end_date.asc()).limit(6).all()
+        assessment_ids = [assessment.id for assessment in assessment_records]
+
+        # The student's progress and submissions for all of them, one query each
+        progress_by_assessment = {
+            progress.assessment_id: progress for progress in StudentProgress.query.filter(
+                StudentProgress.user_id == user.id,
+                StudentProgress.assessment_id.in_(assessment_ids)
+            ).all()
+        }
+        submitted_ids = {
+            row.assessment_id for row in db.session.query(Submission.assessment_id).filter(
+                Submission.user_id == user.id,
+                Submission.assessment_id.in_(assessment_ids)
+            ).all()
+        }
         
         for assessment in assessment_records:
             # Check if student has started this assessment
-            progress = StudentProgress.query.filter_by(
-                user_id=user.id, 
-                assessment_id=assessment.id
-            ).first()
+            progress = progress_by_assessment.get(assessment.id)
             
             # Check if student has submitted this assessment
-            submission = Submission.query.filter_by(
-                user_id=user.id,
-                assessment_id=assessment.id
-            ).first()
+            submission = assessment.id in submitted_ids
             
             # Calculate days until deadline
             days_remaining = (assessment.end_date - datetime.utcnow()).days
@@ -143,21 +153,25 @@ def get_performance_data(user_id):
             else:
                 logger.debug(f"Submission {submission.id} for user {user_id} has no grade")
 
+        # Class average grade of every assessment involved, in one grouped query
+        assessment_ids = set().union(*(data['assessment_ids'] for data in weeks.values()))
+        class_averages = dict(
+            db.session.query(Submission.assessment_id, func.avg(Submission.grade))
+            .filter(
+                Submission.assessment_id.in_(assessment_ids),
+                Submission.submitted_at > six_weeks_ago,
+                Submission.grade.isnot(None)
+            )
+            .group_by(Submission.assessment_id)
+            .all()
+        )
+
         # Calculate class averages for each assessment
         for week_key, data in weeks.items():
             week_class_scores = []
             for assessment_id in data['assessment_ids']:
-                # Query all submissions for this assessment
-                assessment_submissions = Submission.query.filter(
-                    Submission.assessment_id == assessment_id,
-                    Submission.submitted_at > six_weeks_ago
-                ).all()
-                
-                # Calculate average grade for the assessment
-                valid_grades = [s.grade for s in assessment_submissions if s.grade is not None]
-                if valid_grades:
-                    assessment_avg = sum(valid_grades) / len(valid_grades)
-                    week_class_scores.append(assessment_avg)
+                if assessment_id in class_averages:
+                    week_class_scores.append(class_averages[assessment_id])
                 else:
                     logger.debug(f"No valid grades for assessment {assessment_id} in week {week_key}")
 
@@ -190,7 +204,9 @@ def get_recent_results(user_id):
     try:
         results = []
         # Get the 5 most recent submissions with a non-null grade
-        submissions = Submission.query.filter(
+        submissions = Submission.query.options(
+            joinedload(Submission.assessment).joinedload(Assessment.course)
+        ).filter(
             Submission.user_id == user_id,
             Submission.grade.isnot(None)  # Filter for graded submissions
         ).order_by(Submission.submitted_at.desc()).limit(5).all()
@@ -200,12 +216,12 @@ def get_recent_results(user_id):
             return []
 
         for submission in submissions:
-            assessment = Assessment.query.get(submission.assessment_id)
+            assessment = submission.assessment
             if not assessment:
                 logger.warning(f"Assessment {submission.assessment_id} not found for submission {submission.id}")
                 continue
 
-            course = Course.query.get(assessment.course_id) if assessment.course_id else None
+            course = assessment.course
             course_code = course.code if course else "Unknown"
 
             results.append({
@@ -265,20 +281,22 @@ def dashboard_summary():
     if not user or user.role != 'student':
         return jsonify({"msg": "Student access required"}), 403
 
-    # Total assessments available
-    total_assessments = Assessment.query.filter_by(is_published=True).count()
+    # Total assessments in the student's courses (assessments have no published flag)
+    course_ids = [course.id for course in user.registered_courses]
+    total_assessments = Assessment.query.filter(Assessment.course_id.in_(course_ids)).count() if course_ids else 0
 
     # Assessments completed
     completed_assessments = Submission.query.filter_by(user_id=user.id).count()
 
     # Recent results (last 3 completed assessments)
-    recent_results = Submission.query.filter_by(user_id=user.id)\
+    recent_results = Submission.query.options(joinedload(Submission.assessment))\
+        .filter_by(user_id=user.id)\
         .order_by(desc(Submission.submitted_at))\
         .limit(3).all()
 
     results_summary = []
     for submission in recent_results:
-        assessment = Assessment.query.get(submission.assessment_id)
+        assessment = submission.assessment
         if assessment:
             results_summary.append({
                 "assessmentTitle": assessment.title,
@@ -463,8 +481,15 @@ def get_student_results_list():
     if not user or user.role != 'student':
         return jsonify({'message': 'Student access required'}), 403
 
+    submissions = (
+        Submission.query
+        .options(joinedload(Submission.assessment).joinedload(Assessment.course))
+        .filter_by(user_id=user.id)
+        .all()
+    )
+
     submissions_list = []
-    for submission in user.submissions:
+    for submission in submissions:
         assessment = submission.assessment
         if assessment:
             submissions_list.append({
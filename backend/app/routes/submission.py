@@ -5,7 +5,9 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
 from ..models.user import User, Course
 from ..models.assessment import Assessment, Submission, Question, QuestionOption, StudentProgress
-from ..utils.nlp_grader import calculate_essay_score # Corrected import
+from ..utils.answer_results import load_answer_results
+from ..utils.analytics import SCORE_BUCKET_LABELS, assessment_summary
+from ..utils.assessment_stats import record_grade_changes
 from ..utils.plagiarism_checker import check_plagiarism
 import json
 import random # For mock data
@@ -69,6 +71,14 @@ def get_submission_details(submission_id):
         # Map assessment questions for easy lookup
         assessment_questions_map = {q.id: q for q in assessment.questions}
 
+        # Essay results were stored when the submission was graded (`flask grading
+        # backfill-results` stores them for older submissions)
+        essay_results = {
+            question_id: {'score': row.score, 'nlpInsights': row.nlp_insights or {}}
+            for (_, question_id), row in load_answer_results([submission.id]).items()
+            if row.question_type == 'essay'
+        }
+
         for ans_data_item in student_answers_parsed:
             question_id = ans_data_item.get('questionId')
             original_question = assessment_questions_map.get(question_id)
@@ -116,28 +126,14 @@ def get_submission_details(submission_id):
                 mapped_answer['isCorrect'] = (student_selected_option_text == correct_option_text)
 
             elif question_type == 'essay':
-                student_essay_content = ans_data_item.get('content')
-                model_answer_content = original_question.model_answer
-                word_limit = original_question.word_limit
-                
-                essay_nlp_result = {}
-                if student_essay_content and model_answer_content:
-                    try:
-                        essay_nlp_result = calculate_essay_score(
-                            student_essay_content,
-                            model_answer_content,
-                            keywords,
-                            max_mark,
-                            word_limit
-                        )
-                        nlp_insights_summary['overallMatchPercentage'] += essay_nlp_result['nlpInsights']['overallMatchPercentage']
-                        nlp_insights_summary['matchedKeywords'].extend(essay_nlp_result['nlpInsights']['matchedKeywords'])
-                        nlp_insights_summary['missingKeywords'].extend(essay_nlp_result['nlpInsights']['missingKeywords'])
-                        nlp_insights_summary['readabilityScore'] += essay_nlp_result['nlpInsights']['readabilityScore']
-                        total_essay_questions_graded += 1
-                        total_essay_score_sum += essay_nlp_result['score']
-                    except Exception as e:
-                        logger.error(f"Error grading essay for question {question_id}: {str(e)}", exc_info=True)
+                essay_nlp_result = essay_results.get(question_id, {})
+                if essay_nlp_result:
+                    nlp_insights_summary['overallMatchPercentage'] += essay_nlp_result['nlpInsights']['overallMatchPercentage']
+                    nlp_insights_summary['matchedKeywords'].extend(essay_nlp_result['nlpInsights']['matchedKeywords'])
+                    nlp_insights_summary['missingKeywords'].extend(essay_nlp_result['nlpInsights']['missingKeywords'])
+                    nlp_insights_summary['readabilityScore'] += essay_nlp_result['nlpInsights']['readabilityScore']
+                    total_essay_questions_graded += 1
+                    total_essay_score_sum += essay_nlp_result['score']
                 
                 mapped_answer['nlpAnalysis'] = essay_nlp_result.get('nlpInsights', {})
 
@@ -158,28 +154,45 @@ def get_submission_details(submission_id):
                 'neutral'
             )
 
-        # Calculate real plagiarism report (remove mock data)
-        plagiarism_report_data = {
-            'similarityScore': submission.plagiarism_score or 0,
-            'details': 'Plagiarism report not available' if not submission.plagiarism_score else 'Plagiarism check completed',
-            'flaggedSources': []
-        }
+        # Plagiarism report as stored when the submission was checked
+        report = submission.plagiarism_report
+        if report:
+            report_dict = report.to_dict()
+            flagged_sources = report_dict['matchedSources']
+            question_scores = report_dict['questionScores']
+            if not is_lecturer_of_course:
+                # Students see how much of their work matched, not whose
+                flagged_sources = [{'percentage': s['percentage']} for s in flagged_sources]
+                question_scores = [
+                    {'questionId': q['questionId'], 'similarityScore': q['similarityScore']}
+                    for q in question_scores
+                ]
+            plagiarism_report_data = {
+                'similarityScore': report.similarity_score,
+                'fingerprintScore': report.fingerprint_score,
+                'corpusScore': report.corpus_score,
+                'referenceScore': report.reference_score,
+                'details': 'Plagiarism check completed',
+                'flaggedSources': flagged_sources,
+                'questionScores': question_scores,
+                'reviewed': report.reviewed
+            }
+        else:
+            plagiarism_report_data = {
+                'similarityScore': submission.plagiarism_score or 0,
+                'details': 'Plagiarism report not available' if not submission.plagiarism_score else 'Plagiarism check completed',
+                'flaggedSources': []
+            }
 
-        # Calculate real assessment analytics
-        assessment_submissions = Submission.query.filter_by(assessment_id=submission.assessment_id).all()
-        valid_grades = [s.grade for s in assessment_submissions if s.grade is not None]
-        class_average = sum(valid_grades) / len(valid_grades) if valid_grades else 0
-        score_distribution = [0] * 5  # Buckets: 0-20%, 21-40%, 41-60%, 61-80%, 81-100%
-        for grade in valid_grades:
-            percentage = (grade / (assessment.total_marks or 1)) * 100
-            bucket = min(int(percentage // 20), 4)
-            score_distribution[bucket] += 1
-        percentile = sum(1 for g in valid_grades if g < submission.grade) / len(valid_grades) * 100 if valid_grades and submission.grade else 50
+        # Class analytics aggregated in the database instead of loading every submission
+        summary = assessment_summary(assessment, grade=submission.grade or 0)
+        graded_count = summary['graded']
+        percentile = summary['gradedBelow'] / graded_count * 100 if graded_count and submission.grade else 50
         assessment_analytics = {
-            'classAverage': class_average,
+            'classAverage': summary['classAverage'],
             'scoreDistribution': {
-                'labels': ['0-20%', '21-40%', '41-60%', '61-80%', '81-100%'],
-                'data': score_distribution
+                'labels': SCORE_BUCKET_LABELS,
+                'data': summary['scoreDistribution']
             },
             'percentileBadge': f"Top {int(100 - percentile)}%" if percentile > 0 else "N/A"
         }
@@ -202,6 +215,35 @@ def get_submission_details(submission_id):
         logger.error(f"Error fetching submission details {submission_id}: {str(e)}", exc_info=True)
         return jsonify({'message': f'Failed to fetch submission details: {str(e)}'}), 500
 
+@submission_bp.route('/<int:submission_id>/status', methods=['GET'])
+@jwt_required()
+def get_submission_status(submission_id):
+    """
+    Lightweight grading status for polling after submit.
+    Accessible by the student who made the submission or a lecturer of the course.
+    """
+    current_user_uuid = get_jwt_identity()
+    user = User.query.filter_by(uuid=current_user_uuid).first()
+    if not user:
+        return jsonify({'message': 'User not found'}), 404
+
+    submission = Submission.query.get(submission_id)
+    if not submission:
+        return jsonify({'message': 'Submission not found'}), 404
+
+    is_student_owner = (user.id == submission.user_id)
+    is_lecturer_of_course = user.role == 'lecturer' and submission.assessment.course_id in [c.id for c in user.lectured_courses]
+    if not is_student_owner and not is_lecturer_of_course:
+        return jsonify({'message': 'Unauthorized access to submission status'}), 403
+
+    graded = submission.grading_status == 'graded'
+    return jsonify({
+        'submissionId': submission.id,
+        'gradingStatus': submission.grading_status,
+        'grade': submission.grade if graded else None,
+        'plagiarismScore': submission.plagiarism_score if graded else None
+    }), 200
+
 @submission_bp.route('/grade/<int:submission_id>', methods=['PUT'])
 @jwt_required()
 def update_submission_grade(submission_id):
@@ -224,13 +266,21 @@ def update_submission_grade(submission_id):
     lecturer_comments = data.get('lecturerComments')
     flagged_for_review = data.get('flaggedForReview', False)
 
+    old_grade = submission.grade
     if new_grade is not None:
+        try:
+            new_grade = float(new_grade)
+        except (TypeError, ValueError):
+            return jsonify({"msg": "Grade must be a number"}), 400
         submission.grade = new_grade
     if lecturer_comments is not None:
         submission.lecturer_comments = lecturer_comments
     if flagged_for_review is not None:
         submission.flagged_for_review = flagged_for_review
 
+    if new_grade is not None:
+        # Recorded once the submission is up to date, so it is flushed with one UPDATE
+        record_grade_changes(assessment, [(old_grade, new_grade)])
     db.session.commit()
 
     return jsonify({"message": "Submission grade updated successfully", "submission": submission.to_dict()}), 200
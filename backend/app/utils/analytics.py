@@ -0,0 +1,45 @@
+from sqlalchemy import case, func
+from app import db
+from ..models.assessment import Submission
+
+SCORE_BUCKET_LABELS = ['0-20%', '21-40%', '41-60%', '61-80%', '81-100%']
+
+def score_bucket(percentage):
+    """SQL CASE placing a score percentage in its SCORE_BUCKET_LABELS bucket (0-4)."""
+    return case((percentage <= 20, 0), (percentage <= 40, 1), (percentage <= 60, 2), (percentage <= 80, 3), else_=4)
+
+def assessment_summary(assessment, grade=None):
+    """
+    Class statistics of an assessment's submissions, computed by the database in one
+    aggregate query, so only a handful of numbers cross the wire however many students
+    submitted. Returns a dict with:
+      submissions       - number of submissions
+      graded            - number of them with a grade
+      classAverage      - average grade of the graded ones (0 when none)
+      scoreDistribution - graded submissions per SCORE_BUCKET_LABELS bucket
+      averageTimeSpent  - average seconds spent, over submissions that recorded it
+      gradedBelow       - graded submissions scoring under `grade` (only with a grade)
+    """
+    percentage = Submission.grade * 100.0 / (assessment.total_marks or 1)
+    bucket = score_bucket(percentage)
+    columns = [
+        func.count(Submission.id),
+        func.count(Submission.grade),
+        func.avg(Submission.grade),
+        func.avg(Submission.time_spent_seconds),
+    ]
+    columns += [func.sum(case((Submission.grade.isnot(None) & (bucket == i), 1), else_=0)) for i in range(len(SCORE_BUCKET_LABELS))]
+    if grade is not None:
+        columns.append(func.sum(case((Submission.grade < grade, 1), else_=0)))
+
+    row = db.session.query(*columns).filter(Submission.assessment_id == assessment.id).one()
+    summary = {
+        'submissions': row[0],
+        'graded': row[1],
+        'classAverage': float(row[2] or 0),
+        'averageTimeSpent': float(row[3] or 0),
+        'scoreDistribution': [int(count or 0) for count in row[4:4 + len(SCORE_BUCKET_LABELS)]],
+    }
+    if grade is not None:
+        summary['gradedBelow'] = int(row[-1] or 0)
+    return summary
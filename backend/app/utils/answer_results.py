@@ -0,0 +1,52 @@
+from sqlalchemy import insert
+from app import db
+from ..models.assessment import AnswerResult
+from .nlp_grader import GRADER_VERSION
+
+def mcq_row(submission_id, question, correct):
+    return {
+        'submission_id': submission_id,
+        'question_id': question.id,
+        'question_type': question.type,
+        'score': question.marks if correct else 0,
+        'max_mark': question.marks,
+        'cosine_similarity': None,
+        'matched_keywords': None,
+        'missing_keywords': None,
+        'nlp_insights': None,
+        'grader_version': GRADER_VERSION
+    }
+
+def essay_row(submission_id, question, result):
+    """An answer_results row from a calculate_essay_score result."""
+    return {
+        'submission_id': submission_id,
+        'question_id': question.id,
+        'question_type': question.type,
+        'score': result['score'],
+        'max_mark': question.marks,
+        'cosine_similarity': result['cosineSimilarity'],
+        'matched_keywords': result['nlpInsights']['matchedKeywords'],
+        'missing_keywords': result['nlpInsights']['missingKeywords'],
+        'nlp_insights': result['nlpInsights'],
+        'grader_version': GRADER_VERSION
+    }
+
+def replace_answer_results(submission_ids, rows, question_id=None):
+    """
+    Replaces the stored results of the given submissions (only for one question, if
+    given) with `rows`, in one DELETE and one multi-row INSERT. The caller commits.
+    """
+    query = AnswerResult.query.filter(AnswerResult.submission_id.in_(list(submission_ids)))
+    if question_id is not None:
+        query = query.filter(AnswerResult.question_id == question_id)
+    query.delete(synchronize_session=False)
+    if rows:
+        db.session.execute(insert(AnswerResult), rows)
+
+def load_answer_results(submission_ids, question_id=None):
+    """Returns {(submission_id, question_id): AnswerResult} in one query."""
+    query = AnswerResult.query.filter(AnswerResult.submission_id.in_(list(submission_ids)))
+    if question_id is not None:
+        query = query.filter(AnswerResult.question_id == question_id)
+    return {(row.submission_id, row.question_id): row for row in query.all()}
@@ -0,0 +1,178 @@
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import case, func, update
+from sqlalchemy.exc import IntegrityError
+from app import db
+from ..models.assessment import Assessment, AssessmentStats, Submission
+from .analytics import SCORE_BUCKET_LABELS, score_bucket
+
+# AssessmentStats columns of the SCORE_BUCKET_LABELS buckets, in order
+BUCKET_COLUMNS = ['score_0_20', 'score_21_40', 'score_41_60', 'score_61_80', 'score_81_100']
+COUNTER_COLUMNS = [
+    'submission_count', 'late_count', 'graded_count', 'grade_sum', 'timed_count', 'time_spent_sum'
+] + BUCKET_COLUMNS
+RECONCILE_BATCH_SIZE = 500
+
+
+def bucket_index(grade, total_marks):
+    """The SCORE_BUCKET_LABELS bucket of a grade, as analytics.score_bucket computes it in SQL."""
+    percentage = grade * 100.0 / (total_marks or 1)
+    for index, upper_bound in enumerate((20, 40, 60, 80)):
+        if percentage <= upper_bound:
+            return index
+    return len(SCORE_BUCKET_LABELS) - 1
+
+def _add_grade(delta, grade, total_marks, sign):
+    if grade is None:
+        return
+    delta['graded_count'] += sign
+    delta['grade_sum'] += sign * grade
+    delta[BUCKET_COLUMNS[bucket_index(grade, total_marks)]] += sign
+
+def submission_delta(submission):
+    """Counter changes for a new submission, with its grade if it already has one."""
+    delta = defaultdict(int)
+    delta['submission_count'] = 1
+    delta['late_count'] = 1 if submission.is_late else 0
+    if submission.time_spent_seconds is not None:
+        delta['timed_count'] = 1
+        delta['time_spent_sum'] = submission.time_spent_seconds
+    _add_grade(delta, submission.grade, submission.assessment.total_marks, 1)
+    return delta
+
+def grade_delta(total_marks, changes):
+    """Counter changes for (old_grade, new_grade) pairs of an assessment's submissions."""
+    delta = defaultdict(int)
+    for old_grade, new_grade in changes:
+        _add_grade(delta, old_grade, total_marks, -1)
+        _add_grade(delta, new_grade, total_marks, 1)
+    return delta
+
+def apply_delta(assessment_id, delta):
+    """
+    Adds counter changes to an assessment's stats with one UPDATE ... SET x = x + n, so
+    concurrent writers never overwrite each other. Call it after making the change on the
+    session: pending changes are flushed first, so a missing row rebuilt from the
+    submissions already includes it. The caller commits.
+    """
+    delta = {column: value for column, value in delta.items() if value}
+    if not delta:
+        return
+    db.session.flush()
+    values = {column: getattr(AssessmentStats, column) + value for column, value in delta.items()}
+    values['updated_at'] = datetime.utcnow()
+    statement = update(AssessmentStats).where(AssessmentStats.assessment_id == assessment_id).values(**values)
+    if db.session.execute(statement).rowcount:
+        return
+
+    try:
+        with db.session.begin_nested():
+            db.session.add(AssessmentStats(assessment_id=assessment_id, **count_stats([assessment_id])[assessment_id]))
+    except IntegrityError:
+        # Created meanwhile by another request, whose count did not include this change
+        db.session.execute(statement)
+
+def record_submission(submission):
+    """Counts a new submission, with its grade if graded, in its assessment's stats. The caller commits."""
+    apply_delta(submission.assessment_id, submission_delta(submission))
+
+def record_grade_changes(assessment, changes):
+    """
+    Moves the stats of an assessment by (old_grade, new_grade) pairs, once the new grades
+    are set on the submissions. The caller commits.
+    """
+    apply_delta(assessment.id, grade_delta(assessment.total_marks, changes))
+
+def count_stats(assessment_ids):
+    """
+    Recounts the stats of assessments from their submissions, with one grouped query.
+    Returns {assessment_id: {column: value}}, including assessments without submissions.
+    """
+    percentage = Submission.grade * 100.0 / func.coalesce(func.nullif(Assessment.total_marks, 0), 1)
+    bucket = score_bucket(percentage)
+    rows = (
+        db.session.query(
+            Submission.assessment_id,
+            func.count(Submission.id),
+            func.sum(case((Submission.is_late.is_(True), 1), else_=0)),
+            func.count(Submission.grade),
+            func.sum(Submission.grade),
+            func.count(Submission.time_spent_seconds),
+            func.sum(Submission.time_spent_seconds),
+            *[func.sum(case((Submission.grade.isnot(None) & (bucket == i), 1), else_=0)) for i in range(len(BUCKET_COLUMNS))]
+        )
+        .join(Assessment, Assessment.id == Submission.assessment_id)
+        .filter(Submission.assessment_id.in_(list(assessment_ids)))
+        .group_by(Submission.assessment_id)
+        .all()
+    )
+    stats = {assessment_id: dict.fromkeys(COUNTER_COLUMNS, 0) for assessment_id in assessment_ids}
+    for assessment_id, *values in rows:
+        # MySQL sums integers as DECIMAL
+        stats[assessment_id] = {
+            column: float(value or 0) if column == 'grade_sum' else int(value or 0)
+            for column, value in zip(COUNTER_COLUMNS, values)
+        }
+    return stats
+
+def load_stats(assessment_ids):
+    """
+    Stats of assessments as AssessmentStats.to_dict() dicts, keyed by assessment id. Read
+    from assessment_stats in one query; assessments without a row yet are counted from
+    their submissions (reconcile_stats stores them).
+    """
+    assessment_ids = list(assessment_ids)
+    if not assessment_ids:
+        return {}
+    stats = {
+        row.assessment_id: row.to_dict()
+        for row in AssessmentStats.query.filter(AssessmentStats.assessment_id.in_(assessment_ids)).all()
+    }
+    missing = [assessment_id for assessment_id in assessment_ids if assessment_id not in stats]
+    if missing:
+        for assessment_id, counters in count_stats(missing).items():
+            stats[assessment_id] = AssessmentStats(assessment_id=assessment_id, **counters).to_dict()
+    return stats
+
+def refresh_stats(assessment_ids):
+    """
+    Recounts the stats of assessments and overwrites them where they drifted, creating
+    missing rows. The rows are locked first, so writers wait for the recount instead of
+    having their changes overwritten. Returns the ids that were repaired. The caller commits.
+    """
+    assessment_ids = list(assessment_ids)
+    rows = {
+        row.assessment_id: row for row in
+        AssessmentStats.query.filter(AssessmentStats.assessment_id.in_(assessment_ids)).with_for_update().all()
+    }
+    now = datetime.utcnow()
+    repaired = []
+    for assessment_id, counters in count_stats(assessment_ids).items():
+        row = rows.get(assessment_id)
+        if row is None:
+            row = AssessmentStats(assessment_id=assessment_id)
+            db.session.add(row)
+            repaired.append(assessment_id)
+        elif any(round(getattr(row, column), 6) != round(value, 6) for column, value in counters.items()):
+            repaired.append(assessment_id)
+        for column, value in counters.items():
+            setattr(row, column, value)
+        row.reconciled_at = now
+    return repaired
+
+def reconcile_stats(assessment_ids=None, batch_size=RECONCILE_BATCH_SIZE):
+    """
+    Repairs drift in assessment_stats (all assessments by default), recounting in
+    batches and committing after each. Returns the ids that were repaired.
+    """
+    if assessment_ids is None:
+        assessment_ids = [assessment_id for assessment_id, in db.session.query(Assessment.id).order_by(Assessment.id)]
+    assessment_ids = list(assessment_ids)
+    # Start each batch in a fresh transaction, so its recount sees what was committed
+    # before its rows were locked
+    db.session.commit()
+    repaired = []
+    for start in range(0, len(assessment_ids), batch_size):
+        repaired += refresh_stats(assessment_ids[start:start + batch_size])
+        db.session.commit()
+    return repaired
@@ -0,0 +1,173 @@
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func, insert
+from app import db
+from ..models.plagiarism import CourseCorpusEssay, CourseCorpusFingerprint
+from .plagiarism_index import fingerprint_settings
+from . import winnowing
+
+# Rows deleted per statement when pruning, so a large prune never holds long locks
+PRUNE_BATCH_SIZE = 1000
+
+def corpus_enabled():
+    return current_app.config.get('PLAGIARISM_COURSE_CORPUS', True)
+
+def add_essays(course_id, assessment_id, submission_id, essays, created_at=None):
+    """
+    Adds a submission's essays ((question_id, winnowing.prepare text) pairs) with their
+    winnowed fingerprints to the course corpus. `created_at` is what the retention
+    policy ages from, normally the submission time. The caller commits.
+    """
+    k, window = fingerprint_settings()
+    for question_id, text in essays:
+        fingerprints = winnowing.fingerprints(text, k, window)
+        if not fingerprints:
+            continue
+        essay = CourseCorpusEssay(
+            course_id=course_id,
+            assessment_id=assessment_id,
+            submission_id=submission_id,
+            question_id=question_id,
+            created_at=created_at or datetime.utcnow()
+        )
+        db.session.add(essay)
+        db.session.flush()
+        db.session.execute(insert(CourseCorpusFingerprint), [
+            {'essay_id': essay.id, 'course_id': course_id, 'hash': value, 'span_start': start, 'span_end': end}
+            for value, start, end in fingerprints
+        ])
+
+def _delete_essays(essay_ids):
+    for start in range(0, len(essay_ids), PRUNE_BATCH_SIZE):
+        chunk = essay_ids[start:start + PRUNE_BATCH_SIZE]
+        CourseCorpusFingerprint.query.filter(CourseCorpusFingerprint.essay_id.in_(chunk)).delete(synchronize_session=False)
+        CourseCorpusEssay.query.filter(CourseCorpusEssay.id.in_(chunk)).delete(synchronize_session=False)
+
+def remove_submission(submission_id):
+    """Takes a submission's essays out of the course corpus, e.g. before adding them again."""
+    _delete_essays([row.id for row in CourseCorpusEssay.query.filter_by(submission_id=submission_id).all()])
+
+def search(course_id, text, exclude_assessment_id=None):
+    """
+    Finds essays from the course's other assessments (earlier sessions included) that
+    share winnowed fingerprints with an essay's winnowing.prepare text. Each of the
+    essay's fingerprints is one probe of the (course_id, hash) index, and fingerprints
+    found in more than PLAGIARISM_CORPUS_MAX_SHARED corpus essays are skipped as stock
+    phrases, so the rows read are bounded by the essay's length whatever the corpus size.
+
+    Returns a list of dicts (assessmentId, submissionId, questionId, overlap, spans)
+    sorted by descending overlap, like plagiarism_index.fingerprint_overlaps.
+    """
+    k, window = fingerprint_settings()
+    query = winnowing.query_spans(text, k, window)
+    if not query:
+        return []
+
+    max_shared = current_app.config.get('PLAGIARISM_CORPUS_MAX_SHARED', 50)
+    shared_by = (
+        db.session.query(CourseCorpusFingerprint.hash, func.count(CourseCorpusFingerprint.id))
+        .filter(CourseCorpusFingerprint.course_id == course_id, CourseCorpusFingerprint.hash.in_(list(query)))
+        .group_by(CourseCorpusFingerprint.hash)
+        .all()
+    )
+    distinctive = [value for value, count in shared_by if count <= max_shared]
+    if not distinctive:
+        return []
+
+    rows = (
+        db.session.query(
+            CourseCorpusEssay.id,
+            CourseCorpusEssay.assessment_id,
+            CourseCorpusEssay.submission_id,
+            CourseCorpusEssay.question_id,
+            CourseCorpusFingerprint.hash,
+            CourseCorpusFingerprint.span_start,
+            CourseCorpusFingerprint.span_end
+        )
+        .join(CourseCorpusEssay, CourseCorpusFingerprint.essay_id == CourseCorpusEssay.id)
+        .filter(CourseCorpusFingerprint.course_id == course_id, CourseCorpusFingerprint.hash.in_(distinctive))
+    )
+    if exclude_assessment_id is not None:
+        rows = rows.filter(CourseCorpusEssay.assessment_id != exclude_assessment_id)
+
+    essays = {}
+    matches = []
+    for essay_id, assessment_id, submission_id, question_id, value, start, end in rows.all():
+        essays[essay_id] = (assessment_id, submission_id, question_id)
+        matches.append((essay_id, value, start, end))
+
+    results = [
+        {
+            'assessmentId': essays[essay_id][0],
+            'submissionId': essays[essay_id][1],
+            'questionId': essays[essay_id][2],
+            'overlap': overlap,
+            'spans': spans
+        }
+        for essay_id, (overlap, spans) in winnowing.collect_overlaps(query, matches).items()
+    ]
+    results.sort(key=lambda r: r['overlap'], reverse=True)
+    return results
+
+def prune(course_id=None, retention_days=None, max_essays=None):
+    """
+    Applies the corpus retention policy: drops essays older than `retention_days`, then
+    the oldest essays of any course holding more than `max_essays`. Defaults come from
+    PLAGIARISM_CORPUS_RETENTION_DAYS and PLAGIARISM_CORPUS_MAX_ESSAYS. Commits, and
+    returns the number of essays removed.
+    """
+    config = current_app.config
+    # 0 is a real setting (drop everything), only None falls back to the config
+    if retention_days is None:
+        retention_days = config.get('PLAGIARISM_CORPUS_RETENTION_DAYS', 1825)
+    if max_essays is None:
+        max_essays = config.get('PLAGIARISM_CORPUS_MAX_ESSAYS', 200000)
+
+    if course_id is not None:
+        course_ids = [course_id]
+    else:
+        course_ids = [row[0] for row in db.session.query(CourseCorpusEssay.course_id).distinct().all()]
+
+    removed = 0
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    for current_id in course_ids:
+        expired = [
+            row[0] for row in db.session.query(CourseCorpusEssay.id)
+            .filter(CourseCorpusEssay.course_id == current_id, CourseCorpusEssay.created_at < cutoff)
+            .all()
+        ]
+        overflow = [
+            row[0] for row in db.session.query(CourseCorpusEssay.id)
+            .filter(CourseCorpusEssay.course_id == current_id, CourseCorpusEssay.created_at >= cutoff)
+            .order_by(CourseCorpusEssay.created_at.desc(), CourseCorpusEssay.id.desc())
+            .offset(max_essays)
+            .all()
+        ]
+        _delete_essays(expired + overflow)
+        db.session.commit()
+        removed += len(expired) + len(overflow)
+    return removed
+
+def add_assessment(assessment):
+    """
+    Adds (or re-adds) every stored submission of an assessment to its course corpus,
+    e.g. for assessments graded before the corpus existed. Commits, and returns the
+    number of submissions added.
+    """
+    from ..models.assessment import Submission
+    from .plagiarism_checker import fingerprint_text, submission_essays
+
+    questions_by_id = {q.id: q for q in assessment.questions}
+    submissions = Submission.query.filter_by(assessment_id=assessment.id).order_by(Submission.id).all()
+    for submission in submissions:
+        remove_submission(submission.id)
+        add_essays(
+            assessment.course_id, assessment.id, submission.id,
+            [
+                (question_id, fingerprint_text(content, assessment))
+                for question_id, content in submission_essays(submission, questions_by_id)
+            ],
+            created_at=submission.submitted_at
+        )
+    db.session.commit()
+    return len(submissions)
@@ -0,0 +1,147 @@
+import logging
+from app import db
+from ..models.assessment import Assessment, Submission, SubmissionEssayText
+from ..models.plagiarism import PlagiarismDocument
+from .text_processing import PREPROCESSING_VERSION, preprocess_text
+
+logger = logging.getLogger(__name__)
+
+REBUILD_BATCH_SIZE = 200
+
+def store_essay_texts(submission, essays):
+    """
+    Preprocesses a submission's essay answers once and stores the token streams.
+    `essays` is a list of (question_id, raw content) pairs. Returns (question_id, tokens)
+    pairs for the non-empty ones. The caller commits.
+    """
+    stored = []
+    for question_id, content in essays:
+        tokens = preprocess_text(content)
+        db.session.add(SubmissionEssayText(
+            submission_id=submission.id,
+            question_id=question_id,
+            assessment_id=submission.assessment_id,
+            tokens=tokens,
+            preprocessing_version=PREPROCESSING_VERSION
+        ))
+        if tokens:
+            stored.append((question_id, tokens))
+    return stored
+
+def load_essay_texts(assessment_id, question_id=None, submission_ids=None):
+    """
+    Returns {(submission_id, question_id): tokens} for an assessment's stored essays.
+    Rows written by an older preprocessing version are never mixed in: they are left
+    out until the grading worker or `flask plagiarism reindex --stale-only` rebuilds them.
+    """
+    query = SubmissionEssayText.query.filter_by(assessment_id=assessment_id)
+    if question_id is not None:
+        query = query.filter_by(question_id=question_id)
+    if submission_ids is not None:
+        query = query.filter(SubmissionEssayText.submission_id.in_(submission_ids))
+
+    texts = {}
+    stale = 0
+    for row in query.all():
+        if row.preprocessing_version == PREPROCESSING_VERSION:
+            texts[(row.submission_id, row.question_id)] = row.tokens
+        else:
+            stale += 1
+    if stale:
+        logger.warning(
+            f"{stale} essay texts for assessment {assessment_id} predate preprocessing version {PREPROCESSING_VERSION}; "
+            f"rebuild them with `flask plagiarism reindex --stale-only` or by restarting the grading worker"
+        )
+    return texts
+
+def _restore_essay_texts(submission, essays):
+    """
+    store_essay_texts for a submission that already has stored texts: its rows are
+    locked and updated in place, so a concurrent grade of the submission waits instead
+    of colliding on the (submission, question) key. Rows of questions it no longer
+    answers are dropped.
+    """
+    rows = {
+        row.question_id: row
+        for row in SubmissionEssayText.query.filter_by(submission_id=submission.id).with_for_update().all()
+    }
+    stored = []
+    for question_id, content in essays:
+        tokens = preprocess_text(content)
+        row = rows.pop(question_id, None)
+        if row is None:
+            db.session.add(SubmissionEssayText(
+                submission_id=submission.id,
+                question_id=question_id,
+                assessment_id=submission.assessment_id,
+                tokens=tokens,
+                preprocessing_version=PREPROCESSING_VERSION
+            ))
+        else:
+            row.tokens = tokens
+            row.preprocessing_version = PREPROCESSING_VERSION
+        if tokens:
+            stored.append((question_id, tokens))
+    for row in rows.values():
+        db.session.delete(row)
+    return stored
+
+def _stale(text_column, document_column, assessment_id=None):
+    """Distinct values of a column over essay texts and index documents from an older preprocessing version."""
+    texts = db.session.query(text_column).filter(SubmissionEssayText.preprocessing_version != PREPROCESSING_VERSION)
+    documents = db.session.query(document_column).filter(PlagiarismDocument.preprocessing_version != PREPROCESSING_VERSION)
+    if assessment_id is not None:
+        texts = texts.filter(SubmissionEssayText.assessment_id == assessment_id)
+        documents = documents.filter(PlagiarismDocument.assessment_id == assessment_id)
+    return sorted({value for value, in texts.union(documents).all()})
+
+def stale_submission_ids(assessment_id):
+    """Ids of an assessment's submissions with essay texts or index documents from an older preprocessing version."""
+    return _stale(SubmissionEssayText.submission_id, PlagiarismDocument.submission_id, assessment_id)
+
+def rebuild_essay_texts(assessment_id, stale_only=False, batch_size=REBUILD_BATCH_SIZE):
+    """
+    Re-preprocesses an assessment's essays from the stored answers and rebuilds what is
+    derived from the tokens: the stored texts, the inverted index documents and the
+    hashed vectors. Fingerprints and course-corpus rows come from the raw answers and
+    are left alone. With stale_only, only submissions with rows from an older
+    preprocessing version are rebuilt. Commits after each batch; returns the number of
+    submissions rebuilt.
+    """
+    from .plagiarism_checker import index_submission_essays, submission_essays
+    from . import hashed_vectors, plagiarism_index
+
+    assessment = Assessment.query.get(assessment_id)
+    if not assessment:
+        return 0
+    questions_by_id = {q.id: q for q in assessment.questions}
+    if stale_only:
+        submission_ids = stale_submission_ids(assessment_id)
+    else:
+        submission_ids = [submission_id for submission_id, in (
+            db.session.query(Submission.id).filter_by(assessment_id=assessment_id).order_by(Submission.id)
+        )]
+
+    for start in range(0, len(submission_ids), batch_size):
+        batch = Submission.query.filter(Submission.id.in_(submission_ids[start:start + batch_size])).order_by(Submission.id).all()
+        for submission in batch:
+            stored = _restore_essay_texts(submission, submission_essays(submission, questions_by_id))
+            plagiarism_index.remove_documents(submission.id)
+            hashed_vectors.remove_submission(submission.id)
+            index_submission_essays(submission, stored)
+        db.session.commit()
+    return len(submission_ids)
+
+def rebuild_stale_essay_texts():
+    """
+    Rebuilds the essays of every assessment that has rows from an older preprocessing
+    version (see rebuild_essay_texts). Run by the grading worker when it starts.
+    Returns the number of submissions rebuilt.
+    """
+    assessment_ids = _stale(SubmissionEssayText.assessment_id, PlagiarismDocument.assessment_id)
+    rebuilt = 0
+    for assessment_id in assessment_ids:
+        count = rebuild_essay_texts(assessment_id, stale_only=True)
+        logger.info(f"Rebuilt essay texts for {count} submissions of assessment {assessment_id}")
+        rebuilt += count
+    return rebuilt
@@ -0,0 +1,84 @@
+import hashlib
+import json
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from app import db
+from ..models.grading import EssayGradeCache
+from .nlp_grader import GRADER_VERSION, calculate_essay_score, get_question_artifact
+from . import nlp_pool
+
+def normalize_answer(text):
+    """Collapses whitespace; essay scores do not depend on it, so the result is unchanged."""
+    return " ".join((text or "").split())
+
+def question_fingerprint(question):
+    """Hash of everything about a question that essay grading depends on."""
+    payload = json.dumps([question.model_answer, question.keywords, question.marks, question.word_limit])
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def cache_key(question, answer, fingerprint=None):
+    fingerprint = fingerprint or question_fingerprint(question)
+    payload = f"{GRADER_VERSION}\0{question.id}\0{fingerprint}\0{normalize_answer(answer)}"
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def _grade_each(items):
+    """Default grader for cache misses: calculate_essay_score per answer, on the NLP pool."""
+    return nlp_pool.run_many(calculate_essay_score, [
+        (answer, question.model_answer, None, question.marks, question.word_limit, get_question_artifact(question))
+        for question, answer in items
+    ])
+
+def _store(rows):
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(EssayGradeCache), rows)
+    except IntegrityError:
+        # Another request cached some of these answers first; keep whichever rows are new
+        for row in rows:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(insert(EssayGradeCache), [row])
+            except IntegrityError:
+                pass
+
+def cached_essay_scores(items, grade=None):
+    """
+    Essay results for (question, answer) pairs, in order, looked up in the grading cache
+    with a single indexed query. Only the misses are graded - by `grade`, which takes
+    the missing (question, answer) pairs and returns their results - and then cached.
+    The caller commits.
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    fingerprints = {}
+    keys = []
+    for question, answer in items:
+        if question.id not in fingerprints:
+            fingerprints[question.id] = question_fingerprint(question)
+        keys.append(cache_key(question, answer, fingerprints[question.id]))
+
+    cached = {
+        row.cache_key: row.result
+        for row in EssayGradeCache.query.filter(EssayGradeCache.cache_key.in_(set(keys))).all()
+    }
+
+    missing = {}
+    for key, item in zip(keys, items):
+        if key not in cached and key not in missing:
+            missing[key] = item
+    if missing:
+        results = (grade or _grade_each)(list(missing.values()))
+        rows = []
+        for key, (question, _), result in zip(missing, missing.values(), results):
+            cached[key] = result
+            rows.append({
+                'cache_key': key,
+                'question_id': question.id,
+                'grader_version': GRADER_VERSION,
+                'result': result
+            })
+        _store(rows)
+
+    return [cached[key] for key in keys]
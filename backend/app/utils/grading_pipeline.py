@@ -0,0 +1,248 @@
+import logging
+import json
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import exists
+from app import db
+from ..models.assessment import AnswerResult, Submission, SubmissionEssayText
+from ..models.grading import GradingJob
+from .grade_cache import cached_essay_scores
+from .answer_results import mcq_row, essay_row, replace_answer_results
+from .assessment_stats import record_grade_changes
+from .essay_texts import rebuild_stale_essay_texts, store_essay_texts
+from .plagiarism_checker import (
+    check_submission_plagiarism, index_submission_essays, remove_submission_essays, save_plagiarism_report
+)
+from .regrade import claim_next_regrade, requeue_stale_regrades, run_regrade
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+BACKFILL_BATCH_SIZE = 200
+
+def validate_answers(assessment, answers_data):
+    """
+    Checks submitted answers against the assessment without grading them.
+    Returns an error message, or None when the answers are acceptable.
+    """
+    questions_by_id = {q.id: q for q in assessment.questions}
+    answered = set()
+    for answer in answers_data:
+        question_id = answer.get('questionId')
+        question = questions_by_id.get(question_id)
+        if not question:
+            return f'Question ID {question_id} not found in assessment'
+        # answer_results keeps one row per question and submission
+        if question_id in answered:
+            return f'Question ID {question_id} is answered more than once'
+        answered.add(question_id)
+        if question.type == 'mcq':
+            selected_option_index = answer.get('selectedOption')
+            if isinstance(selected_option_index, int) and not 0 <= selected_option_index < len(question.options):
+                return f'Invalid selectedOption {selected_option_index} for question {question_id}'
+    return None
+
+def score_answers(submission, questions_by_id):
+    """
+    Scores a stored submission's MCQ and essay answers, essays through the grading cache.
+    Returns (total score, answer_results rows, (question_id, content) pairs of its graded
+    essays). The caller commits.
+    """
+    answers_data = json.loads(submission.answers_json) if submission.answers_json else []
+
+    total_score_earned = 0
+    essay_contents = []
+    essay_answers = []
+    result_rows = []
+    for answer in answers_data:
+        question_id = answer.get('questionId')
+        question = questions_by_id.get(question_id)
+        if not question:
+            continue
+
+        if question.type == 'mcq':
+            selected_option_index = answer.get('selectedOption')
+            options = question.options
+            if isinstance(selected_option_index, int) and 0 <= selected_option_index < len(options):
+                correct = options[selected_option_index].is_correct
+                if correct:
+                    total_score_earned += question.marks
+                result_rows.append(mcq_row(submission.id, question, correct))
+
+        elif question.type == 'essay':
+            content = answer.get('content')
+            if content and question.model_answer:
+                essay_answers.append((question, content))
+                essay_contents.append((question_id, content))
+
+    # Answers graded before (same text, same question version) come from the grading
+    # cache; the rest are graded in parallel when the NLP process pool is enabled
+    for (question, _), result in zip(essay_answers, cached_essay_scores(essay_answers)):
+        total_score_earned += result['score']
+        result_rows.append(essay_row(submission.id, question, result))
+    return total_score_earned, result_rows, essay_contents
+
+def grade_submission(submission):
+    """
+    Scores a stored submission's MCQ and essay answers and stores the per-answer
+    results, then stores its preprocessed essays, checks them for plagiarism per question, saves the report and adds them to
+    the plagiarism index. Safe to run again for the same submission. The caller records the
+    grade in the assessment stats and commits.
+    """
+    questions_by_id = {q.id: q for q in submission.assessment.questions}
+    total_score_earned, result_rows, essay_contents = score_answers(submission, questions_by_id)
+    # Per-answer results are kept so result pages never need to grade again
+    replace_answer_results([submission.id], result_rows)
+
+    # Drop anything left by an earlier attempt before storing and indexing again
+    SubmissionEssayText.query.filter_by(submission_id=submission.id).delete(synchronize_session=False)
+    remove_submission_essays(submission.id)
+
+    essay_texts = store_essay_texts(submission, essay_contents)
+    # Each essay is only compared with other answers to the same question; the
+    # submission's score is its highest per-question score
+    report = check_submission_plagiarism(submission.assessment_id, essay_texts, submission.id, essay_contents)
+    save_plagiarism_report(submission, report)
+    index_submission_essays(submission, essay_texts, essay_contents)
+
+    submission.grade = total_score_earned
+    submission.plagiarism_score = report['similarityScore']
+    submission.grading_status = 'graded'
+    return submission
+
+def backfill_answer_results(assessment_id=None, batch_size=BACKFILL_BATCH_SIZE):
+    """
+    Stores answer_results for graded submissions from before they were kept, scoring
+    their answers as grade_submission does. Grades are left as they are. Commits after
+    each batch; returns the number of submissions filled in.
+    """
+    missing = ~exists().where(AnswerResult.submission_id == Submission.id)
+    questions = {}
+    filled = 0
+    last_id = 0
+    while True:
+        query = Submission.query.filter(Submission.grading_status == 'graded', Submission.id > last_id, missing)
+        if assessment_id is not None:
+            query = query.filter(Submission.assessment_id == assessment_id)
+        batch = query.order_by(Submission.id).limit(batch_size).all()
+        if not batch:
+            return filled
+
+        for submission in batch:
+            if submission.assessment_id not in questions:
+                questions[submission.assessment_id] = {q.id: q for q in submission.assessment.questions}
+            _, result_rows, _ = score_answers(submission, questions[submission.assessment_id])
+            replace_answer_results([submission.id], result_rows)
+        db.session.commit()
+        filled += len(batch)
+        last_id = batch[-1].id
+
+def enqueue_grading(submission):
+    """Marks a submission as pending and queues it for the grading worker. The caller commits."""
+    submission.grading_status = 'pending'
+    job = GradingJob(submission_id=submission.id, status='queued')
+    db.session.add(job)
+    return job
+
+def grading_is_async():
+    return current_app.config.get('GRADING_ASYNC', False)
+
+def claim_next_job():
+    """
+    Takes the oldest queued job and marks it running. Rows locked by another worker are
+    skipped, so several workers can share the queue.
+    """
+    job = (
+        GradingJob.query
+        .filter_by(status='queued')
+        .order_by(GradingJob.id)
+        .with_for_update(skip_locked=True)
+        .first()
+    )
+    if not job:
+        db.session.rollback()
+        return None
+    job.status = 'running'
+    job.attempts += 1
+    job.started_at = datetime.utcnow()
+    job.submission.grading_status = 'grading'
+    db.session.commit()
+    return job
+
+def run_job(job):
+    """Grades a claimed job's submission; failed jobs are requeued up to MAX_ATTEMPTS times."""
+    job_id = job.id
+    try:
+        submission = job.submission
+        old_grade = submission.grade
+        grade_submission(submission)
+        record_grade_changes(submission.assessment, [(old_grade, submission.grade)])
+        job.status = 'done'
+        job.error = None
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        return True
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Grading job {job_id} failed: {str(e)}", exc_info=True)
+        job = GradingJob.query.get(job_id)
+        job.error = str(e)
+        if job.attempts >= MAX_ATTEMPTS:
+            job.status = 'failed'
+            job.finished_at = datetime.utcnow()
+            job.submission.grading_status = 'failed'
+        else:
+            job.status = 'queued'
+            job.submission.grading_status = 'pending'
+        db.session.commit()
+        return False
+
+def requeue_stale_jobs(stale_after_seconds):
+    """Puts back jobs left running by a worker that died mid-job."""
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_after_seconds)
+    count = (
+        GradingJob.query
+        .filter(GradingJob.status == 'running', GradingJob.started_at < cutoff)
+        .update({'status': 'queued'}, synchronize_session=False)
+    )
+    db.session.commit()
+    return count
+
+def run_worker(poll_interval=1.0, once=False):
+    """
+    Processes queued grading jobs, then queued regrade runs, until interrupted, or until
+    both queues are empty when `once` is set. On start it requeues work left by dead
+    workers and rebuilds essay texts from an older preprocessing version. Returns the
+    number of jobs processed.
+    """
+    stale_after_seconds = current_app.config.get('GRADING_STALE_SECONDS', 600)
+    requeued = requeue_stale_jobs(stale_after_seconds)
+    if requeued:
+        logger.warning(f"Requeued {requeued} stale grading jobs")
+    requeued = requeue_stale_regrades(stale_after_seconds)
+    if requeued:
+        logger.warning(f"Requeued {requeued} stale regrade runs")
+    # Essays stored by an older preprocessing version are left out of checks until rebuilt
+    try:
+        rebuild_stale_essay_texts()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Failed to rebuild stale essay texts: {str(e)}", exc_info=True)
+
+    processed = 0
+    while True:
+        job = claim_next_job()
+        if job:
+            run_job(job)
+            processed += 1
+            continue
+        # Regrades only run when no fresh submission is waiting
+        regrade = claim_next_regrade()
+        if regrade:
+            run_regrade(regrade)
+            processed += 1
+            continue
+        if once:
+            return processed
+        time.sleep(poll_interval)
@@ -0,0 +1,162 @@
+import math
+from flask import current_app
+from sqlalchemy import func, update
+from app import db
+from ..models.plagiarism import EssayVector, EssayFeatureDF
+
+def n_features():
+    return current_app.config.get('PLAGIARISM_HASH_FEATURES', 1 << 20)
+
+def hashed_counts(processed_text, features=None):
+    """
+    Term counts of a preprocessed essay in a fixed-width feature-hashing space, as
+    (indices, counts) numpy arrays. Stateless: no vocabulary is fitted, so vectors
+    computed at different times are directly comparable.
+    """
+    import numpy as np
+    from sklearn.feature_extraction.text import HashingVectorizer
+
+    vectorizer = HashingVectorizer(n_features=features or n_features(), alternate_sign=False, norm=None)
+    row = vectorizer.transform([processed_text or ""]).tocsr()
+    row.sort_indices()
+    return row.indices.astype(np.int32), row.data.astype(np.float32)
+
+def _log_tf_unit(counts):
+    """Length-normalized log-tf weights (the 'lnc' side of lnc.ltc cosine)."""
+    import numpy as np
+
+    weights = (1 + np.log(counts)).astype(np.float32)
+    norm = float(np.sqrt(np.dot(weights, weights)))
+    return weights / norm if norm else weights
+
+def _increment_df(assessment_id, question_id, indices, delta):
+    rows = [
+        {'assessment_id': assessment_id, 'question_id': question_id, 'feature': int(i), 'df': delta}
+        for i in indices
+    ]
+    if not rows:
+        return
+    dialect = db.engine.dialect.name
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        statement = insert(EssayFeatureDF)
+        statement = statement.on_duplicate_key_update(df=EssayFeatureDF.df + statement.inserted.df)
+    elif dialect in ('sqlite', 'postgresql'):
+        from sqlalchemy.dialects.sqlite import insert
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        statement = insert(EssayFeatureDF)
+        statement = statement.on_conflict_do_update(
+            index_elements=['assessment_id', 'question_id', 'feature'],
+            set_={'df': EssayFeatureDF.df + statement.excluded.df}
+        )
+    else:
+        raise RuntimeError(f"Feature document frequencies need an upsert, not available for {dialect}")
+    db.session.execute(statement, rows)
+
+def add_essay(assessment_id, submission_id, question_id, processed_text):
+    """
+    Stores an essay's hashed, length-normalized log-tf vector as float32 arrays and
+    counts its features into the assessment's per-question document frequencies.
+    The caller commits.
+    """
+    indices, counts = hashed_counts(processed_text)
+    if not len(indices):
+        return None
+    vector = EssayVector(
+        assessment_id=assessment_id,
+        submission_id=submission_id,
+        question_id=question_id,
+        features=n_features(),
+        indices=indices.tobytes(),
+        weights=_log_tf_unit(counts).tobytes()
+    )
+    db.session.add(vector)
+    _increment_df(assessment_id, question_id, indices, 1)
+    return vector
+
+def remove_submission(submission_id):
+    """Drops a submission's vectors and takes them back out of the document frequencies."""
+    import numpy as np
+
+    vectors = EssayVector.query.filter_by(submission_id=submission_id).all()
+    for vector in vectors:
+        features = np.frombuffer(vector.indices, dtype=np.int32).tolist()
+        db.session.execute(
+            update(EssayFeatureDF)
+            .where(
+                EssayFeatureDF.assessment_id == vector.assessment_id,
+                EssayFeatureDF.question_id == vector.question_id,
+                EssayFeatureDF.feature.in_(features)
+            )
+            .values(df=EssayFeatureDF.df - 1)
+        )
+    if vectors:
+        EssayVector.query.filter_by(submission_id=submission_id).delete(synchronize_session=False)
+
+def search(assessment_id, processed_text, exclude_submission_id=None, question_id=None):
+    """
+    Scores a preprocessed essay against the stored vectors of the other answers to the
+    same question with lnc.ltc cosine similarity: stored vectors are already normalized,
+    and the query gets idf from the incrementally maintained document frequencies, so
+    scoring is one sparse matrix-vector product with nothing refitted.
+    Returns match dicts in the same shape as plagiarism_index.search.
+    """
+    import numpy as np
+    from scipy.sparse import csr_matrix
+
+    query_indices, query_counts = hashed_counts(processed_text)
+    if not len(query_indices):
+        return []
+
+    vectors = EssayVector.query.filter_by(assessment_id=assessment_id, question_id=question_id)
+    if exclude_submission_id is not None:
+        vectors = vectors.filter(EssayVector.submission_id != exclude_submission_id)
+    vectors = [v for v in vectors.all() if v.features == n_features()]
+    if not vectors:
+        return []
+
+    total_documents = db.session.query(func.count(EssayVector.id)).filter_by(
+        assessment_id=assessment_id, question_id=question_id
+    ).scalar()
+    document_frequency = dict(
+        db.session.query(EssayFeatureDF.feature, EssayFeatureDF.df)
+        .filter(
+            EssayFeatureDF.assessment_id == assessment_id,
+            EssayFeatureDF.question_id == question_id,
+            EssayFeatureDF.feature.in_(query_indices.tolist())
+        )
+        .all()
+    )
+    idf = np.array([
+        math.log((1 + total_documents) / (1 + document_frequency.get(int(i), 0))) + 1
+        for i in query_indices
+    ], dtype=np.float32)
+    query = (1 + np.log(query_counts)) * idf
+    query /= np.sqrt(np.dot(query, query))
+
+    indptr = [0]
+    indices = []
+    weights = []
+    for vector in vectors:
+        indices.append(np.frombuffer(vector.indices, dtype=np.int32))
+        weights.append(np.frombuffer(vector.weights, dtype=np.float32))
+        indptr.append(indptr[-1] + len(indices[-1]))
+    matrix = csr_matrix((np.concatenate(weights), np.concatenate(indices), indptr), shape=(len(vectors), n_features()))
+
+    dense_query = np.zeros(n_features(), dtype=np.float32)
+    dense_query[query_indices] = query
+    similarities = matrix @ dense_query
+
+    matches = [
+        {
+            'documentId': vector.id,
+            'submissionId': vector.submission_id,
+            'questionId': vector.question_id,
+            'similarity': min(1.0, float(similarity))
+        }
+        for vector, similarity in zip(vectors, similarities)
+        if similarity > 0
+    ]
+    matches.sort(key=lambda m: m['similarity'], reverse=True)
+    return matches
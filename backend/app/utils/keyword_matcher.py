@@ -0,0 +1,66 @@
+from collections import deque
+from functools import lru_cache
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over token sequences: finds which of a question's keyword
+    phrases (preprocessed, so lemmatized and without stop words) occur as contiguous
+    runs in a student's tokens, in a single pass over the tokens.
+    """
+
+    def __init__(self, phrases):
+        self.phrase_count = sum(1 for tokens in phrases if tokens)
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [set()]
+
+        for index, tokens in enumerate(phrases):
+            if not tokens:
+                continue  # A keyword made only of stop words can never match
+            state = 0
+            for token in tokens:
+                if token not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(set())
+                    self._goto[state][token] = len(self._goto) - 1
+                state = self._goto[state][token]
+            self._output[state].add(index)
+
+        # Breadth-first so every state's failure link is final before its children use it;
+        # the root's children keep failure link 0
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(token, 0)
+                self._output[child] |= self._output[self._fail[child]]
+
+    def find(self, tokens):
+        """Returns the set of indexes of the phrases that occur in `tokens`."""
+        found = set()
+        state = 0
+        for token in tokens:
+            while state and token not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(token, 0)
+            if self._output[state]:
+                found |= self._output[state]
+                if len(found) == self.phrase_count:
+                    break
+        return found
+
+@lru_cache(maxsize=1024)
+def _compile(phrases):
+    return KeywordMatcher([phrase.split() for phrase in phrases])
+
+def matcher_for(keywords):
+    """
+    The compiled matcher for a question artifact's keywords, built once per distinct
+    keyword list and reused for every answer to that question.
+    """
+    return _compile(tuple(keyword['processed'] for keyword in keywords))
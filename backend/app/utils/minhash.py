@@ -0,0 +1,56 @@
+import hashlib
+import random
+
+# Universal hashing h(x) = (a*x + b) mod p over 32-bit shingle hashes; with a, b < 2**32
+# the products stay inside uint64
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+SEED = 1
+
+def _hash32(value):
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=4).digest(), 'big')
+
+def shingles(processed_text, size=1):
+    """Returns the set of `size`-word shingles of a preprocessed text."""
+    tokens = processed_text.split()
+    if len(tokens) <= size:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+def _permutations(num_perm):
+    rnd = random.Random(SEED)
+    return (
+        [rnd.randint(1, MAX_HASH) for _ in range(num_perm)],
+        [rnd.randint(0, MAX_HASH) for _ in range(num_perm)]
+    )
+
+def signature(shingle_set, num_perm):
+    """MinHash signature of a shingle set as a list of `num_perm` ints, or None for an empty set."""
+    if not shingle_set:
+        return None
+    import numpy as np
+
+    a, b = (np.array(values, dtype=np.uint64) for values in _permutations(num_perm))
+    hashes = np.array([_hash32(s) for s in shingle_set], dtype=np.uint64)
+    permuted = (np.outer(hashes, a) + b) % np.uint64(MERSENNE_PRIME) & np.uint64(MAX_HASH)
+    return permuted.min(axis=0).tolist()
+
+def band_keys(sig, bands, rows):
+    """
+    Splits a signature into `bands` bands of `rows` values and hashes each band, together
+    with its index, to a bucket key. Returns (band, key) pairs.
+    """
+    keys = []
+    for band in range(bands):
+        chunk = sig[band * rows:(band + 1) * rows]
+        digest = hashlib.blake2b(f"{band}:{','.join(map(str, chunk))}".encode('utf-8'), digest_size=8).digest()
+        keys.append((band, int.from_bytes(digest, 'big') >> 1))  # fits a signed BIGINT
+    return keys
+
+def estimated_jaccard(sig_a, sig_b):
+    """Fraction of agreeing signature positions, an unbiased estimate of Jaccard similarity."""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a) if sig_a else 0.0
+
+def candidate_threshold(bands, rows):
+    """Approximate Jaccard similarity above which a pair is likely to share a bucket."""
+    return (1 / bands) ** (1 / rows)
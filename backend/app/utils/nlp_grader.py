@@ -1,56 +1,103 @@
-import nltk
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import re
-import numpy as np
+import json
 import random
 
-# Download NLTK data if not already present
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords')
-try:
-    nltk.data.find('corpora/wordnet')
-except LookupError:
-    nltk.download('wordnet')
-
-stop_words = set(stopwords.words('english'))
-lemmatizer = WordNetLemmatizer()
-
-def preprocess_text(text):
-    """Cleans and tokenizes text, removes stop words, and lemmatizes."""
-    if not text:
-        return ""
-    # Remove HTML tags
-    clean_text = re.sub(r'<[^>]+>', '', text)
-    # Remove special characters and numbers, convert to lowercase
-    clean_text = re.sub(r'[^a-zA-Z\s]', '', clean_text).lower()
-    tokens = clean_text.split()
-    # Remove stop words and lemmatize
-    lemmatized_tokens = [lemmatizer.lemmatize(word) for word in tokens if word not in stop_words]
-    return " ".join(lemmatized_tokens)
-
-def calculate_essay_score(student_answer_raw, model_answer_raw, keywords_list, max_mark, word_limit=None):
+from .text_processing import preprocess_text
+from .keyword_matcher import matcher_for
+
+ARTIFACT_VERSION = 1
+# Bump when essay scoring changes, so cached grades (utils.grade_cache) are not reused
+GRADER_VERSION = 2
+
+def normalize_keywords(keywords_list):
+    """Returns keyword texts from a list of keyword objects or strings."""
+    return [
+        kw.get('text', kw) if isinstance(kw, dict) else kw
+        for kw in keywords_list
+    ] if keywords_list else []
+
+def build_question_artifact(model_answer_raw, keywords_list):
+    """
+    Precomputes everything essay grading needs from the question itself.
+    The result is JSON-serializable so it can be stored on the Question row.
+    """
+    model_answer = preprocess_text(model_answer_raw)
+    return {
+        'version': ARTIFACT_VERSION,
+        'modelAnswer': model_answer,
+        'modelTokens': sorted(set(model_answer.split())),
+        'keywords': [
+            {'text': keyword, 'processed': preprocess_text(keyword)}
+            for keyword in normalize_keywords(keywords_list)
+        ]
+    }
+
+def hashing_features():
+    """Width of the hashing space when GRADING_VECTORS is 'hashing', otherwise None."""
+    from flask import current_app
+    config = current_app.config
+    if config.get('GRADING_VECTORS') != 'hashing':
+        return None
+    return config.get('PLAGIARISM_HASH_FEATURES', 1 << 20)
+
+def hash_model_answer(artifact, features):
+    """Adds the model answer's term counts in a hashing space of the given width to an artifact."""
+    from .hashed_vectors import hashed_counts
+
+    indices, counts = hashed_counts(artifact['modelAnswer'], features)
+    return {
+        **artifact,
+        'modelHashed': {'features': features, 'indices': indices.tolist(), 'counts': counts.tolist()}
+    }
+
+def get_question_artifact(question):
+    """
+    Returns the grading artifact stored on a question, rebuilding it when it is
+    missing or was built by an older version of this module. When GRADING_VECTORS is
+    'hashing' the artifact also carries the model answer's hashed term counts.
+    """
+    artifact = question.grading_artifact
+    if not artifact or artifact.get('version') != ARTIFACT_VERSION:
+        try:
+            keywords = json.loads(question.keywords) if question.keywords else []
+        except (TypeError, json.JSONDecodeError):
+            keywords = []
+        artifact = build_question_artifact(question.model_answer, keywords)
+        question.grading_artifact = artifact
+
+    features = hashing_features()
+    hashed = artifact.get('modelHashed')
+    if features and (not hashed or hashed['features'] != features):
+        artifact = hash_model_answer(artifact, features)
+        question.grading_artifact = artifact
+    elif not features and hashed:
+        artifact = {key: value for key, value in artifact.items() if key != 'modelHashed'}
+        question.grading_artifact = artifact
+    return artifact
+
+def calculate_essay_score(student_answer_raw, model_answer_raw, keywords_list, max_mark, word_limit=None, artifact=None):
     """
     Evaluates a student's essay answer against a model answer and keywords using NLP.
     Returns a score, matched/missing keywords, and mock NLP insights.
+    When a precomputed question artifact is given, only the student's answer is preprocessed.
+    When the artifact carries the model answer's hashed term counts (GRADING_VECTORS is
+    'hashing'), the answer is hashed into the same space and no vectorizer is fitted.
     """
-    student_answer = preprocess_text(student_answer_raw)
-    model_answer = preprocess_text(model_answer_raw)
+    if artifact is None:
+        artifact = build_question_artifact(model_answer_raw, keywords_list)
 
-    # Handle keywords as list of objects or strings
-    keywords = [
-        kw.get('text', kw) if isinstance(kw, dict) else kw
-        for kw in keywords_list
-    ] if keywords_list else []
+    student_answer = preprocess_text(student_answer_raw)
+    model_answer = artifact['modelAnswer']
+    keywords = artifact['keywords']
 
     # Cosine Similarity for overall content match
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.metrics.pairwise import cosine_similarity
     documents = [student_answer, model_answer]
     if not student_answer or not model_answer:
         cosine_sim = 0.0
+    elif artifact.get('modelHashed'):
+        cosine_sim = _hashed_pairwise_cosine(artifact['modelHashed'], student_answer)
     else:
         vectorizer = TfidfVectorizer()
         try:
@@ -59,26 +106,29 @@ def calculate_essay_score(student_answer_raw, model_answer_raw, keywords_list, m
         except ValueError:
             cosine_sim = 0.0
 
-    # Keyword matching
+    return _build_essay_result(student_answer_raw, student_answer, cosine_sim, keywords, max_mark, word_limit)
+
+def _build_essay_result(student_answer_raw, student_answer, cosine_sim, keywords, max_mark, word_limit):
+    """Turns a cosine similarity and keyword matches into the essay result dict."""
+    # Keyword matching: multi-word keywords match as phrases, in one pass over the answer
     student_keywords_found = []
     missing_keywords = []
-    student_tokens = set(student_answer.split())
-    
-    for keyword in keywords:
-        preprocessed_keyword = preprocess_text(keyword)
-        if preprocessed_keyword and preprocessed_keyword in student_tokens:
-            student_keywords_found.append(keyword)
+    found = matcher_for(keywords).find(student_answer.split())
+
+    for index, keyword in enumerate(keywords):
+        if index in found:
+            student_keywords_found.append(keyword['text'])
         else:
-            missing_keywords.append(keyword)
+            missing_keywords.append(keyword['text'])
 
     # Score calculation logic
     score_from_similarity = cosine_sim * (max_mark * 0.7)
-    keyword_bonus_per_keyword = (max_mark * 0.3) / len(keywords_list) if keywords_list else 0
+    keyword_bonus_per_keyword = (max_mark * 0.3) / len(keywords) if keywords else 0
     score_from_keywords = len(student_keywords_found) * keyword_bonus_per_keyword
     total_score = min(max_mark, score_from_similarity + score_from_keywords)
 
     if word_limit is not None and word_limit > 0:
-        student_word_count = len(re.sub(r'<[^>]+>', '', student_answer_raw).split())
+        student_word_count = len(re.sub(r'<[^>]+>', '', student_answer_raw or '').split())
         if student_word_count > word_limit:
             total_score *= 0.9
             total_score = max(0, total_score)
@@ -102,6 +152,90 @@ def calculate_essay_score(student_answer_raw, model_answer_raw, keywords_list, m
             'overallMatchPercentage': round(cosine_sim * 100, 2)
         }
     }
+
+def _hashed_pairwise_cosine(model_hashed, student_answer):
+    """
+    The cosine similarity a TfidfVectorizer fitted on (student answer, model answer)
+    would give, from hashed term counts: the model answer's are stored in its artifact,
+    so only the student's answer is hashed. As in _pairwise_cosine_batch, a term has
+    idf 1 when both texts use it and 1 + ln(3/2) otherwise. Terms are only merged when
+    their hashes collide.
+    """
+    import numpy as np
+    from .hashed_vectors import hashed_counts
+
+    indices, counts = hashed_counts(student_answer, model_hashed['features'])
+    student = dict(zip(indices.tolist(), counts.astype(np.float64).tolist()))
+    model = dict(zip(model_hashed['indices'], model_hashed['counts']))
+    unshared_idf_sq = (1 + np.log(1.5)) ** 2
+
+    dot = sum(count * model[feature] for feature, count in student.items() if feature in model)
+    student_norm_sq = sum(count * count * (1 if feature in model else unshared_idf_sq) for feature, count in student.items())
+    model_norm_sq = sum(count * count * (1 if feature in student else unshared_idf_sq) for feature, count in model.items())
+    denominator = np.sqrt(student_norm_sq * model_norm_sq)
+    return float(dot / denominator) if denominator > 0 else 0.0
+
+def _pairwise_cosine_batch(model_answer, student_answers):
+    """
+    Computes, for every student answer, the cosine similarity that a TfidfVectorizer
+    fitted on just (student answer, model answer) would give - without fitting one
+    vectorizer per answer.
+
+    With smooth idf over two documents a term has idf 1 when both documents use it and
+    1 + ln(3/2) otherwise, so the pairwise weights follow from raw counts alone. The
+    counts for the whole cohort come from a single vectorizer fit, and the dot products
+    against the model answer from a single sparse matrix-vector product.
+    """
+    import numpy as np
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    if not student_answers:
+        return np.zeros(0)
+    if not model_answer:
+        return np.zeros(len(student_answers))
+
+    vectorizer = CountVectorizer()
+    try:
+        counts = vectorizer.fit_transform([model_answer] + student_answers).tocsr().astype(np.float64)
+    except ValueError:
+        return np.zeros(len(student_answers))
+
+    model = counts[0].toarray().ravel()
+    students = counts[1:]
+    unshared_idf_sq = (1 + np.log(1.5)) ** 2
+
+    dot = students @ model
+    students_sq = students.multiply(students).tocsr()
+    student_shared_sq = students_sq @ (model > 0).astype(np.float64)
+    student_total_sq = np.asarray(students_sq.sum(axis=1)).ravel()
+    student_norm_sq = student_shared_sq + unshared_idf_sq * (student_total_sq - student_shared_sq)
+
+    model_sq = model ** 2
+    model_shared_sq = (students > 0).astype(np.float64) @ model_sq
+    model_norm_sq = model_shared_sq + unshared_idf_sq * (model_sq.sum() - model_shared_sq)
+
+    denominator = np.sqrt(student_norm_sq * model_norm_sq)
+    return np.divide(dot, denominator, out=np.zeros_like(dot), where=denominator > 0)
+
+def grade_essays_batch(question, answers):
+    """
+    Grades many student answers to the same essay question in one vectorized pass.
+    Returns one result dict per answer, in order, identical to calculate_essay_score.
+    """
+    return grade_essays_for_artifact(get_question_artifact(question), question.marks, question.word_limit, answers)
+
+def grade_essays_for_artifact(artifact, max_mark, word_limit, answers):
+    """
+    grade_essays_batch for a question given as its grading artifact, mark and word limit,
+    so the work can be sent to another process.
+    """
+    student_answers = [preprocess_text(answer) for answer in answers]
+    similarities = _pairwise_cosine_batch(artifact['modelAnswer'], student_answers)
+
+    return [
+        _build_essay_result(answer_raw, student_answer, float(cosine_sim), artifact['keywords'], max_mark, word_limit)
+        for answer_raw, student_answer, cosine_sim in zip(answers, student_answers, similarities)
+    ]
     
 if __name__ == '__main__':
     # Example Usage
@@ -0,0 +1,114 @@
+import atexit
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app
+
+class NLPPoolBusyError(RuntimeError):
+    """Raised when the pool's pending-task limit stays reached for a whole task timeout."""
+
+class NLPTaskTimeoutError(RuntimeError):
+    """Raised when a task submitted to the pool does not finish within NLP_TASK_TIMEOUT."""
+
+_executor = None
+_executor_pid = None
+_slots = None
+_lock = threading.Lock()
+
+def _init_worker():
+    # Each worker loads the NLTK stack once, before its first task
+    from .text_processing import warm_nlp
+    warm_nlp()
+
+def _settings():
+    config = current_app.config
+    workers = config.get('NLP_POOL_WORKERS', 0)
+    return workers, config.get('NLP_POOL_MAX_PENDING') or workers * 4, config.get('NLP_TASK_TIMEOUT', 30)
+
+def get_executor():
+    """
+    Returns the process pool, creating it on first use (and again in a forked child,
+    which cannot use its parent's pool). Returns None when NLP_POOL_WORKERS is 0.
+    """
+    global _executor, _executor_pid, _slots
+    workers, max_pending, _ = _settings()
+    if workers <= 0:
+        return None
+    with _lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+            _executor_pid = os.getpid()
+            _slots = threading.BoundedSemaphore(max_pending)
+        return _executor
+
+def shutdown():
+    global _executor
+    with _lock:
+        if _executor is not None and _executor_pid == os.getpid():
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+atexit.register(shutdown)
+
+def _discard(executor, terminate=False):
+    """
+    Drops a pool that stopped working, so the next call starts a fresh one. Only `executor`
+    is dropped: another thread may already have replaced it. With terminate, its worker
+    processes are killed too, freeing the ones still stuck on a task.
+    """
+    global _executor
+    with _lock:
+        if _executor is not executor:
+            return
+        _executor = None
+    # ProcessPoolExecutor has no public way to stop running tasks
+    processes = list((getattr(executor, '_processes', None) or {}).values()) if terminate else []
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+
+def run_many(fn, calls):
+    """
+    Runs fn(*args) for every args tuple in `calls` and returns the results in order.
+    With a pool, the calls run in parallel on the worker processes; at most
+    NLP_POOL_MAX_PENDING tasks are queued at once across all request threads, and each
+    result must arrive within NLP_TASK_TIMEOUT seconds. `fn` and its arguments must be
+    picklable. Without a pool (NLP_POOL_WORKERS=0), the calls run in this process.
+    """
+    calls = list(calls)
+    executor = get_executor()
+    if executor is None:
+        return [fn(*args) for args in calls]
+
+    _, _, timeout = _settings()
+    slots = _slots
+    futures = []
+    try:
+        for args in calls:
+            if not slots.acquire(timeout=timeout):
+                raise NLPPoolBusyError(f"NLP pool queue is full ({fn.__name__})")
+            try:
+                future = executor.submit(fn, *args)
+            except BaseException:
+                slots.release()
+                raise
+            future.add_done_callback(lambda _: slots.release())
+            futures.append(future)
+        return [future.result(timeout=timeout) for future in futures]
+    except FutureTimeoutError:
+        # The task keeps its worker (and its queue slot) until it ends, so a few stuck
+        # essays would fill the pool; kill the workers and start a fresh pool instead
+        _discard(executor, terminate=True)
+        raise NLPTaskTimeoutError(f"{fn.__name__} did not finish within {timeout}s")
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); start a fresh pool on the next call
+        _discard(executor)
+        raise
+    finally:
+        for future in futures:
+            future.cancel()
+
+def run(fn, *args):
+    """Runs a single fn(*args) like run_many."""
+    return run_many(fn, [args])[0]
@@ -1,39 +1,23 @@
-import nltk
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import re
 import random  # For mock data
 import json
+from flask import current_app
 
-# Download NLTK data if not already present
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords')
-try:
-    nltk.data.find('corpora/wordnet')
-except LookupError:
-    nltk.download('wordnet')
-
-stop_words = set(stopwords.words('english'))
-lemmatizer = WordNetLemmatizer()
-
-def preprocess_text(text):
-    """Cleans and tokenizes text, removes stop words, and lemmatizes."""
-    if not text:
-        return ""
-    clean_text = re.sub(r'<[^>]+>', '', text)
-    clean_text = re.sub(r'[^a-zA-Z\s]', '', clean_text).lower()
-    tokens = clean_text.split()
-    lemmatized_tokens = [lemmatizer.lemmatize(word) for word in tokens if word not in stop_words]
-    return " ".join(lemmatized_tokens)
-
-def check_plagiarism(current_submission_id, student_answer_raw, all_submissions_for_assessment):
+from .text_processing import preprocess_text
+from .essay_texts import load_essay_texts
+from . import course_corpus, hashed_vectors, nlp_pool, plagiarism_index, reference_corpus, winnowing
+
+MATCH_THRESHOLD = 0.3
+# Share of an essay's fingerprints another answer must contain to be reported
+FINGERPRINT_MATCH_THRESHOLD = 0.1
+MAX_REPORTED_SPANS = 10
+
+def check_plagiarism(current_submission_id, student_answer_raw, all_submissions_for_assessment, essay_texts=None, question_id=None):
     """
     Checks for plagiarism by comparing a student's answer against other submissions
     for the same assessment using Cosine Similarity.
+    `essay_texts` optionally maps (submission_id, question_id) to already preprocessed
+    essays (see utils.essay_texts) so they are not parsed and preprocessed again.
+    With a `question_id`, only other answers to that question are compared.
     """
     current_student_preprocessed = preprocess_text(student_answer_raw)
     
@@ -55,11 +39,27 @@ def check_plagiarism(current_submission_id, student_answer_raw, all_submissions_
     documents = [current_student_preprocessed]
     other_submission_map = {}
 
-    for sub in all_submissions_for_assessment:
+    if essay_texts is not None:
+        students = {sub.id: sub for sub in all_submissions_for_assessment}
+        for (submission_id, other_question_id), tokens in essay_texts.items():
+            sub = students.get(submission_id)
+            if question_id is not None and other_question_id != question_id:
+                continue
+            if sub and sub.id != current_submission_id and tokens:
+                documents.append(tokens)
+                other_submission_map[len(documents) - 1] = {
+                    'submission_id': sub.id,
+                    'question_id': other_question_id,
+                    'student_name': sub.user.first_name + ' ' + sub.user.last_name if sub.user else 'Unknown Student'
+                }
+
+    for sub in all_submissions_for_assessment if essay_texts is None else []:
         if sub.id != current_submission_id and sub.answers_json:
             try:
                 other_answers = json.loads(sub.answers_json)
                 for ans_idx, other_ans in enumerate(other_answers):
+                    if question_id is not None and other_ans.get('questionId') != question_id:
+                        continue
                     if other_ans.get('type') == 'essay' and other_ans.get('content'):
                         preprocessed_other_answer = preprocess_text(other_ans['content'])
                         if preprocessed_other_answer:
@@ -85,6 +85,9 @@ def check_plagiarism(current_submission_id, student_answer_raw, all_submissions_
             }
         }
 
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.metrics.pairwise import cosine_similarity
+
     vectorizer = TfidfVectorizer()
     try:
         tfidf_matrix = vectorizer.fit_transform(documents)
@@ -94,7 +97,7 @@ def check_plagiarism(current_submission_id, student_answer_raw, all_submissions_
             if sim_score > highest_similarity:
                 highest_similarity = sim_score
             
-            if sim_score > 0.3:
+            if sim_score > MATCH_THRESHOLD:
                 matched_sub_info = other_submission_map.get(i + 1)
                 if matched_sub_info:
                     matched_sources.append({
@@ -119,6 +122,336 @@ def check_plagiarism(current_submission_id, student_answer_raw, all_submissions_
         'nlpInsights': nlp_insights
     }
     
+def first_document_similarities(documents):
+    """
+    TF-IDF cosine similarity of the first preprocessed document to each of the others,
+    as a list of floats, or None when the documents have no usable terms.
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.metrics.pairwise import cosine_similarity
+
+    try:
+        tfidf_matrix = TfidfVectorizer().fit_transform(documents)
+    except ValueError:
+        return None
+    return cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:])[0].tolist()
+
+def score_lsh_shortlist(assessment_id, processed_text, exclude_submission_id=None, question_id=None):
+    """
+    Pre-selects likely matches through the assessment's LSH buckets and computes the
+    exact TF-IDF cosine similarity against that shortlist only.
+    Returns match dicts in the same shape as plagiarism_index.search.
+    """
+    candidates = plagiarism_index.lsh_candidates(assessment_id, processed_text, exclude_submission_id, question_id)
+    if not processed_text or not candidates:
+        return []
+
+    essay_texts = load_essay_texts(assessment_id, submission_ids={c.submission_id for c in candidates})
+    shortlist = []
+    documents = [processed_text]
+    for candidate in candidates:
+        text = essay_texts.get((candidate.submission_id, candidate.question_id))
+        if text:
+            shortlist.append(candidate)
+            documents.append(text)
+    if not shortlist:
+        return []
+
+    similarities = nlp_pool.run(first_document_similarities, documents)
+    if similarities is None:
+        return []
+
+    matches = [
+        {
+            'documentId': candidate.id,
+            'submissionId': candidate.submission_id,
+            'questionId': candidate.question_id,
+            'similarity': float(similarity)
+        }
+        for candidate, similarity in zip(shortlist, similarities)
+    ]
+    matches.sort(key=lambda m: m['similarity'], reverse=True)
+    return matches
+
+def check_plagiarism_indexed(assessment_id, student_answer_raw, exclude_submission_id=None, question_id=None):
+    """
+    Same report as check_plagiarism, but candidates come from the assessment's persistent
+    index: the inverted index by default, MinHash LSH buckets when
+    PLAGIARISM_CANDIDATES is 'lsh', or stored hashed vectors when it is 'hashing'. With a `question_id`, only answers to that question
+    are compared.
+    """
+    return _indexed_report(assessment_id, preprocess_text(student_answer_raw), exclude_submission_id, question_id)
+
+def check_submission_plagiarism(assessment_id, essay_texts, exclude_submission_id=None, essay_contents=None):
+    """
+    Checks each of a submission's essays only against other answers to the same question.
+    `essay_texts` is a list of (question_id, preprocessed tokens) pairs.
+    Returns a check_plagiarism style report whose similarityScore is the highest
+    per-question score, with the per-question reports under 'questionScores'.
+    With the raw `essay_contents` ((question_id, content) pairs), each question also
+    gets character fingerprint overlap scores and spans, each summarized by its highest
+    value: against other answers ('fingerprintScore', PLAGIARISM_FINGERPRINTS), the
+    course corpus ('corpusScore', PLAGIARISM_COURSE_CORPUS) and the course's reference
+    documents ('referenceScore', when REFERENCE_DOCS_ROOT is set).
+    """
+    from app.models.assessment import Assessment
+
+    fingerprints = essay_contents is not None and current_app.config.get('PLAGIARISM_FINGERPRINTS', True)
+    corpus = essay_contents is not None and course_corpus.corpus_enabled()
+    references = essay_contents is not None and reference_corpus.references_enabled()
+    assessment = Assessment.query.get(assessment_id) if essay_contents is not None else None
+    contents = dict(essay_contents or [])
+    question_scores = []
+    for question_id, tokens in essay_texts:
+        report = _indexed_report(assessment_id, tokens, exclude_submission_id, question_id)
+        entry = {
+            'questionId': question_id,
+            'similarityScore': report['similarityScore'],
+            'matchedSources': report['matchedSources']
+        }
+        content = contents.get(question_id)
+        text = fingerprint_text(content, assessment) if content and assessment else None
+        if fingerprints:
+            entry.update(fingerprint_report(assessment_id, content, text, exclude_submission_id, question_id))
+        if corpus:
+            entry.update(corpus_report(assessment.course_id, assessment_id, content, text))
+        if references:
+            entry.update(reference_report(assessment.course_id, content, text))
+        question_scores.append(entry)
+
+    highest = max(question_scores, key=lambda q: q['similarityScore']) if question_scores else None
+    matched_sources = [m for q in question_scores for m in q['matchedSources']]
+    matched_sources.sort(key=lambda m: m['percentage'], reverse=True)
+    return {
+        'similarityScore': highest['similarityScore'] if highest else 0,
+        'matchedSources': matched_sources,
+        'cosineSimilarity': round(highest['similarityScore'] / 100, 2) if highest else 0.0,
+        'questionScores': question_scores,
+        'fingerprintScore': max((q['fingerprintScore'] for q in question_scores), default=0) if fingerprints else None,
+        'corpusScore': max((q['corpusScore'] for q in question_scores), default=0) if corpus else None,
+        'referenceScore': max((q['referenceScore'] for q in question_scores), default=0) if references else None,
+        'nlpInsights': {
+            'missingKeywords': [],
+            'extraKeywords': [],
+            'sentiment': 'neutral',
+            'readabilityScore': random.randint(50, 90)
+        }
+    }
+
+def fingerprint_text(content, assessment):
+    """An essay's text for fingerprinting, stripped as the assessment's ignore_quotes/ignore_references ask."""
+    return winnowing.prepare(content, bool(assessment.ignore_quotes), bool(assessment.ignore_references))
+
+def fingerprint_report(assessment_id, content, text, exclude_submission_id=None, question_id=None):
+    """
+    Character-level overlap of one essay with the other answers to the same question,
+    from winnowed fingerprints of its fingerprint_text. Catches copying with light word
+    swaps that word-level TF-IDF over lemmas dilutes, and ignores shared topical vocabulary.
+    Returns {'fingerprintScore': highest overlap percentage, 'fingerprintMatches': [...]}
+    where each match lists the overlapping spans of this essay (character offsets into
+    its plain text, with the text) and where they occur in the other answer.
+    """
+    overlaps = plagiarism_index.fingerprint_overlaps(assessment_id, text, exclude_submission_id, question_id) if text else []
+    return {
+        'fingerprintScore': round(overlaps[0]['overlap'] * 100, 2) if overlaps else 0,
+        'fingerprintMatches': _overlap_matches(overlaps, content)
+    }
+
+def corpus_report(course_id, assessment_id, content, text):
+    """
+    Like fingerprint_report, against the course corpus: essays written for the course's
+    other assessments, including earlier sessions of a reused assessment.
+    """
+    overlaps = course_corpus.search(course_id, text, exclude_assessment_id=assessment_id) if text else []
+    return {
+        'corpusScore': round(overlaps[0]['overlap'] * 100, 2) if overlaps else 0,
+        'corpusMatches': _overlap_matches(overlaps, content)
+    }
+
+def reference_report(course_id, content, text):
+    """Like fingerprint_report, against the reference documents registered for the course."""
+    overlaps = reference_corpus.search(course_id, text) if text else []
+    return {
+        'referenceScore': round(overlaps[0]['overlap'] * 100, 2) if overlaps else 0,
+        'referenceMatches': _overlap_matches(overlaps, content)
+    }
+
+def _overlap_matches(overlaps, content):
+    text = winnowing.plain_text(content)
+    matches = []
+    for overlap in overlaps:
+        if overlap['overlap'] < FINGERPRINT_MATCH_THRESHOLD:
+            break
+        match = {
+            key: overlap[key]
+            for key in ('submissionId', 'assessmentId', 'questionId', 'documentId', 'title')
+            if key in overlap
+        }
+        match['percentage'] = round(overlap['overlap'] * 100, 2)
+        match['spans'] = [
+            dict(span, text=text[span['start']:span['end']])
+            for span in overlap['spans'][:MAX_REPORTED_SPANS]
+        ]
+        matches.append(match)
+    return matches
+
+def _indexed_report(assessment_id, processed, exclude_submission_id=None, question_id=None):
+    from app.models.assessment import Submission
+
+    mode = current_app.config.get('PLAGIARISM_CANDIDATES')
+    if mode == 'lsh':
+        matches = score_lsh_shortlist(assessment_id, processed, exclude_submission_id, question_id)
+    elif mode == 'hashing':
+        matches = hashed_vectors.search(assessment_id, processed, exclude_submission_id, question_id)
+    else:
+        matches = plagiarism_index.search(assessment_id, processed, exclude_submission_id, question_id)
+    highest_similarity = matches[0]['similarity'] if matches else 0.0
+
+    strong_matches = [m for m in matches if m['similarity'] > MATCH_THRESHOLD]
+    submissions = {
+        sub.id: sub for sub in Submission.query.filter(
+            Submission.id.in_({m['submissionId'] for m in strong_matches})
+        ).all()
+    } if strong_matches else {}
+
+    matched_sources = []
+    for match in strong_matches:
+        sub = submissions.get(match['submissionId'])
+        student_name = sub.user.first_name + ' ' + sub.user.last_name if sub and sub.user else 'Unknown Student'
+        matched_sources.append({
+            'source': f"Submission by {student_name} (Question ID: {match['questionId']})",
+            'submissionId': match['submissionId'],
+            'percentage': round(match['similarity'] * 100, 2)
+        })
+
+    return {
+        'similarityScore': round(highest_similarity * 100, 2),
+        'matchedSources': matched_sources,
+        'cosineSimilarity': round(highest_similarity, 2),
+        'nlpInsights': {
+            'missingKeywords': [],
+            'extraKeywords': [],
+            'sentiment': 'neutral',
+            'readabilityScore': random.randint(50, 90)
+        }
+    }
+
+def save_plagiarism_report(submission, report):
+    """
+    Persists a check_submission_plagiarism report as the submission's PlagiarismReport,
+    replacing (and un-reviewing) any earlier one. The caller commits.
+    """
+    from app import db
+    from app.models.lecturer import PlagiarismReport
+
+    row = PlagiarismReport.query.filter_by(submission_id=submission.id).first()
+    if not row:
+        row = PlagiarismReport(submission_id=submission.id)
+        db.session.add(row)
+    row.similarity_score = report['similarityScore']
+    row.matched_sources = json.dumps(report['matchedSources'])
+    row.question_scores = json.dumps(report.get('questionScores', []))
+    row.fingerprint_score = report.get('fingerprintScore')
+    row.corpus_score = report.get('corpusScore')
+    row.reference_score = report.get('referenceScore')
+    row.reviewed = False
+    row.reviewed_by = None
+    row.reviewed_at = None
+    return row
+
+def submission_essays(submission, questions_by_id):
+    """Returns (question_id, content) pairs for a stored submission's non-empty essay answers."""
+    try:
+        answers = json.loads(submission.answers_json) if submission.answers_json else []
+    except json.JSONDecodeError:
+        return []
+    essays = []
+    for answer in answers:
+        question = questions_by_id.get(answer.get('questionId'))
+        if question and question.type == 'essay' and answer.get('content'):
+            essays.append((question.id, answer['content']))
+    return essays
+
+def index_submission_essays(submission, essay_texts, essay_contents=None):
+    """
+    Adds a submission's essays to its assessment's plagiarism index, and stores their
+    hashed vectors when PLAGIARISM_CANDIDATES is 'hashing'.
+    `essay_texts` is a list of (question_id, preprocessed tokens) pairs, as returned by
+    essay_texts.store_essay_texts; fingerprints are indexed, and the essays added to the
+    course corpus, from the raw `essay_contents` when given. The caller commits.
+    """
+    hashing = current_app.config.get('PLAGIARISM_CANDIDATES') == 'hashing'
+    for question_id, tokens in essay_texts:
+        plagiarism_index.index_essay(submission.assessment_id, submission.id, question_id, tokens)
+        if hashing:
+            hashed_vectors.add_essay(submission.assessment_id, submission.id, question_id, tokens)
+    if essay_contents is None:
+        return
+    texts = [(question_id, fingerprint_text(content, submission.assessment)) for question_id, content in essay_contents]
+    if current_app.config.get('PLAGIARISM_FINGERPRINTS', True):
+        for question_id, text in texts:
+            plagiarism_index.index_fingerprints(submission.assessment_id, submission.id, question_id, text)
+    if course_corpus.corpus_enabled():
+        course_corpus.add_essays(
+            submission.assessment.course_id, submission.assessment_id, submission.id,
+            texts, created_at=submission.submitted_at
+        )
+
+def remove_submission_essays(submission_id):
+    """Takes a submission's essays back out of the plagiarism indexes and the course corpus."""
+    plagiarism_index.remove_submission(submission_id)
+    hashed_vectors.remove_submission(submission_id)
+    course_corpus.remove_submission(submission_id)
+    
+def evaluate_lsh_recall(assessment, bands, rows, shingle_size):
+    """
+    Compares LSH candidate retrieval with the brute-force check_plagiarism on an
+    assessment's stored submissions, entirely in memory.
+    Recall is the share of brute-force matches (essay -> other submission's answer to
+    the same question above MATCH_THRESHOLD) whose essay shares at least one LSH bucket
+    with the query essay.
+    """
+    from collections import defaultdict
+    from app.models.assessment import Submission
+    from . import minhash
+
+    submissions = Submission.query.filter_by(assessment_id=assessment.id).all()
+    essay_texts = load_essay_texts(assessment.id)
+
+    essays = []
+    buckets = defaultdict(set)
+    for (submission_id, question_id), tokens in essay_texts.items():
+        signature = plagiarism_index.essay_signature(tokens, bands, rows, shingle_size)
+        essays.append((submission_id, question_id, tokens, signature))
+        for key in minhash.band_keys(signature, bands, rows) if signature else []:
+            buckets[(question_id, key)].add(submission_id)
+
+    expected_pairs = 0
+    found_pairs = 0
+    shortlist_sizes = []
+    for submission_id, question_id, tokens, signature in essays:
+        report = check_plagiarism(submission_id, tokens, submissions, essay_texts=essay_texts, question_id=question_id)
+        expected = {m['submissionId'] for m in report['matchedSources']}
+        shortlisted = set()
+        for key in minhash.band_keys(signature, bands, rows) if signature else []:
+            shortlisted |= buckets[(question_id, key)]
+        shortlisted.discard(submission_id)
+        expected_pairs += len(expected)
+        found_pairs += len(expected & shortlisted)
+        shortlist_sizes.append(len(shortlisted))
+
+    return {
+        'essays': len(essays),
+        'submissions': len(submissions),
+        'bands': bands,
+        'rows': rows,
+        'shingleSize': shingle_size,
+        'jaccardThreshold': round(minhash.candidate_threshold(bands, rows), 3),
+        'bruteForceMatches': expected_pairs,
+        'recall': round(found_pairs / expected_pairs, 4) if expected_pairs else 1.0,
+        'averageShortlist': round(sum(shortlist_sizes) / len(shortlist_sizes), 2) if shortlist_sizes else 0
+    }
+    
 if __name__ == '__main__':
     # Mock Submission objects for testing
     from datetime import datetime
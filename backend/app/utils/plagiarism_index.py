@@ -0,0 +1,294 @@
+import logging
+import math
+from collections import Counter, defaultdict
+from flask import current_app
+from sqlalchemy import func, insert, select
+from app import db
+from ..models.plagiarism import PlagiarismDocument, PlagiarismPosting, PlagiarismLSHBucket, EssayFingerprint
+from .text_processing import PREPROCESSING_VERSION
+from . import minhash, winnowing
+
+logger = logging.getLogger(__name__)
+
+# Terms used by more than this share of an assessment's essays are too common to
+# nominate candidates on their own; they still count when the candidates are scored.
+CANDIDATE_MAX_DF_RATIO = 0.5
+MAX_TERM_LENGTH = 100
+
+def _log_tf(processed_text):
+    counts = Counter(term[:MAX_TERM_LENGTH] for term in processed_text.split())
+    return {term: 1 + math.log(count) for term, count in counts.items()}
+
+def fingerprint_settings():
+    """Returns (k, window) for winnowed character fingerprints from the app config."""
+    config = current_app.config
+    return config.get('PLAGIARISM_FINGERPRINT_K', 20), config.get('PLAGIARISM_FINGERPRINT_WINDOW', 16)
+
+def lsh_settings():
+    """Returns (bands, rows, shingle_size) from the app config."""
+    config = current_app.config
+    return (
+        config.get('PLAGIARISM_LSH_BANDS', 32),
+        config.get('PLAGIARISM_LSH_ROWS', 3),
+        config.get('PLAGIARISM_SHINGLE_SIZE', 1)
+    )
+
+def essay_signature(processed_text, bands, rows, shingle_size):
+    """MinHash signature of a preprocessed essay sized for the given banding."""
+    return minhash.signature(minhash.shingles(processed_text, shingle_size), bands * rows)
+
+def index_essay(assessment_id, submission_id, question_id, processed_text):
+    """
+    Adds one preprocessed essay to its assessment's inverted index.
+    Postings store log-tf weights already divided by the document norm, so they never
+    need rewriting when other essays are added. The caller commits.
+    """
+    weights = _log_tf(processed_text)
+    if not weights:
+        return None
+
+    norm = math.sqrt(sum(w * w for w in weights.values()))
+    bands, rows, shingle_size = lsh_settings()
+    signature = essay_signature(processed_text, bands, rows, shingle_size)
+    document = PlagiarismDocument(
+        assessment_id=assessment_id,
+        submission_id=submission_id,
+        question_id=question_id,
+        norm=norm,
+        term_count=len(weights),
+        minhash_signature=signature,
+        preprocessing_version=PREPROCESSING_VERSION
+    )
+    db.session.add(document)
+    db.session.flush()
+
+    db.session.execute(insert(PlagiarismPosting), [
+        {
+            'assessment_id': assessment_id,
+            'document_id': document.id,
+            'question_id': question_id,
+            'term': term,
+            'weight': weight / norm
+        }
+        for term, weight in weights.items()
+    ])
+    if signature:
+        db.session.execute(insert(PlagiarismLSHBucket), [
+            {
+                'assessment_id': assessment_id,
+                'document_id': document.id,
+                'question_id': question_id,
+                'band': band,
+                'bucket': bucket
+            }
+            for band, bucket in minhash.band_keys(signature, bands, rows)
+        ])
+    return document
+
+def index_fingerprints(assessment_id, submission_id, question_id, text):
+    """
+    Adds the winnowed fingerprints of one essay, given as its winnowing.prepare text.
+    The caller commits.
+    """
+    k, window = fingerprint_settings()
+    rows = [
+        {
+            'assessment_id': assessment_id,
+            'submission_id': submission_id,
+            'question_id': question_id,
+            'hash': value,
+            'span_start': start,
+            'span_end': end
+        }
+        for value, start, end in winnowing.fingerprints(text, k, window)
+    ]
+    if rows:
+        db.session.execute(insert(EssayFingerprint), rows)
+    return len(rows)
+
+def fingerprint_overlaps(assessment_id, text, exclude_submission_id=None, question_id=None):
+    """
+    Finds the other answers to the same question that share winnowed fingerprints with
+    an essay (its winnowing.prepare text), through hash lookups in the fingerprint
+    index: the work grows with the essay's length, not with the number of submissions.
+    Fingerprints shared by more than PLAGIARISM_FINGERPRINT_MAX_SHARED answers (quoted
+    question text, set phrases) are ignored, unless no other fingerprint is shared. The
+    cap is a count, not a share of the answers, so an essay copied by most of a small
+    class still matches its copies.
+
+    Returns a list of dicts (submissionId, questionId, overlap, spans) sorted by
+    descending overlap, where overlap is the share of the essay's fingerprints found in
+    that answer and spans are the merged matching regions (see winnowing.merge_spans).
+    """
+    k, window = fingerprint_settings()
+    query = winnowing.query_spans(text, k, window)
+    if not query:
+        return []
+
+    partition = [EssayFingerprint.assessment_id == assessment_id, EssayFingerprint.question_id == question_id]
+    if exclude_submission_id is not None:
+        partition.append(EssayFingerprint.submission_id != exclude_submission_id)
+
+    max_shared = current_app.config.get('PLAGIARISM_FINGERPRINT_MAX_SHARED', 50)
+    shared_by = (
+        db.session.query(EssayFingerprint.hash, func.count(func.distinct(EssayFingerprint.submission_id)))
+        .filter(*partition, EssayFingerprint.hash.in_(list(query)))
+        .group_by(EssayFingerprint.hash)
+        .all()
+    )
+    if not shared_by:
+        return []
+    distinctive = [value for value, count in shared_by if count <= max_shared] or [value for value, _ in shared_by]
+
+    rows = (
+        db.session.query(EssayFingerprint.submission_id, EssayFingerprint.hash, EssayFingerprint.span_start, EssayFingerprint.span_end)
+        .filter(*partition, EssayFingerprint.hash.in_(distinctive))
+        .all()
+    )
+    results = [
+        {'submissionId': submission_id, 'questionId': question_id, 'overlap': overlap, 'spans': spans}
+        for submission_id, (overlap, spans) in winnowing.collect_overlaps(query, rows).items()
+    ]
+    results.sort(key=lambda r: r['overlap'], reverse=True)
+    return results
+
+def remove_submission(submission_id):
+    """Drops every indexed essay of a submission, e.g. before reindexing it."""
+    EssayFingerprint.query.filter_by(submission_id=submission_id).delete(synchronize_session=False)
+    remove_documents(submission_id)
+
+def remove_documents(submission_id):
+    """Drops a submission's documents, postings and LSH buckets, but not its fingerprints."""
+    document_ids = [d.id for d in PlagiarismDocument.query.filter_by(submission_id=submission_id).all()]
+    if document_ids:
+        PlagiarismPosting.query.filter(PlagiarismPosting.document_id.in_(document_ids)).delete(synchronize_session=False)
+        PlagiarismLSHBucket.query.filter(PlagiarismLSHBucket.document_id.in_(document_ids)).delete(synchronize_session=False)
+        PlagiarismDocument.query.filter(PlagiarismDocument.id.in_(document_ids)).delete(synchronize_session=False)
+
+def search(assessment_id, processed_text, exclude_submission_id=None, question_id=None):
+    """
+    Scores a preprocessed essay against the indexed essays of an assessment that share
+    a distinctive term with it, using lnc.ltc cosine similarity: stored essays carry
+    length-normalized log-tf weights and the query gets idf weighting at search time.
+    With a question_id, only answers to that question are scored and idf is computed
+    over them alone.
+
+    Returns a list of dicts (documentId, submissionId, questionId, similarity) sorted by
+    descending similarity.
+
+    Essays indexed by an older preprocessing version are left out, as in
+    essay_texts.load_essay_texts, until essay_texts.rebuild_essay_texts reindexes them.
+    """
+    query_tf = _log_tf(processed_text)
+    if not query_tf:
+        return []
+
+    documents = [PlagiarismDocument.assessment_id == assessment_id]
+    partition = [PlagiarismPosting.assessment_id == assessment_id]
+    if question_id is not None:
+        documents.append(PlagiarismDocument.question_id == question_id)
+        partition.append(PlagiarismPosting.question_id == question_id)
+
+    # Documents per preprocessing version, in the same query that counts them
+    versions = dict(
+        db.session.query(PlagiarismDocument.preprocessing_version, func.count(PlagiarismDocument.id))
+        .filter(*documents)
+        .group_by(PlagiarismDocument.preprocessing_version)
+        .all()
+    )
+    total_documents = versions.pop(PREPROCESSING_VERSION, 0)
+    if versions:
+        stale = sum(versions.values())
+        logger.warning(f"{stale} indexed essays for assessment {assessment_id} predate preprocessing version {PREPROCESSING_VERSION}")
+        # Postings carry no version; keep to the current documents' postings until the rebuild
+        partition.append(PlagiarismPosting.document_id.in_(
+            select(PlagiarismDocument.id).where(*documents, PlagiarismDocument.preprocessing_version == PREPROCESSING_VERSION)
+        ))
+    if not total_documents:
+        return []
+
+    document_frequency = dict(
+        db.session.query(PlagiarismPosting.term, func.count(PlagiarismPosting.id))
+        .filter(*partition, PlagiarismPosting.term.in_(list(query_tf)))
+        .group_by(PlagiarismPosting.term)
+        .all()
+    )
+    if not document_frequency:
+        return []
+
+    query_weights = {
+        term: tf * (math.log((1 + total_documents) / (1 + document_frequency.get(term, 0))) + 1)
+        for term, tf in query_tf.items()
+    }
+    query_norm = math.sqrt(sum(w * w for w in query_weights.values()))
+
+    max_df = max(1, CANDIDATE_MAX_DF_RATIO * total_documents)
+    candidate_terms = [t for t, df in document_frequency.items() if df <= max_df] or list(document_frequency)
+    candidate_ids = (
+        select(PlagiarismPosting.document_id)
+        .where(*partition, PlagiarismPosting.term.in_(candidate_terms))
+        .distinct()
+    )
+
+    postings = (
+        db.session.query(
+            PlagiarismPosting.document_id,
+            PlagiarismDocument.submission_id,
+            PlagiarismDocument.question_id,
+            PlagiarismPosting.term,
+            PlagiarismPosting.weight
+        )
+        .join(PlagiarismDocument, PlagiarismPosting.document_id == PlagiarismDocument.id)
+        .filter(
+            PlagiarismPosting.document_id.in_(candidate_ids),
+            PlagiarismPosting.term.in_(list(document_frequency))
+        )
+    )
+    if exclude_submission_id is not None:
+        postings = postings.filter(PlagiarismDocument.submission_id != exclude_submission_id)
+
+    scores = defaultdict(float)
+    documents = {}
+    for document_id, submission_id, question_id, term, weight in postings.all():
+        scores[document_id] += weight * query_weights[term]
+        documents[document_id] = (submission_id, question_id)
+
+    results = [
+        {
+            'documentId': document_id,
+            'submissionId': documents[document_id][0],
+            'questionId': documents[document_id][1],
+            'similarity': min(1.0, score / query_norm)
+        }
+        for document_id, score in scores.items()
+    ]
+    results.sort(key=lambda r: r['similarity'], reverse=True)
+    return results
+
+def lsh_candidates(assessment_id, processed_text, exclude_submission_id=None, question_id=None):
+    """
+    Looks up the indexed essays that share at least one LSH bucket with a preprocessed
+    essay, optionally only among answers to one question. Cost depends on the number of
+    bands, not on the size of the cohort. Returns PlagiarismDocument rows.
+    """
+    bands, rows, shingle_size = lsh_settings()
+    signature = essay_signature(processed_text, bands, rows, shingle_size)
+    if not signature:
+        return []
+
+    buckets = [bucket for _, bucket in minhash.band_keys(signature, bands, rows)]
+    partition = [PlagiarismLSHBucket.assessment_id == assessment_id]
+    if question_id is not None:
+        partition.append(PlagiarismLSHBucket.question_id == question_id)
+    candidate_ids = (
+        select(PlagiarismLSHBucket.document_id)
+        .where(*partition, PlagiarismLSHBucket.bucket.in_(buckets))
+        .distinct()
+    )
+    query = PlagiarismDocument.query.filter(
+        PlagiarismDocument.id.in_(candidate_ids),
+        PlagiarismDocument.preprocessing_version == PREPROCESSING_VERSION
+    )
+    if exclude_submission_id is not None:
+        query = query.filter(PlagiarismDocument.submission_id != exclude_submission_id)
+    return query.all()
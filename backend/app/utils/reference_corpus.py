@@ -0,0 +1,169 @@
+import codecs
+import hashlib
+import os
+from flask import current_app
+from sqlalchemy import insert
+from app import db
+from ..models.plagiarism import ReferenceDocument, ReferenceFingerprint
+from .plagiarism_index import fingerprint_settings
+from . import winnowing
+
+READ_CHUNK_SIZE = 64 * 1024
+INSERT_BATCH_SIZE = 1000
+# Supported extensions, and whether the file is HTML
+REFERENCE_EXTENSIONS = {'.txt': False, '.md': False, '.html': True, '.htm': True}
+
+
+class ReferencePathError(ValueError):
+    """Raised for reference paths that are outside REFERENCE_DOCS_ROOT, missing or unsupported."""
+
+
+def references_enabled():
+    return bool(current_app.config.get('REFERENCE_DOCS_ROOT'))
+
+def reference_root():
+    root = current_app.config.get('REFERENCE_DOCS_ROOT')
+    if not root:
+        raise ReferencePathError('Reference documents are disabled: REFERENCE_DOCS_ROOT is not set')
+    return os.path.realpath(root)
+
+def resolve_path(relative_path):
+    """
+    Absolute path of a file or directory given relative to REFERENCE_DOCS_ROOT. Symlinks
+    are resolved first, so nothing outside the root can be reached.
+    """
+    root = reference_root()
+    full_path = os.path.realpath(os.path.join(root, relative_path or ''))
+    if os.path.commonpath([root, full_path]) != root:
+        raise ReferencePathError(f"{relative_path} is outside the reference documents directory")
+    if not os.path.exists(full_path):
+        raise ReferencePathError(f"{relative_path} does not exist")
+    return full_path
+
+def reference_files(relative_path):
+    """The supported files at a path (a file, or a directory walked recursively), in order."""
+    full_path = resolve_path(relative_path)
+    if os.path.isfile(full_path):
+        if os.path.splitext(full_path)[1].lower() not in REFERENCE_EXTENSIONS:
+            raise ReferencePathError(f"Unsupported reference file type: {relative_path}")
+        return [full_path]
+
+    root = reference_root()
+    files = []
+    for directory, subdirectories, names in os.walk(full_path):
+        subdirectories.sort()
+        for name in sorted(names):
+            path = os.path.realpath(os.path.join(directory, name))
+            if os.path.splitext(name)[1].lower() in REFERENCE_EXTENSIONS and os.path.commonpath([root, path]) == root:
+                files.append(path)
+    return files
+
+def _read_blocks(path):
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(READ_CHUNK_SIZE), b''):
+            yield block
+
+def _text_chunks(path):
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    for block in _read_blocks(path):
+        yield decoder.decode(block)
+    yield decoder.decode(b'', final=True)
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    for block in _read_blocks(path):
+        digest.update(block)
+    return digest.hexdigest()
+
+def add_reference_file(course_id, full_path, added_by=None):
+    """
+    Indexes one reference file for a course, streaming it from disk: only the winnowed
+    fingerprints are kept, written in batches as they are produced. Files already indexed
+    with the same content are skipped. Returns (ReferenceDocument, whether it was
+    indexed). The caller commits.
+    """
+    relative_path = os.path.relpath(full_path, reference_root())
+    content_hash = _file_hash(full_path)
+    document = ReferenceDocument.query.filter_by(course_id=course_id, path=relative_path).first()
+    if document and document.content_hash == content_hash:
+        return document, False
+
+    if document:
+        ReferenceFingerprint.query.filter_by(document_id=document.id).delete(synchronize_session=False)
+    else:
+        document = ReferenceDocument(course_id=course_id, path=relative_path, added_by=added_by)
+        db.session.add(document)
+    document.title = os.path.splitext(os.path.basename(full_path))[0][:255]
+    document.size_bytes = os.path.getsize(full_path)
+    document.content_hash = content_hash
+    document.fingerprint_count = 0
+    db.session.flush()
+
+    k, window = fingerprint_settings()
+    html = REFERENCE_EXTENSIONS[os.path.splitext(full_path)[1].lower()]
+    batch = []
+    for value, start, end in winnowing.stream_fingerprints(_text_chunks(full_path), k, window, html=html):
+        batch.append({'document_id': document.id, 'course_id': course_id, 'hash': value, 'span_start': start, 'span_end': end})
+        if len(batch) == INSERT_BATCH_SIZE:
+            db.session.execute(insert(ReferenceFingerprint), batch)
+            document.fingerprint_count += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(ReferenceFingerprint), batch)
+        document.fingerprint_count += len(batch)
+    return document, True
+
+def add_references(course_id, relative_path, added_by=None):
+    """
+    Registers the reference file, or every supported file under the directory, at a
+    path relative to REFERENCE_DOCS_ROOT. Commits after each file.
+    Returns (ReferenceDocument, whether it was indexed) pairs.
+    """
+    results = []
+    for full_path in reference_files(relative_path):
+        results.append(add_reference_file(course_id, full_path, added_by))
+        db.session.commit()
+    return results
+
+def remove_reference(document):
+    """Drops a reference document and its fingerprints. The caller commits."""
+    ReferenceFingerprint.query.filter_by(document_id=document.id).delete(synchronize_session=False)
+    db.session.delete(document)
+
+def search(course_id, text):
+    """
+    Finds the course's reference documents that share winnowed fingerprints with an
+    essay's winnowing.prepare text, with one index probe per fingerprint of the essay.
+    Returns a list of dicts (documentId, title, overlap, spans) sorted by descending
+    overlap, with spans as in winnowing.merge_spans (source offsets are into the file).
+    """
+    k, window = fingerprint_settings()
+    query = winnowing.query_spans(text, k, window)
+    if not query:
+        return []
+
+    rows = (
+        db.session.query(
+            ReferenceFingerprint.document_id,
+            ReferenceFingerprint.hash,
+            ReferenceFingerprint.span_start,
+            ReferenceFingerprint.span_end
+        )
+        .filter(ReferenceFingerprint.course_id == course_id, ReferenceFingerprint.hash.in_(list(query)))
+        .all()
+    )
+    overlaps = winnowing.collect_overlaps(query, rows)
+    if not overlaps:
+        return []
+
+    titles = dict(
+        db.session.query(ReferenceDocument.id, ReferenceDocument.title)
+        .filter(ReferenceDocument.id.in_(list(overlaps)))
+        .all()
+    )
+    results = [
+        {'documentId': document_id, 'title': titles.get(document_id), 'overlap': overlap, 'spans': spans}
+        for document_id, (overlap, spans) in overlaps.items()
+    ]
+    results.sort(key=lambda r: r['overlap'], reverse=True)
+    return results
@@ -0,0 +1,224 @@
+import logging
+import json
+from collections import defaultdict
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import or_, update
+from app import db
+from ..models.assessment import Assessment, Submission
+from ..models.grading import RegradeRun
+from .nlp_grader import get_question_artifact, grade_essays_for_artifact
+from .grade_cache import cached_essay_scores
+from .answer_results import mcq_row, essay_row, replace_answer_results, load_answer_results
+from .assessment_stats import record_grade_changes
+from . import nlp_pool
+
+logger = logging.getLogger(__name__)
+
+# Answers to one question graded per pool task; a batch spreads its chunks over the workers
+ESSAY_CHUNK_SIZE = 50
+
+def _answers(submission):
+    try:
+        return json.loads(submission.answers_json) if submission.answers_json else []
+    except json.JSONDecodeError:
+        return []
+
+def _answers_question(submission, question_id):
+    return any(answer.get('questionId') == question_id for answer in _answers(submission))
+
+def batch_grades(assessment, submissions, question_id=None):
+    """
+    Recomputes the automatic grade of many submissions at once: MCQ marks plus essay
+    scores. Essays missing from the grading cache are graded per question in vectorized
+    chunks that run in parallel on the NLP pool. With a question_id, only answers to that
+    question are scored. Returns ({submission_id: score}, answer_results rows).
+    """
+    questions_by_id = {q.id: q for q in assessment.questions}
+    totals = {submission.id: 0 for submission in submissions}
+    rows = []
+    essays = []
+
+    for submission in submissions:
+        for answer in _answers(submission):
+            question = questions_by_id.get(answer.get('questionId'))
+            if not question or (question_id is not None and question.id != question_id):
+                continue
+            if question.type == 'mcq':
+                selected_option_index = answer.get('selectedOption')
+                options = question.options
+                if isinstance(selected_option_index, int) and 0 <= selected_option_index < len(options):
+                    correct = options[selected_option_index].is_correct
+                    if correct:
+                        totals[submission.id] += question.marks
+                    rows.append(mcq_row(submission.id, question, correct))
+            elif question.type == 'essay' and answer.get('content') and question.model_answer:
+                essays.append((submission.id, question, answer['content']))
+
+    results = cached_essay_scores([(question, content) for _, question, content in essays], grade=_grade_chunks)
+    for (submission_id, question, _), result in zip(essays, results):
+        totals[submission_id] += result['score']
+        rows.append(essay_row(submission_id, question, result))
+    return totals, rows
+
+def _grade_chunks(items):
+    """Grades (question, answer) pairs per question in vectorized chunks on the NLP pool."""
+    by_question = defaultdict(list)
+    for index, (question, answer) in enumerate(items):
+        by_question[question.id].append((index, question, answer))
+
+    calls = []
+    owners = []
+    for entries in by_question.values():
+        question = entries[0][1]
+        artifact = get_question_artifact(question)
+        for start in range(0, len(entries), ESSAY_CHUNK_SIZE):
+            chunk = entries[start:start + ESSAY_CHUNK_SIZE]
+            calls.append((artifact, question.marks, question.word_limit, [answer for _, _, answer in chunk]))
+            owners.append([index for index, _, _ in chunk])
+
+    results = [None] * len(items)
+    for indexes, chunk_results in zip(owners, nlp_pool.run_many(grade_essays_for_artifact, calls)):
+        for index, result in zip(indexes, chunk_results):
+            results[index] = result
+    return results
+
+def _regrade_batch(assessment, submissions, question_id=None):
+    """
+    New grades for a batch, with their answer_results rewritten. Submissions with stored
+    results move by the change in their automatic scores (of every question, or of
+    question_id alone), so a lecturer's adjustment to the grade is kept; older
+    submissions without stored results are regraded in full.
+    """
+    stored = load_answer_results([s.id for s in submissions])
+    graded_before = {submission_id for submission_id, _ in stored}
+    full = [s for s in submissions if s.id not in graded_before]
+    delta = [s for s in submissions if s.id in graded_before]
+
+    new_grades, rows = batch_grades(assessment, full)
+    replace_answer_results([s.id for s in full], rows)
+
+    old_scores = defaultdict(float)
+    for (submission_id, stored_question_id), result in stored.items():
+        if question_id is None or stored_question_id == question_id:
+            old_scores[submission_id] += result.score
+    new_scores, rows = batch_grades(assessment, delta, question_id)
+    for submission in delta:
+        new_grades[submission.id] = (submission.grade or 0) - old_scores[submission.id] + new_scores[submission.id]
+    replace_answer_results([s.id for s in delta], rows, question_id)
+    return new_grades
+
+def start_regrade(assessment_id, question_id=None, requested_by=None):
+    """Creates a queued regrade run. The caller commits."""
+    run = RegradeRun(
+        assessment_id=assessment_id,
+        question_id=question_id,
+        requested_by=requested_by,
+        status='queued',
+        last_submission_id=0,
+        processed=0,
+        changes=[]
+    )
+    db.session.add(run)
+    return run
+
+def run_regrade(run, batch_size=None):
+    """
+    Regrades the run's submissions in keyset-paginated batches, writing each batch's
+    grades with one bulk UPDATE and committing a checkpoint after it. Running it again
+    on an interrupted run continues after the last committed batch.
+    Only submissions that have finished grading are touched; with a question_id, only
+    those that answered that question.
+    """
+    batch_size = batch_size or current_app.config.get('REGRADE_BATCH_SIZE', 200)
+    run_id = run.id
+    assessment = Assessment.query.get(run.assessment_id)
+    run.status = 'running'
+    run.error = None
+    db.session.commit()
+
+    try:
+        while True:
+            batch = (
+                Submission.query
+                .filter(
+                    Submission.assessment_id == run.assessment_id,
+                    Submission.id > run.last_submission_id
+                )
+                .order_by(Submission.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not batch:
+                break
+
+            targets = [
+                s for s in batch
+                if s.grading_status == 'graded'
+                and (run.question_id is None or _answers_question(s, run.question_id))
+            ]
+            old_grades = {s.id: s.grade for s in targets}
+            new_grades = _regrade_batch(assessment, targets, run.question_id)
+
+            if new_grades:
+                db.session.execute(update(Submission), [
+                    {'id': submission_id, 'grade': grade} for submission_id, grade in new_grades.items()
+                ])
+                record_grade_changes(assessment, [
+                    (old_grades[submission_id], grade) for submission_id, grade in new_grades.items()
+                ])
+            changes = [
+                {'submissionId': submission_id, 'oldGrade': old_grades[submission_id], 'newGrade': round(grade, 2)}
+                for submission_id, grade in new_grades.items()
+                if old_grades[submission_id] is None or round(old_grades[submission_id], 2) != round(grade, 2)
+            ]
+            run.last_submission_id = batch[-1].id
+            run.processed += len(targets)
+            run.changes = (run.changes or []) + changes
+            db.session.commit()
+            logger.info(f"Regrade run {run_id}: {run.processed} submissions regraded")
+
+        run.status = 'done'
+        run.finished_at = datetime.utcnow()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Regrade run {run_id} failed: {str(e)}", exc_info=True)
+        run = RegradeRun.query.get(run_id)
+        run.status = 'failed'
+        run.error = str(e)
+        db.session.commit()
+    return run
+
+def requeue_stale_regrades(stale_after_seconds):
+    """
+    Puts back regrade runs left running by a worker that died mid-run, like
+    grading_pipeline.requeue_stale_jobs. They resume after their last checkpoint.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_after_seconds)
+    count = (
+        RegradeRun.query
+        .filter(
+            RegradeRun.status == 'running',
+            or_(RegradeRun.updated_at.is_(None), RegradeRun.updated_at < cutoff)
+        )
+        .update({'status': 'queued'}, synchronize_session=False)
+    )
+    db.session.commit()
+    return count
+
+def claim_next_regrade():
+    """Takes the oldest queued regrade run for a worker, like grading_pipeline.claim_next_job."""
+    run = (
+        RegradeRun.query
+        .filter_by(status='queued')
+        .order_by(RegradeRun.id)
+        .with_for_update(skip_locked=True)
+        .first()
+    )
+    if not run:
+        db.session.rollback()
+        return None
+    run.status = 'running'
+    db.session.commit()
+    return run
@@ -0,0 +1,138 @@
+import threading
+from collections import OrderedDict
+from flask import current_app
+from sqlalchemy import func
+from app import db
+from ..models.assessment import Submission
+from .essay_texts import load_essay_texts
+
+CACHE_SIZE = 32
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def _submission_stamp(assessment_id):
+    """Changes whenever a submission is added to or removed from the assessment."""
+    count, latest = (
+        db.session.query(func.count(Submission.id), func.max(Submission.id))
+        .filter(Submission.assessment_id == assessment_id)
+        .one()
+    )
+    return count, latest
+
+def _top_pairs(matrix, owners, questions, threshold, top_k, chunk_size):
+    """
+    Multiplies the L2-normalized TF-IDF matrix with its transpose `chunk_size` rows at a
+    time, so only a chunk_size x N block is ever dense. Each row keeps its `top_k` most
+    similar answers to the same question from other submissions that reach `threshold`.
+    Returns {(i, j): similarity} with i < j.
+    """
+    import numpy as np
+
+    owners = np.asarray(owners)
+    questions = np.asarray(questions)
+    transposed = matrix.T.tocsc()
+    pairs = {}
+    for start in range(0, matrix.shape[0], chunk_size):
+        block = (matrix[start:start + chunk_size] @ transposed).toarray()
+        # Never pair an essay with itself, another essay of the same student, or an
+        # answer to a different question. Masked cells sort below every real score and
+        # are skipped explicitly, so a threshold of 0 cannot let them through
+        masked = (
+            (owners[start:start + chunk_size, None] == owners[None, :])
+            | (questions[start:start + chunk_size, None] != questions[None, :])
+        )
+        block[masked] = -1.0
+        k = min(top_k, block.shape[1])
+        top = np.argpartition(block, -k, axis=1)[:, -k:]
+        for offset, columns in enumerate(top):
+            row = start + offset
+            for column in columns:
+                similarity = float(block[offset, column])
+                if not masked[offset, column] and similarity > 0 and similarity >= threshold:
+                    pairs[(min(row, column), max(row, column))] = similarity
+    return pairs
+
+def _clusters(pairs, submission_ids):
+    """Groups submissions connected by at least one flagged pair (union-find)."""
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for i, j in pairs:
+        a, b = find(submission_ids[i]), find(submission_ids[j])
+        if a != b:
+            parent[a] = b
+
+    groups = {}
+    for submission_id in parent:
+        groups.setdefault(find(submission_id), set()).add(submission_id)
+    return sorted((sorted(g) for g in groups.values()), key=len, reverse=True)
+
+def similarity_graph(assessment, top_k=None, chunk_size=None):
+    """
+    All-pairs essay similarity for one assessment as a graph: pairs of answers to the
+    same question from different students whose TF-IDF cosine similarity reaches the
+    assessment's cosine_similarity_threshold, and the clusters of submissions they connect.
+    Results are cached until a submission is added to the assessment.
+    """
+    top_k = top_k or current_app.config.get('SIMILARITY_TOP_K', 10)
+    chunk_size = chunk_size or current_app.config.get('SIMILARITY_CHUNK_SIZE', 512)
+    threshold = assessment.cosine_similarity_threshold if assessment.cosine_similarity_threshold is not None else 0.7
+
+    key = (assessment.id, threshold, top_k)
+    stamp = _submission_stamp(assessment.id)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == stamp:
+            _cache.move_to_end(key)
+            return cached[1]
+
+    essay_texts = load_essay_texts(assessment.id)
+    keys = sorted(essay_texts)
+    pairs = {}
+    if len(keys) > 1:
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        matrix = TfidfVectorizer().fit_transform([essay_texts[k] for k in keys]).tocsr()
+        pairs = _top_pairs(matrix, [k[0] for k in keys], [k[1] for k in keys], threshold, top_k, chunk_size)
+
+    submission_ids = [k[0] for k in keys]
+    students = {
+        sub.id: f"{sub.user.first_name} {sub.user.last_name}" if sub.user else "Unknown Student"
+        for sub in Submission.query.filter(Submission.id.in_(set(submission_ids))).all()
+    } if pairs else {}
+
+    def essay(index):
+        submission_id, question_id = keys[index]
+        return {
+            'submissionId': submission_id,
+            'questionId': question_id,
+            'studentName': students.get(submission_id, "Unknown Student")
+        }
+
+    result = {
+        'assessmentId': assessment.id,
+        'threshold': threshold,
+        'essayCount': len(keys),
+        'pairs': [
+            {'source': essay(i), 'target': essay(j), 'similarity': round(similarity * 100, 2)}
+            for (i, j), similarity in sorted(pairs.items(), key=lambda item: item[1], reverse=True)
+        ],
+        'clusters': [
+            {'submissionIds': group, 'students': [students.get(s, "Unknown Student") for s in group]}
+            for group in _clusters(pairs, submission_ids)
+        ]
+    }
+
+    with _cache_lock:
+        _cache[key] = (stamp, result)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
@@ -0,0 +1,165 @@
+from collections import OrderedDict
+from functools import lru_cache
+import hashlib
+import os
+import re
+import threading
+
+# NLTK is only imported when text is first processed, so workers that never
+# grade anything don't pay for it at startup
+REQUIRED_NLTK_DATA = ('corpora/stopwords', 'corpora/wordnet')
+
+_stop_words = None
+_lemmatizer = None
+_load_lock = threading.Lock()
+
+# Bump whenever preprocess_text output changes; stored essay texts and the
+# plagiarism indexes built from them are rebuilt in the background
+PREPROCESSING_VERSION = 1
+
+# Student vocabulary is small and heavily repeated, so both caches stay small
+LEMMA_CACHE_SIZE = int(os.getenv('NLP_LEMMA_CACHE_SIZE', 50000))
+DOCUMENT_CACHE_SIZE = int(os.getenv('NLP_DOCUMENT_CACHE_SIZE', 4096))
+
+
+class NLPResourceError(RuntimeError):
+    """Raised when the NLTK data needed for preprocessing is not installed."""
+
+
+def missing_nltk_data():
+    """Returns the required NLTK resources that are not installed. Never downloads."""
+    import nltk
+    missing = []
+    for resource in REQUIRED_NLTK_DATA:
+        try:
+            nltk.data.find(resource)
+        except LookupError:
+            missing.append(resource)
+    return missing
+
+
+def load_nlp_resources():
+    """
+    Loads the stop word list and lemmatizer on first use.
+    Raises NLPResourceError straight away if the NLTK data is missing instead of
+    trying to download it from inside a request.
+    """
+    global _stop_words, _lemmatizer
+    if _lemmatizer is None:
+        with _load_lock:
+            if _lemmatizer is None:
+                missing = missing_nltk_data()
+                if missing:
+                    raise NLPResourceError(
+                        f"Missing NLTK data: {', '.join(missing)}. Run `flask nlp download` to install it."
+                    )
+                from nltk.corpus import stopwords
+                from nltk.stem import WordNetLemmatizer
+                _stop_words = set(stopwords.words('english'))
+                lemmatizer = WordNetLemmatizer()
+                lemmatizer.lemmatize('warmup')  # WordNet itself loads lazily on first lookup
+                _lemmatizer = lemmatizer
+    return _stop_words, _lemmatizer
+
+
+def warm_nlp():
+    """Loads NLTK data and scikit-learn up front, e.g. in the master process before forking workers."""
+    load_nlp_resources()
+    import sklearn.feature_extraction.text  # noqa: F401
+    import sklearn.metrics.pairwise  # noqa: F401
+
+
+@lru_cache(maxsize=LEMMA_CACHE_SIZE)
+def lemmatize(word):
+    """Memoized WordNet lemmatization of a single token."""
+    return load_nlp_resources()[1].lemmatize(word)
+
+
+class DocumentCache:
+    """Thread-safe LRU of preprocessed documents keyed by a hash of the raw text."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(text):
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+document_cache = DocumentCache(DOCUMENT_CACHE_SIZE)
+
+
+def preprocess_text(text, use_cache=True):
+    """Cleans and tokenizes text, removes stop words, and lemmatizes."""
+    if not text:
+        return ""
+    if use_cache:
+        key = DocumentCache.key(text)
+        cached = document_cache.get(key)
+        if cached is not None:
+            return cached
+    stop_words = load_nlp_resources()[0]
+    # Remove HTML tags
+    clean_text = re.sub(r'<[^>]+>', '', text)
+    # Remove special characters and numbers, convert to lowercase
+    clean_text = re.sub(r'[^a-zA-Z\s]', '', clean_text).lower()
+    tokens = clean_text.split()
+    # Remove stop words and lemmatize
+    processed = " ".join(lemmatize(word) for word in tokens if word not in stop_words)
+    if use_cache:
+        document_cache.put(key, processed)
+    return processed
+
+
+def cache_stats():
+    """Returns hit/miss counters for the lemma and document caches."""
+    lemma_info = lemmatize.cache_info()
+    return {
+        'lemma': {
+            'hits': lemma_info.hits,
+            'misses': lemma_info.misses,
+            'size': lemma_info.currsize,
+            'maxSize': lemma_info.maxsize
+        },
+        'document': {
+            'hits': document_cache.hits,
+            'misses': document_cache.misses,
+            'size': len(document_cache),
+            'maxSize': document_cache.maxsize
+        }
+    }
+
+
+def clear_caches():
+    """Empties both caches, e.g. after the preprocessing rules change."""
+    lemmatize.cache_clear()
+    document_cache.clear()
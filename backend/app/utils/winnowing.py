@@ -0,0 +1,188 @@
+import re
+from collections import defaultdict, deque
+
+# Karp-Rabin hashing of character k-grams modulo a Mersenne prime; values fit a signed BIGINT
+MODULUS = (1 << 61) - 1
+BASE = 257
+
+# Block-level tags become line breaks so paragraphs and headings stay on their own lines
+BLOCK_TAG = re.compile(r'<\s*(/?)\s*(p|div|br|li|ul|ol|h[1-6]|tr|blockquote)\b[^>]*>', re.IGNORECASE)
+QUOTE_OPEN = '\ue000'  # Private-use markers for <blockquote> boundaries, one character each like '\n'
+QUOTE_CLOSE = '\ue001'
+
+QUOTED_SPAN = re.compile(r'"[^"\n]{1,1000}"|“[^”]{1,1000}”')
+BLOCKQUOTE_SPAN = re.compile(f'{QUOTE_OPEN}[^{QUOTE_CLOSE}]*{QUOTE_CLOSE}?')
+# (Smith, 2020), (Smith et al. 2019, p. 4), (Codd 1970; Date 2003), [3], [2, 5-7]
+PARENTHETICAL_CITATION = re.compile(r'\([^()]{0,150}?\b(?:1[5-9]|20)\d{2}[a-z]?\b[^()]{0,40}\)')
+NUMERIC_CITATION = re.compile(r'\[\d+(?:\s*[-–,]\s*\d+)*\]')
+REFERENCE_HEADING = re.compile(r'^[ \t]*(?:references|bibliography|works cited|sources)[ \t]*:?[ \t]*$', re.IGNORECASE | re.MULTILINE)
+
+def _strip_tags(raw, mark_quotes=False):
+    def block(match):
+        if mark_quotes and match.group(2).lower() == 'blockquote':
+            return QUOTE_CLOSE if match.group(1) else QUOTE_OPEN
+        return '\n'
+    return re.sub(r'<[^>]+>', '', BLOCK_TAG.sub(block, raw or ''))
+
+def plain_text(raw):
+    """The essay as the student sees it: HTML tags removed, block tags as line breaks."""
+    return _strip_tags(raw)
+
+def _blank(match):
+    return re.sub(r'[^\n]', ' ', match.group(0))
+
+def prepare(raw, ignore_quotes=False, ignore_references=False):
+    """
+    Plain text of an essay for fingerprinting, with the assessment's stripping stages
+    applied: quoted passages (quotation marks, <blockquote>) and citations (in-text
+    citations and a trailing reference list). Stripped spans are blanked rather than
+    cut out, so character offsets still point into plain_text(raw).
+    """
+    text = _strip_tags(raw, mark_quotes=ignore_quotes)
+    if ignore_quotes:
+        text = BLOCKQUOTE_SPAN.sub(_blank, text)
+        text = QUOTED_SPAN.sub(_blank, text)
+    if ignore_references:
+        heading = None
+        for heading in REFERENCE_HEADING.finditer(text):
+            pass  # The last such heading starts the reference list
+        if heading:
+            text = text[:heading.start()] + re.sub(r'[^\n]', ' ', text[heading.start():])
+        text = PARENTHETICAL_CITATION.sub(_blank, text)
+        text = NUMERIC_CITATION.sub(_blank, text)
+    return text
+
+class Winnower:
+    """
+    Incremental winnowing (Schleimer, Wilkerson & Aiken, the scheme MOSS uses) over
+    lowercased letters and digits, so spacing, punctuation and case changes do not
+    break matches. Keeps only the last k characters and one window of candidate
+    minima, so text can be fed in chunks of any size.
+    """
+
+    def __init__(self, k, window):
+        self.k = k
+        self.window = window
+        self._high = pow(BASE, k - 1, MODULUS)
+        self._chars = deque()
+        self._offsets = deque()
+        self._hash = 0
+        self._count = 0  # k-grams seen so far
+        self._minima = deque()  # (hash, index, start, end), hashes increasing from the left
+        self._recorded = -1
+
+    def feed(self, text, offset=0):
+        """
+        Adds text starting at character `offset` of the document. Returns the
+        fingerprints selected so far as (hash, start, end) triples.
+        """
+        selected = []
+        for i, c in enumerate(text):
+            if not c.isalnum():
+                continue
+            for lower in c.lower():
+                if len(self._chars) == self.k:
+                    self._hash = (self._hash - ord(self._chars.popleft()) * self._high) % MODULUS
+                    self._offsets.popleft()
+                self._chars.append(lower)
+                self._offsets.append(offset + i)
+                self._hash = (self._hash * BASE + ord(lower)) % MODULUS
+                if len(self._chars) == self.k:
+                    self._push(self._offsets[0], offset + i + 1, selected)
+        return selected
+
+    def finish(self):
+        """Selects the one fingerprint of a text shorter than a full window."""
+        selected = []
+        if 0 < self._count < self.window:
+            self._record(selected)
+        return selected
+
+    def _push(self, start, end, selected):
+        index = self._count
+        self._count += 1
+        # Rightmost minimum: an equal hash replaces the older one
+        while self._minima and self._minima[-1][0] >= self._hash:
+            self._minima.pop()
+        self._minima.append((self._hash, index, start, end))
+        if self._minima[0][1] <= index - self.window:
+            self._minima.popleft()
+        if index >= self.window - 1:
+            self._record(selected)
+
+    def _record(self, selected):
+        value, index, start, end = self._minima[0]
+        if index != self._recorded:
+            self._recorded = index
+            selected.append((value, start, end))
+
+def fingerprints(text, k, window):
+    """
+    Winnowed fingerprints of a plain text: the minimum k-gram hash of every `window`
+    consecutive k-grams, each selected k-gram recorded once. Any shared run of at
+    least k + window - 1 normalized characters yields a shared fingerprint.
+    Returns (hash, start, end) triples, with start/end as character offsets in `text`.
+    """
+    winnower = Winnower(k, window)
+    return winnower.feed(text) + winnower.finish()
+
+def stream_fingerprints(chunks, k, window, html=False):
+    """
+    Yields the fingerprints of a document read as text chunks, e.g. a file read piece
+    by piece, without holding the text. With `html`, markup is skipped; offsets are
+    always into the text as read.
+    """
+    winnower = Winnower(k, window)
+    offset = 0
+    in_tag = False
+    for chunk in chunks:
+        if html:
+            visible = []
+            for c in chunk:
+                if c == '<':
+                    in_tag = True
+                visible.append(' ' if in_tag else c)
+                if c == '>':
+                    in_tag = False
+            chunk = ''.join(visible)
+        yield from winnower.feed(chunk, offset)
+        offset += len(chunk)
+    yield from winnower.finish()
+
+def query_spans(text, k, window):
+    """The fingerprints of a text to look up, as {hash: [(start, end), ...]}."""
+    query = defaultdict(list)
+    for value, start, end in fingerprints(text, k, window):
+        query[value].append((start, end))
+    return query
+
+def collect_overlaps(query, rows):
+    """
+    Groups fingerprint index rows that matched a query_spans lookup by document.
+    `rows` are (document key, hash, start, end) tuples. Returns
+    {key: (share of the query's fingerprints found in that document, merged spans)}.
+    """
+    matched = defaultdict(set)
+    pairs = defaultdict(list)
+    for key, value, source_start, source_end in rows:
+        matched[key].add(value)
+        for span in query[value]:
+            pairs[key].append((span, (source_start, source_end)))
+    return {key: (len(values) / len(query), merge_spans(pairs[key])) for key, values in matched.items()}
+
+def merge_spans(pairs):
+    """
+    Merges overlapping matched fingerprints into spans. `pairs` are
+    ((start, end) in the checked text, (start, end) in the source) tuples.
+    Returns {'start', 'end', 'sourceStart', 'sourceEnd'} dicts in text order.
+    """
+    spans = []
+    for (start, end), (source_start, source_end) in sorted(pairs):
+        if spans and start <= spans[-1]['end']:
+            span = spans[-1]
+            span['end'] = max(span['end'], end)
+            span['sourceStart'] = min(span['sourceStart'], source_start)
+            span['sourceEnd'] = max(span['sourceEnd'], source_end)
+        else:
+            spans.append({'start': start, 'end': end, 'sourceStart': source_start, 'sourceEnd': source_end})
+    return spans
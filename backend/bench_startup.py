@@ -0,0 +1,63 @@
+"""
+Measures how long create_app() takes and how much memory a fresh worker uses,
+with the NLP stack loaded lazily (default) and preloaded (NLP_PRELOAD=true,
+which is what every worker paid before the stack was made lazy).
+
+Usage: python bench_startup.py [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+CHILD = """
+import json, resource, sys, time
+start = time.perf_counter()
+from app import create_app
+create_app()
+elapsed = time.perf_counter() - start
+heavy = ('nltk', 'sklearn', 'scipy', 'numpy')
+print(json.dumps({
+    'seconds': elapsed,
+    'maxrss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'nlp_modules': sum(1 for name in sys.modules if name.split('.')[0] in heavy)
+}))
+"""
+
+
+def run_once(preload):
+    env = dict(os.environ, NLP_PRELOAD='true' if preload else 'false')
+    result = subprocess.run(
+        [sys.executable, '-c', CHILD],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'mode':<10}{'startup (s)':>14}{'max RSS (MB)':>15}{'NLP modules':>14}")
+    for label, preload in (('lazy', False), ('preload', True)):
+        try:
+            samples = [run_once(preload) for _ in range(args.runs)]
+        except RuntimeError as e:
+            print(f"{label:<10}failed: {e}")
+            continue
+        print(
+            f"{label:<10}"
+            f"{statistics.median(s['seconds'] for s in samples):>14.3f}"
+            f"{statistics.median(s['maxrss_mb'] for s in samples):>15.1f}"
+            f"{samples[0]['nlp_modules']:>14}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Checks that the hot lookups use the indexes meant for them. Each query is run
+through EXPLAIN (EXPLAIN QUERY PLAN on SQLite) and the index the planner picks
+must start with the expected columns; a table scan or another index fails.
+
+By default this runs against the configured database (DB_* settings), which
+should be migrated and hold realistic data: on near-empty tables MySQL may
+prefer a table scan. --sqlite checks the indexes declared on the models
+instead, against an empty in-memory schema.
+
+Usage: python explain_indexes.py [--sqlite]
+"""
+import argparse
+import re
+import sys
+from datetime import datetime
+
+from sqlalchemy import select, text
+
+from app import create_app, db
+from app.config import Config
+from app.models.assessment import Assessment, Question, StudentProgress, Submission
+from app.models.user import User
+
+# (description, query, table, leading columns of the index it should use)
+HOT_QUERIES = [
+    ('submission of a student for an assessment',
+     select(Submission).filter_by(user_id=1, assessment_id=1), 'submissions', ['user_id', 'assessment_id']),
+    ('submissions of a student',
+     select(Submission).filter_by(user_id=1), 'submissions', ['user_id']),
+    ('submissions of an assessment',
+     select(Submission).filter_by(assessment_id=1), 'submissions', ['assessment_id']),
+    ('progress of a student on an assessment',
+     select(StudentProgress).filter_by(user_id=1, assessment_id=1), 'student_progress', ['user_id', 'assessment_id']),
+    ('questions of an assessment',
+     select(Question).filter_by(assessment_id=1), 'questions', ['assessment_id']),
+    ('upcoming assessments of a student\'s courses',
+     select(Assessment)
+     .where(Assessment.course_id.in_([1, 2, 3]), Assessment.end_date > datetime(2026, 1, 1))
+     .order_by(Assessment.end_date).limit(6),
+     'assessments', ['course_id', 'end_date']),
+    ('user by password reset token',
+     select(User).filter_by(reset_token='token'), 'users', ['reset_token']),
+]
+
+SQLITE_INDEX = re.compile(r'USING (?:COVERING )?INDEX (\S+)')
+
+
+class SQLiteConfig(Config):
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    NLP_PRELOAD = False
+
+
+def compile_query(conn, query):
+    compiled = query.compile(dialect=conn.dialect, compile_kwargs={'render_postcompile': True})
+    if compiled.positional:
+        return str(compiled), tuple(compiled.params[name] for name in compiled.positiontup)
+    return str(compiled), compiled.params
+
+
+def chosen_index(conn, query, table):
+    """The index the planner uses for `table` in `query` and its columns, or (None, [])."""
+    sql, params = compile_query(conn, query)
+    if conn.dialect.name == 'sqlite':
+        for row in conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql, params).fetchall():
+            detail = row[-1]
+            match = SQLITE_INDEX.search(detail)
+            if re.search(rf'\b{table}\b', detail) and match:
+                name = match.group(1)
+                columns = [r[2] for r in sorted(conn.exec_driver_sql(f"PRAGMA index_info('{name}')").fetchall())]
+                return name, columns
+        return None, []
+
+    for row in conn.exec_driver_sql('EXPLAIN ' + sql, params).mappings().fetchall():
+        if row['table'] == table and row['key']:
+            columns = [
+                r['Column_name'] for r in conn.execute(
+                    text(f"SHOW INDEX FROM {table} WHERE Key_name = :name"), {'name': row['key']}
+                ).mappings().fetchall()
+            ]
+            return row['key'], columns
+    return None, []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sqlite', action='store_true', help='Check the model indexes on an in-memory SQLite schema')
+    args = parser.parse_args()
+
+    app = create_app(SQLiteConfig if args.sqlite else Config)
+    failures = 0
+    with app.app_context():
+        if args.sqlite:
+            db.create_all()
+        with db.engine.connect() as conn:
+            print(f"Checking {len(HOT_QUERIES)} queries on {conn.dialect.name}")
+            for description, query, table, expected in HOT_QUERIES:
+                name, columns = chosen_index(conn, query, table)
+                ok = columns[:len(expected)] == expected
+                failures += not ok
+                used = f"{name} ({', '.join(columns)})" if name else 'no index (table scan)'
+                print(f"{'ok  ' if ok else 'FAIL'} {description}: {used}")
+                if not ok:
+                    print(f"     expected an index on {table} starting with ({', '.join(expected)})")
+
+    if failures:
+        print(f"\n{failures} of {len(HOT_QUERIES)} queries do not use their index")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
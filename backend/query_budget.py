@@ -0,0 +1,342 @@
+"""
+Checks how many SQL statements each API endpoint issues. Every route is called
+once against a seeded in-memory SQLite database, the statements it sends are
+recorded through SQLAlchemy's before_cursor_execute hook, and any endpoint that
+goes over its declared budget is reported with the statements it ran. Exits
+non-zero when a budget is exceeded, an endpoint answers with a server error
+(its count would stop wherever it crashed) or a route has no budget declared.
+
+Budgets are per request and must not grow with the data: --scale multiplies the
+seeded students and assessments, so a query issued per row (N+1) shows up as
+an endpoint that passes at --scale 1 and fails at a larger scale.
+
+Usage: python query_budget.py [--scale 1] [--verbose]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app import create_app, db
+from app.config import Config
+
+# (method, url, role, json body, budget), run in this order against one database.
+# URLs are formatted with the ids of the seeded rows (see seed()); the role picks
+# the caller's token: 'lecturer', 'student', or None for no token.
+ENDPOINTS = [
+    ('GET', '/api/health', None, None, 0),
+    ('GET', '/api/health/nlp-cache', None, None, 0),
+    ('GET', '/api/departments', None, None, 1),
+    ('GET', '/api/user', 'student', None, 2),
+    ('PUT', '/api/user/profile', 'student', {'firstName': 'Ada', 'lastName': 'Obi'}, 4),
+
+    # email_validator checks that the domain resolves, so offline this stops at a 400
+    ('POST', '/api/auth/register', None, {
+        'firstName': 'New', 'lastName': 'Student', 'email': 'new.student@example.com', 'password': 'password123',
+        'universityId': 'NEW/001', 'role': 'student', 'department': 'CSC'
+    }, 4),
+    ('POST', '/api/auth/login', None, {'email': '{student_email}', 'password': 'password123'}, 2),
+    # Unknown address: the registered-address path sends an email
+    ('POST', '/api/auth/reset-password', None, {'email': 'nobody@example.com'}, 1),
+    ('GET', '/api/auth/reset-password/{reset_token}/verify', None, None, 1),
+    ('POST', '/api/auth/reset-password/{reset_token}', None, {'password': 'password456'}, 2),
+    ('PUT', '/api/auth/change-password', 'student', {'oldPassword': 'password123', 'newPassword': 'password789'}, 2),
+
+    ('GET', '/api/student/dashboard', 'student', None, 8),
+    ('GET', '/api/student/dashboard-summary', 'student', None, 6),
+    ('GET', '/api/student/available-assessments', 'student', None, 5),
+    ('GET', '/api/student/results/list', 'student', None, 2),
+    ('GET', '/api/student/assessments/{open_assessment_id}', 'student', None, 8),
+    ('POST', '/api/student/assessments/{open_assessment_id}/attempt', 'student', {
+        'progress': 50, 'answers': {}, 'flaggedQuestions': [], 'timeSpentSeconds': 120
+    }, 5),
+    ('POST', '/api/assessments/submit', 'student', {
+        'assessmentId': '{open_assessment_id}',
+        'answers': [{'questionId': '{open_mcq_id}', 'type': 'mcq', 'selectedOption': 0}],
+        'timeSpentSeconds': 600
+    }, 18),
+
+    ('GET', '/api/lecturer/dashboard', 'lecturer', None, 7),
+    ('GET', '/api/lecturer/assessments', 'lecturer', None, 6),
+    ('GET', '/api/lecturer/assessments/active', 'lecturer', None, 4),
+    ('GET', '/api/lecturer/assessments/completed', 'lecturer', None, 4),
+    ('GET', '/api/lecturer/assessments/drafts', 'lecturer', None, 2),
+    ('GET', '/api/lecturer/assessments/{assessment_id}/submissions', 'lecturer', None, 4),
+    ('GET', '/api/lecturer/assessments/{assessment_id}/analytics', 'lecturer', None, 3),
+    ('GET', '/api/lecturer/assessments/{assessment_id}/similarity-matrix', 'lecturer', None, 4),
+    ('POST', '/api/lecturer/assessments/{assessment_id}/regrade', 'lecturer', {'questionId': '{mcq_id}'}, 22),
+    ('GET', '/api/lecturer/regrade-runs/{regrade_run_id}', 'lecturer', None, 3),
+    ('GET', '/api/lecturer/plagiarism-alerts', 'lecturer', None, 3),
+    ('GET', '/api/lecturer/students', 'lecturer', None, 6),
+    ('GET', '/api/lecturer/students/{student_id}', 'lecturer', None, 8),
+    ('GET', '/api/lecturer/questions', 'lecturer', None, 4),
+    ('POST', '/api/lecturer/questions', 'lecturer', {
+        'assessment_id': '{assessment_id}', 'text': 'Pick one', 'type': 'mcq', 'difficulty': 'easy', 'marks': 2,
+        'options': [{'text': 'A', 'isCorrect': True}, {'text': 'B', 'isCorrect': False}]
+    }, 10),
+    ('PUT', '/api/lecturer/questions/{spare_question_id}', 'lecturer', {
+        'text': 'Pick another', 'type': 'mcq', 'difficulty': 'medium', 'marks': 3,
+        'options': [{'text': 'C', 'isCorrect': False}, {'text': 'D', 'isCorrect': True}]
+    }, 12),
+    ('DELETE', '/api/lecturer/questions/{spare_question_id}', 'lecturer', None, 7),
+    ('GET', '/api/lecturer/courses/{course_id}/reference-documents', 'lecturer', None, 3),
+    ('POST', '/api/lecturer/courses/{course_id}/reference-documents', 'lecturer', {'path': 'notes.txt'}, 7),
+    ('DELETE', '/api/lecturer/reference-documents/{reference_document_id}', 'lecturer', None, 5),
+
+    ('GET', '/api/assessments', 'lecturer', None, 3),
+    ('GET', '/api/assessments/{assessment_id}', 'lecturer', None, 6),
+    ('GET', '/api/assessments/courses', 'lecturer', None, 2),
+    ('POST', '/api/assessments', 'lecturer', {
+        'title': 'Quiz', 'courseId': '{course_id}', 'type': 'quiz',
+        'startDate': '{tomorrow}', 'endDate': '{next_week}',
+        'questions': [{'text': 'Pick one', 'type': 'mcq', 'maxMark': 2, 'options': [{'text': 'A'}, {'text': 'B'}], 'correctOption': 0}]
+    }, 8),
+    ('PUT', '/api/assessments/{spare_assessment_id}', 'lecturer', {
+        'title': 'Renamed',
+        'questions': [{'text': 'Define a foreign key', 'type': 'essay', 'maxMark': 10, 'modelAnswer': 'A column referencing a key of another table.', 'keywords': ['key']}]
+    }, 13),
+    ('DELETE', '/api/assessments/{spare_assessment_id}', 'lecturer', None, 9),
+    ('POST', '/api/assessments/drafts', 'lecturer', {'title': 'Draft', 'courseId': '{course_id}', 'questions': []}, 4),
+    ('GET', '/api/assessments/drafts', 'lecturer', None, 1),
+    ('GET', '/api/assessments/drafts/{draft_id}', 'lecturer', None, 2),
+    ('PUT', '/api/assessments/drafts/{draft_id}', 'lecturer', {'title': 'Draft v2', 'courseId': '{course_id}', 'questions': []}, 5),
+    ('DELETE', '/api/assessments/drafts/{draft_id}', 'lecturer', None, 3),
+
+    ('GET', '/api/submissions/{submission_id}', 'student', None, 10),
+    ('GET', '/api/submissions/{submission_id}/status', 'student', None, 2),
+    ('PUT', '/api/submissions/grade/{submission_id}', 'lecturer', {'grade': 12, 'lecturerComments': 'Good'}, 10),
+]
+
+STUDENTS_PER_COURSE = 12
+ASSESSMENTS_PER_COURSE = 4
+ESSAY = "<p>Normalization organizes the tables of a database so that data is stored once, which reduces redundancy and protects integrity.</p>"
+
+
+class BudgetConfig(Config):
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    TESTING = True
+    PROPAGATE_EXCEPTIONS = False  # A failing endpoint is reported as a 500 with its statements
+    JWT_SECRET_KEY = 'query-budget-check-secret-key-0123456789'
+    GRADING_ASYNC = False
+    NLP_PRELOAD = False
+
+
+def seed(scale, reference_root):
+    """Creates a department, a lecturer with two courses and their students, assessments, submissions and drafts."""
+    from flask_jwt_extended import create_access_token
+    from app.models.user import User, Department, Course
+    from app.models.assessment import Assessment, Question, QuestionOption, Submission, StudentProgress, AnswerResult, AssessmentDraft
+    from app.models.lecturer import PlagiarismReport, StudentEngagement
+    from app.models.grading import RegradeRun
+    from app.models.plagiarism import ReferenceDocument
+    from app.utils.nlp_grader import GRADER_VERSION
+    from app.utils.assessment_stats import reconcile_stats
+
+    now = datetime.utcnow()
+    db.session.add(Department(id='CSC', name='Computer Science'))
+    lecturer = User(first_name='Lecturer', last_name='One', email='lecturer@example.com', university_id='STAFF/001', role='lecturer', department_id='CSC')
+    lecturer.set_password('password123')
+    db.session.add(lecturer)
+    db.session.flush()
+
+    courses = [
+        Course(code=f'CSC10{i}', title=f'Databases {i}', department_id='CSC', lecturer_id=lecturer.id)
+        for i in range(2)
+    ]
+    db.session.add_all(courses)
+    students = []
+    for i in range(STUDENTS_PER_COURSE * scale):
+        student = User(first_name=f'Student{i}', last_name='Test', email=f'student{i}@example.com', university_id=f'STUDENT/{i:04d}', role='student', department_id='CSC')
+        student.set_password('password123')
+        students.append(student)
+    db.session.add_all(students)
+    db.session.flush()
+    for course in courses:
+        course.students.extend(students)
+        db.session.add_all(StudentEngagement(user_id=s.id, course_id=course.id, login_count=10, last_active=now) for s in students)
+
+    def add_assessment(course, title, start, end):
+        assessment = Assessment(title=title, type='exam', course_id=course.id, created_by=lecturer.id, start_date=start, end_date=end, total_marks=15)
+        db.session.add(assessment)
+        db.session.flush()
+        essay = Question(assessment_id=assessment.id, text='Explain normalization', type='essay', marks=10, created_by=lecturer.id,
+                         model_answer=ESSAY, keywords=json.dumps(['normalization', 'redundancy']), word_limit=200)
+        mcq = Question(assessment_id=assessment.id, text='Pick the normal form', type='mcq', marks=5, created_by=lecturer.id)
+        mcq.options = [QuestionOption(text='3NF', is_correct=True), QuestionOption(text='0NF')]
+        db.session.add_all([essay, mcq])
+        db.session.flush()
+        return assessment, essay, mcq
+
+    graded = []
+    for course in courses:
+        for i in range(ASSESSMENTS_PER_COURSE * scale):
+            # Alternate finished and running assessments
+            start = now - timedelta(days=10 + i) if i % 2 == 0 else now - timedelta(days=1)
+            end = now - timedelta(days=3) if i % 2 == 0 else now + timedelta(days=3 + i)
+            graded.append(add_assessment(course, f'{course.code} test {i}', start, end))
+
+    for assessment, essay, mcq in graded:
+        for n, student in enumerate(students):
+            submission = Submission(
+                assessment_id=assessment.id, user_id=student.id, submitted_at=now - timedelta(days=1, minutes=n),
+                answers_json=json.dumps([
+                    {'questionId': essay.id, 'type': 'essay', 'content': ESSAY},
+                    {'questionId': mcq.id, 'type': 'mcq', 'selectedOption': n % 2}
+                ]),
+                grade=5 + n % 10, plagiarism_score=float(n * 7 % 100), grading_status='graded'
+            )
+            db.session.add(submission)
+            db.session.flush()
+            db.session.add_all([
+                AnswerResult(submission_id=submission.id, question_id=essay.id, question_type='essay', score=n % 10, max_mark=10,
+                             cosine_similarity=0.5, matched_keywords=['normalization'], missing_keywords=['redundancy'], grader_version=GRADER_VERSION,
+                             nlp_insights={'overallMatchPercentage': 50.0, 'matchedKeywords': ['normalization'],
+                                           'missingKeywords': ['redundancy'], 'readabilityScore': 60.0}),
+                AnswerResult(submission_id=submission.id, question_id=mcq.id, question_type='mcq', score=5 * (n % 2 == 0), max_mark=5, grader_version=GRADER_VERSION),
+                PlagiarismReport(submission_id=submission.id, similarity_score=submission.plagiarism_score)
+            ])
+
+    open_assessment, _, open_mcq = add_assessment(courses[0], 'Open test', now - timedelta(hours=1), now + timedelta(days=2))
+    spare_assessment, _, _ = add_assessment(courses[1], 'Spare test', now + timedelta(days=5), now + timedelta(days=6))
+    _, spare_question, _ = add_assessment(courses[1], 'Question bank', now + timedelta(days=5), now + timedelta(days=6))
+    for assessment, _, _ in graded[1::2]:
+        db.session.add(StudentProgress(user_id=students[0].id, assessment_id=assessment.id, progress=40, status='in_progress'))
+
+    students[1].reset_token = 'query-budget-reset-token'
+    students[1].reset_token_expires = datetime.now() + timedelta(hours=1)
+    draft = AssessmentDraft(user_id=lecturer.id, title='Draft', course_id=courses[0].id, content={'questions': []})
+    run = RegradeRun(assessment_id=graded[0][0].id, requested_by=lecturer.id, status='done')
+    document = ReferenceDocument(course_id=courses[0].id, path='old.txt', title='old', size_bytes=0, content_hash='0' * 64, fingerprint_count=0)
+    db.session.add_all([draft, run, document])
+    db.session.commit()
+    # assessment_stats rows, as the migration creates them for existing assessments
+    reconcile_stats()
+
+    with open(os.path.join(reference_root, 'notes.txt'), 'w') as f:
+        f.write('Normalization reduces redundancy by splitting tables so each fact is stored in exactly one place. ' * 20)
+
+    first_submission = Submission.query.filter_by(user_id=students[0].id, assessment_id=graded[0][0].id).first()
+    return {
+        'ids': {
+            'student_email': students[0].email,
+            'student_id': students[0].id,
+            'course_id': courses[0].id,
+            'assessment_id': graded[0][0].id,
+            'mcq_id': graded[0][2].id,
+            'open_assessment_id': open_assessment.id,
+            'open_mcq_id': open_mcq.id,
+            'spare_assessment_id': spare_assessment.id,
+            'spare_question_id': spare_question.id,
+            'submission_id': first_submission.id,
+            'draft_id': draft.id,
+            'regrade_run_id': run.id,
+            'reference_document_id': document.id,
+            'reset_token': students[1].reset_token,
+            'tomorrow': (now + timedelta(days=1)).isoformat(),
+            'next_week': (now + timedelta(days=7)).isoformat()
+        },
+        'tokens': {
+            'lecturer': create_access_token(identity=lecturer.uuid),
+            'student': create_access_token(identity=students[0].uuid)
+        }
+    }
+
+
+def fill(value, ids):
+    """Formats the {placeholders} in a URL or JSON body; a value that is only a placeholder keeps its type."""
+    if isinstance(value, str):
+        if value.startswith('{') and value.endswith('}') and value[1:-1] in ids:
+            return ids[value[1:-1]]
+        return value.format(**ids)
+    if isinstance(value, list):
+        return [fill(v, ids) for v in value]
+    if isinstance(value, dict):
+        return {k: fill(v, ids) for k, v in value.items()}
+    return value
+
+
+def route_key(app, method, url):
+    adapter = app.url_map.bind('localhost')
+    endpoint, _ = adapter.match(url, method=method)
+    return endpoint, method
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=int, default=1, help='Multiplies the seeded students and assessments')
+    parser.add_argument('--verbose', action='store_true', help='Print the statements of every endpoint')
+    args = parser.parse_args()
+
+    reference_root = tempfile.mkdtemp(prefix='query-budget-')
+    BudgetConfig.REFERENCE_DOCS_ROOT = reference_root
+    app = create_app(BudgetConfig)
+    client = app.test_client()
+
+    with app.app_context():
+        db.create_all()
+        seeded = seed(args.scale, reference_root)
+        db.session.remove()
+
+        statements = []
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(' '.join(statement.split()))
+        event.listen(db.engine, 'before_cursor_execute', record)
+
+    ids, tokens = seeded['ids'], seeded['tokens']
+    covered = set()
+    failures = []
+    errors = []
+    print(f"{'endpoint':<62}{'status':>7}{'queries':>9}{'budget':>8}")
+    for method, url, role, body, budget in ENDPOINTS:
+        url = fill(url, ids)
+        covered.add(route_key(app, method, url))
+        headers = {'Authorization': f'Bearer {tokens[role]}'} if role else {}
+        statements.clear()
+        response = client.open(url, method=method, json=fill(body, ids), headers=headers)
+        issued = list(statements)
+
+        over = len(issued) > budget
+        print(f"{method + ' ' + url:<62}{response.status_code:>7}{len(issued):>9}{budget:>8}{'  OVER' if over else ''}")
+        if over:
+            failures.append((method, url, budget, issued))
+        if response.status_code >= 500:
+            errors.append((method, url))
+        elif args.verbose:
+            for statement in issued:
+                print(f"    {statement[:160]}")
+
+    missing = sorted(
+        (rule.endpoint, method)
+        for rule in app.url_map.iter_rules() if rule.endpoint != 'static'
+        for method in rule.methods - {'HEAD', 'OPTIONS'}
+        if (rule.endpoint, method) not in covered
+    )
+
+    for method, url, budget, issued in failures:
+        print(f"\n{method} {url}: {len(issued)} statements, budget {budget}")
+        for n, statement in enumerate(issued, 1):
+            print(f"  {n:>3}. {statement[:200]}")
+    if errors:
+        print("\nEndpoints that answered with a server error (their counts stop at the error, so they fail):")
+        for method, url in errors:
+            print(f"  {method} {url}")
+    if missing:
+        print("\nRoutes without a query budget:")
+        for endpoint, method in missing:
+            print(f"  {method} {endpoint}")
+
+    if failures or errors or missing:
+        print(
+            f"\n{len(failures)} endpoint(s) over budget, {len(errors)} server error(s), "
+            f"{len(missing)} route(s) without a budget"
+        )
+        sys.exit(1)
+    print(f"\nAll {len(ENDPOINTS)} endpoints within budget")
+
+
+if __name__ == '__main__':
+    main()